@@ -12,6 +12,20 @@ SF_SECURITY_TOKEN = os.getenv("SF_SECURITY_TOKEN")
 SF_CLIENT_ID = os.getenv("SF_CLIENT_ID")
 SF_CLIENT_SECRET = os.getenv("SF_CLIENT_SECRET")
 SF_DOMAIN = os.getenv("SF_DOMAIN", "login")  # 'login' for prod, 'test' for sandbox
+# Concurrent Salesforce queries during extraction (one per object type is enough)
+SF_EXTRACT_WORKERS = int(os.getenv("SF_EXTRACT_WORKERS", "7"))
+# Records per page handed from extraction to the loader (Salesforce returns up to 2000 per query_more)
+SF_PAGE_SIZE = int(os.getenv("SF_PAGE_SIZE", "2000"))
+# Pages buffered per object type while the loader is busy with another one
+SF_STREAM_BUFFER_PAGES = int(os.getenv("SF_STREAM_BUFFER_PAGES", "4"))
+# Object types extracted with Bulk API 2.0 query jobs instead of REST paging (comma-separated
+# extractor names, e.g. "institutions,foreign_credentials"); REST stays the fallback
+SF_BULK_OBJECT_TYPES = {name.strip() for name in os.getenv("SF_BULK_OBJECT_TYPES", "").split(",") if name.strip()}
+# Seconds between Bulk API job status checks, and before an unfinished job is aborted
+SF_BULK_POLL_INTERVAL = float(os.getenv("SF_BULK_POLL_INTERVAL", "2"))
+SF_BULK_TIMEOUT = float(os.getenv("SF_BULK_TIMEOUT", "600"))
+# Records per Bulk API result set (one API call each)
+SF_BULK_MAX_RECORDS = int(os.getenv("SF_BULK_MAX_RECORDS", "50000"))
 
 # --- LLM Provider Selection ---
 # Options: 'gemini', 'openai', or 'anthropic'. Default to 'gemini' to preserve existing behavior.
@@ -21,6 +35,11 @@ LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").strip().lower()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
 GEMINI_TEMPERATURE = float(os.getenv("GEMINI_TEMPERATURE", "0.1"))
+# PDF input method: 'cache' (upload once + explicit context cache with the system instruction and tools),
+# 'upload' (Files API upload referenced by URI) or 'inline' (PDF bytes sent with every request)
+GEMINI_PDF_METHOD = os.getenv("GEMINI_PDF_METHOD", "cache").strip().lower()  # cache|upload|inline
+# Lifetime of the context cache in seconds; it is deleted when the analysis ends, the TTL only covers crashes
+GEMINI_CACHE_TTL = int(os.getenv("GEMINI_CACHE_TTL", "900"))
 
 # --- OpenAI (GPT-5) Credentials ---
 # Model and API key are specified in the .env file
@@ -40,6 +59,85 @@ ANTHROPIC_MODEL = os.getenv("ANTHROPIC_MODEL", "claude-3-5-sonnet-20241022")
 ANTHROPIC_MAX_TOKENS = int(os.getenv("ANTHROPIC_MAX_TOKENS", "8000"))
 # Timeout for Claude requests (in seconds) - default to 20 minutes for long translations
 ANTHROPIC_TIMEOUT = float(os.getenv("ANTHROPIC_TIMEOUT", "1200"))
+# Prompt caching of the tool schemas, PDF document and instructions across tool-calling rounds
+ANTHROPIC_PROMPT_CACHING = os.getenv("ANTHROPIC_PROMPT_CACHING", "true").strip().lower() in ("1", "true", "yes")
+
+# --- Batch Analysis ---
+# Documents analyzed at once by document_processor.batch (python main.py analyze-batch)
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "4"))
+# Maximum concurrent analyses per LLM provider, shared by all batches in the process
+# (each chunk of a split PDF counts as one analysis)
+PROVIDER_MAX_CONCURRENCY = {
+    "anthropic": int(os.getenv("ANTHROPIC_MAX_CONCURRENCY", "4")),
+    "gemini": int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")),
+}
+
+# --- LLM Rate Limiting ---
+# Per-minute budgets per provider, shared by all conversations in the process (0 means unlimited);
+# set them to the account's quota so batches can run at full concurrency without rate limit errors
+PROVIDER_RATE_LIMITS = {
+    "anthropic": {
+        "requests_per_minute": int(os.getenv("ANTHROPIC_REQUESTS_PER_MINUTE", "0")),
+        "tokens_per_minute": int(os.getenv("ANTHROPIC_TOKENS_PER_MINUTE", "0")),
+    },
+    "gemini": {
+        "requests_per_minute": int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "0")),
+        "tokens_per_minute": int(os.getenv("GEMINI_TOKENS_PER_MINUTE", "0")),
+    },
+}
+# Retries of a rate-limited, overloaded or failed LLM request, with exponential backoff and jitter
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "2"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "60"))
+# Tokens reserved for the first request of a conversation (later requests reserve what the previous one used)
+LLM_INITIAL_TOKEN_ESTIMATE = int(os.getenv("LLM_INITIAL_TOKEN_ESTIMATE", "20000"))
+# Stream model responses: tool calls start as soon as they are complete and credentials of the
+# final answer are surfaced as they arrive; long responses also keep the connection active
+LLM_STREAMING = os.getenv("LLM_STREAMING", "true").strip().lower() in ("1", "true", "yes")
+# Have the model submit the final analysis through a submit_analysis tool whose schema is generated
+# from document_processor/models.py, instead of writing it as JSON text
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "false").strip().lower() in ("1", "true", "yes")
+
+# --- PDF Preprocessing ---
+# Drop blank and exact duplicate pages before a PDF is sent to the LLM
+PDF_PREPROCESSING = os.getenv("PDF_PREPROCESSING", "true").strip().lower() in ("1", "true", "yes")
+# A scanned page counts as blank when less than this share of its pixels is darker than the paper
+PDF_BLANK_INK_RATIO = float(os.getenv("PDF_BLANK_INK_RATIO", "0.001"))
+# Split folios with more pages than this (after dropping pages) into page-range chunks that are
+# analyzed in parallel and merged (0 never splits)
+PDF_CHUNK_MAX_PAGES = int(os.getenv("PDF_CHUNK_MAX_PAGES", "0"))
+# Pages repeated at the start of the next chunk, so a credential spanning the boundary is seen whole
+PDF_CHUNK_OVERLAP_PAGES = int(os.getenv("PDF_CHUNK_OVERLAP_PAGES", "1"))
+# Chunks of one document analyzed at once
+PDF_CHUNK_MAX_WORKERS = int(os.getenv("PDF_CHUNK_MAX_WORKERS", "4"))
+
+# --- Tool Result Cache ---
+# Results of identical database tool calls kept in memory and shared by all conversations (0 disables)
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "1024"))
+# Threads shared by all conversations for running the tool calls of one model turn concurrently
+TOOL_CALL_MAX_WORKERS = int(os.getenv("TOOL_CALL_MAX_WORKERS", "4"))
+
+# --- Analysis Result Cache ---
+# Reuse stored LLM results for unchanged analyses (same PDF, prompt, model and reference data)
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+# Cache database file (defaults to data/result_cache.db)
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH")
+# Total size of cached results in bytes before the least recently used are evicted
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# --- SQLite Connection Pool ---
+# Maximum number of pooled connections handed out by database.connection.get_db_connection()
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+# Seconds to wait for a free pooled connection (also used as the SQLite busy timeout)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Memory-mapped I/O size in bytes for each pooled connection (0 disables mmap)
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+# Page cache size in KiB for each pooled connection
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "65536"))
+
+# --- Reference Data Snapshot ---
+# Minimum seconds between checks of the reference data version stamp by the in-memory store
+REFERENCE_CACHE_CHECK_INTERVAL = float(os.getenv("REFERENCE_CACHE_CHECK_INTERVAL", "5"))
 
 # Cronitor keys
 # CRONITOR_API_KEY = os.getenv("CRONITOR_API_KEY")
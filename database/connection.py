@@ -2,13 +2,21 @@
 Database connection management for SQLite.
 
 Provides connection utilities, context managers, and database setup.
+Connections are served from a thread-safe pool so that repeated lookups
+(for example LLM tool calls) reuse an open, tuned connection instead of
+paying for a fresh connect/close on every query.
 """
 
+import os
 import sqlite3
 import logging
+import threading
+import time
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Generator
+from typing import Generator, List, Optional, Tuple
+
+from config import DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_MMAP_SIZE, DB_CACHE_SIZE_KB
 
 
 logger = logging.getLogger(__name__)
@@ -17,28 +25,318 @@ logger = logging.getLogger(__name__)
 DB_PATH = Path(__file__).parent.parent / "data" / "evaluator.db"
 
 
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection that remembers which database file it was opened on."""
+    file_id: Optional[Tuple[int, int]] = None
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of reusable SQLite connections.
+
+    Idle connections are kept in a LIFO stack so the most recently used
+    (and therefore warmest) connection is handed out first, and each thread
+    prefers the connection it used last. Every connection is opened in WAL
+    mode with tuned pragmas and health-checked before it is handed out.
+
+    When the database file is replaced (see swap_database()), the pool
+    notices the new file identity on the next acquire, closes its idle
+    connections and lets checked-out ones drain as they are released.
+    """
+
+    def __init__(self, db_path: Path, max_size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT):
+        """
+        Initialize the connection pool.
+
+        Args:
+            db_path: Path to the SQLite database file
+            max_size: Maximum number of open connections
+            timeout: Seconds to wait for a free connection before failing
+        """
+        if max_size <= 0:
+            raise ValueError("Pool size must be positive")
+
+        self.db_path = Path(db_path)
+        self.max_size = max_size
+        self.timeout = timeout
+
+        self._idle: List[sqlite3.Connection] = []
+        self._file_id = _get_file_id(self.db_path)
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._local = threading.local()
+
+        # Ensure data directory exists once, not on every checkout
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def acquire(self) -> sqlite3.Connection:
+        """
+        Check out a healthy connection from the pool.
+
+        Returns:
+            sqlite3.Connection: Connection with row factory enabled
+
+        Raises:
+            TimeoutError: If no connection becomes available within the timeout
+        """
+        self._check_for_swap()
+        conn = self._checkout()
+
+        if conn is None:
+            conn = self._open_reserved()
+        elif not self._is_healthy(conn):
+            logger.warning("Discarding unhealthy pooled connection")
+            self._close_quietly(conn)
+            conn = self._open_reserved()
+
+        self._local.conn = conn
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """
+        Return a connection to the pool.
+
+        Any transaction left open by the caller is rolled back, matching the
+        behavior of closing an uncommitted connection.
+
+        Args:
+            conn: Connection previously obtained from acquire()
+        """
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            logger.warning(f"Dropping pooled connection after failed rollback: {e}")
+            self._discard(conn)
+            return
+
+        with self._condition:
+            if self._closed or getattr(conn, "file_id", None) != self._file_id:
+                # Pool closed, or the connection still points at a replaced database file
+                self._size -= 1
+                self._close_quietly(conn)
+            else:
+                self._idle.append(conn)
+            self._condition.notify()
+
+    def close_all(self) -> None:
+        """Close all idle connections and stop handing out new ones."""
+        with self._condition:
+            self._closed = True
+            while self._idle:
+                self._close_quietly(self._idle.pop())
+                self._size -= 1
+            self._condition.notify_all()
+        logger.debug(f"Connection pool closed for {self.db_path}")
+
+    def refresh(self) -> None:
+        """Drop idle connections so the next acquire reopens the database file."""
+        with self._condition:
+            self._file_id = _get_file_id(self.db_path)
+            while self._idle:
+                self._close_quietly(self._idle.pop())
+                self._size -= 1
+            self._condition.notify_all()
+        logger.info(f"Connection pool refreshed for {self.db_path}")
+
+    def _check_for_swap(self) -> None:
+        """Refresh the pool if the database file has been replaced since it was opened."""
+        if _get_file_id(self.db_path) != self._file_id:
+            logger.info("Database file was replaced; reopening pooled connections")
+            self.refresh()
+
+    def _checkout(self) -> Optional[sqlite3.Connection]:
+        """Take an idle connection, or reserve a slot for a new one (returns None)."""
+        deadline = time.monotonic() + self.timeout
+
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+
+                preferred = getattr(self._local, "conn", None)
+                if preferred is not None and preferred in self._idle:
+                    self._idle.remove(preferred)
+                    return preferred
+
+                if self._idle:
+                    return self._idle.pop()
+
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(
+                        f"Timed out after {self.timeout}s waiting for a database connection "
+                        f"(pool size {self.max_size})"
+                    )
+                self._condition.wait(remaining)
+
+    def _open_reserved(self) -> sqlite3.Connection:
+        """Open a new connection for a slot reserved by _checkout()."""
+        try:
+            return self._create_connection()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    def _create_connection(self) -> sqlite3.Connection:
+        """Open and configure a new SQLite connection."""
+        conn = sqlite3.connect(
+            str(self.db_path),
+            timeout=self.timeout,
+            check_same_thread=False,  # Connections move between threads via the pool
+            factory=PooledConnection
+        )
+        conn.row_factory = sqlite3.Row  # Enable dict-like access to rows
+
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute(f"PRAGMA mmap_size = {int(DB_MMAP_SIZE)}")
+        conn.execute(f"PRAGMA cache_size = {-int(DB_CACHE_SIZE_KB)}")
+
+        # The file only exists once the first connection has created it
+        with self._condition:
+            if self._file_id is None:
+                self._file_id = _get_file_id(self.db_path)
+            conn.file_id = self._file_id
+
+        logger.debug(f"Opened pooled connection to database: {self.db_path}")
+        return conn
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        """Close a checked-out connection and free its pool slot."""
+        self._close_quietly(conn)
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    @staticmethod
+    def _is_healthy(conn: sqlite3.Connection) -> bool:
+        """Check that a pooled connection is still usable."""
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn: sqlite3.Connection) -> None:
+        """Close a connection, ignoring errors from already-broken handles."""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+def _get_file_id(path: Path) -> Optional[Tuple[int, int]]:
+    """Identify a database file by device and inode (None if it does not exist)."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_connection_pool() -> ConnectionPool:
+    """
+    Get the shared connection pool for DB_PATH, creating it on first use.
+
+    Returns:
+        ConnectionPool: Process-wide pool for the application database
+    """
+    global _pool
+
+    with _pool_lock:
+        if _pool is None or _pool.db_path != Path(DB_PATH):
+            if _pool is not None:
+                _pool.close_all()
+            _pool = ConnectionPool(Path(DB_PATH))
+            logger.debug(f"Created connection pool for {DB_PATH} (size {_pool.max_size})")
+        return _pool
+
+
+def refresh_connection_pool() -> None:
+    """Close idle pooled connections so they are reopened on next use."""
+    with _pool_lock:
+        if _pool is not None:
+            _pool.refresh()
+
+
+def close_connection_pool() -> None:
+    """Close the shared connection pool, if one has been created."""
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
+
+
 @contextmanager
-def get_db_connection() -> Generator[sqlite3.Connection, None, None]:
+def get_db_connection(pooled: bool = True, db_path: Optional[Path] = None) -> Generator[sqlite3.Connection, None, None]:
     """
     Context manager for database connections.
-    
+
+    Args:
+        pooled: Reuse a connection from the shared pool (default). Pass False
+                for a dedicated connection that is closed on exit.
+        db_path: Database file other than DB_PATH (e.g. a shadow database);
+                 such connections are never pooled
+
     Yields:
         sqlite3.Connection: Database connection with row factory enabled
-        
+
     Example:
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM country")
             results = cursor.fetchall()
     """
+    if db_path is not None and Path(db_path) != Path(DB_PATH):
+        pooled = False
+
+    if not pooled:
+        with _get_dedicated_connection(db_path) as conn:
+            yield conn
+        return
+
+    pool = get_connection_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Database error: {e}")
+        raise
+
+    finally:
+        pool.release(conn)
+
+
+@contextmanager
+def _get_dedicated_connection(db_path: Optional[Path] = None) -> Generator[sqlite3.Connection, None, None]:
+    """Open a single unpooled connection (to DB_PATH by default) that is closed on exit."""
+    path = Path(db_path or DB_PATH)
     conn = None
     try:
         # Ensure data directory exists
-        DB_PATH.parent.mkdir(exist_ok=True)
+        path.parent.mkdir(exist_ok=True)
         
-        conn = sqlite3.connect(str(DB_PATH))
+        conn = sqlite3.connect(str(path))
         conn.row_factory = sqlite3.Row  # Enable dict-like access to rows
-        logger.debug(f"Connected to database: {DB_PATH}")
+        logger.debug(f"Connected to database: {path}")
         
         yield conn
         
@@ -54,6 +352,118 @@ def get_db_connection() -> Generator[sqlite3.Connection, None, None]:
             logger.debug("Database connection closed")
 
 
+@contextmanager
+def get_bulk_load_connection(db_path: Optional[Path] = None) -> Generator[sqlite3.Connection, None, None]:
+    """
+    Context manager for a dedicated connection tuned for bulk loading.
+    
+    Durability is relaxed for the duration of the load (synchronous=OFF and
+    an in-memory rollback journal); a crash mid-load can corrupt the file,
+    so only use this for data that is reloaded from Salesforce anyway.
+    When loading the live database the shared pool's idle connections are
+    closed first, because SQLite can only leave WAL mode when no other
+    connection is open, and WAL mode is restored on exit. A shadow database is left in rollback-journal
+    mode so it is a single self-contained file, ready for swap_database().
+    
+    Args:
+        db_path: Database file to load (defaults to DB_PATH)
+    
+    Yields:
+        sqlite3.Connection: Database connection with row factory enabled
+    """
+    is_live = db_path is None or Path(db_path) == Path(DB_PATH)
+    if is_live:
+        refresh_connection_pool()
+    
+    with _get_dedicated_connection(db_path) as conn:
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute(f"PRAGMA cache_size = {-int(DB_CACHE_SIZE_KB)}")
+        try:
+            conn.execute("PRAGMA journal_mode = MEMORY")
+        except sqlite3.OperationalError as e:
+            # Another process still has the database open in WAL mode
+            logger.info(f"Bulk load keeping the current journal mode: {e}")
+        
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.execute(f"PRAGMA journal_mode = {'WAL' if is_live else 'DELETE'}")
+
+
+def get_shadow_path() -> Path:
+    """
+    Get the path of the shadow database that migrations build into.
+    
+    Returns:
+        Path: Shadow file next to DB_PATH (same filesystem, so the swap is a rename)
+    """
+    return Path(DB_PATH).with_name(Path(DB_PATH).name + ".shadow")
+
+
+def create_shadow_database() -> Path:
+    """
+    Create an empty shadow database with the full schema.
+    
+    Any shadow left behind by an earlier failed run is discarded.
+    
+    Returns:
+        Path: Path of the new shadow database
+    """
+    shadow_path = get_shadow_path()
+    for leftover in (shadow_path, *_sidecar_files(shadow_path)):
+        leftover.unlink(missing_ok=True)
+    
+    with _get_dedicated_connection(shadow_path) as conn:
+        from database import schema
+        schema.create_all_tables(conn)
+    
+    logger.info(f"Created shadow database: {shadow_path}")
+    return shadow_path
+
+
+def swap_database(shadow_path: Path) -> None:
+    """
+    Atomically replace the live database with a fully built shadow database.
+    
+    The shadow is made a single self-contained file and the live WAL is
+    checkpointed and truncated, so no frames outlive the old file; then the
+    shadow is renamed over DB_PATH. The live -wal/-shm files are left in
+    place, since connections to the new file (in this and other processes)
+    may already be using them. Readers in this process
+    are refreshed immediately; pools in other processes notice the new file on
+    their next acquire and reopen. Connections already inside a query finish
+    against the old file.
+    
+    Args:
+        shadow_path: Shadow database built by create_shadow_database()
+    """
+    live_path = Path(DB_PATH)
+    
+    # Reopening the shadow in rollback-journal mode replays or removes any journal or WAL of its own
+    if any(sidecar.exists() for sidecar in _sidecar_files(shadow_path)):
+        with _get_dedicated_connection(shadow_path) as conn:
+            conn.execute("PRAGMA journal_mode = DELETE")
+        for sidecar in _sidecar_files(shadow_path):
+            sidecar.unlink(missing_ok=True)
+    
+    if live_path.exists():
+        with _get_dedicated_connection() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    
+    os.replace(shadow_path, live_path)
+    refresh_connection_pool()
+    
+    logger.info(f"Swapped shadow database into place: {live_path}")
+
+
+def _sidecar_files(path: Path) -> Tuple[Path, ...]:
+    """Get the journal, WAL and shared-memory files SQLite keeps next to a database."""
+    return tuple(path.with_name(path.name + suffix) for suffix in ("-journal", "-wal", "-shm"))
+
+
 def initialize_database() -> None:
     """
     Initialize the database and create tables if they don't exist.
@@ -0,0 +1,286 @@
+"""
+Fuzzy and transliteration-aware matching for reference data.
+
+Builds a trigram index (plus a country alias table) at migration time and
+answers lookups with scored candidates. Queries only read the postings for
+the trigrams in the search text within one entity type and country, then
+re-rank a small candidate set by edit distance, so cost stays independent
+of the overall table size.
+"""
+
+import sqlite3
+import logging
+from typing import List, Dict, Any, Tuple
+
+from utils.helpers import fold_text, text_trigrams, text_similarity
+from .connection import get_db_connection
+
+
+logger = logging.getLogger(__name__)
+
+ENTITY_COUNTRY = "country"
+ENTITY_INSTITUTION = "institution"
+ENTITY_FOREIGN_CREDENTIAL = "foreign_credential"
+
+# Candidates fetched from the trigram index before edit-distance re-ranking
+CANDIDATE_LIMIT = 50
+
+# Longest query (in characters) considered for matching
+MAX_QUERY_LENGTH = 200
+
+# Groups of equivalent country names (already folded). Every name in a group
+# resolves to whichever member exists in the country table.
+COUNTRY_ALIAS_GROUPS = [
+    {"vietnam", "viet nam", "socialist republic of vietnam"},
+    {"turkey", "turkiye", "republic of turkiye"},
+    {"united states", "united states of america", "usa", "u s a", "us"},
+    {"united kingdom", "uk", "great britain", "united kingdom of great britain and northern ireland"},
+    {"south korea", "korea south", "republic of korea", "korea republic of"},
+    {"north korea", "korea north", "democratic people s republic of korea", "dprk"},
+    {"russia", "russian federation"},
+    {"iran", "islamic republic of iran", "iran islamic republic of"},
+    {"syria", "syrian arab republic"},
+    {"laos", "lao people s democratic republic", "lao pdr"},
+    {"czech republic", "czechia"},
+    {"ivory coast", "cote d ivoire"},
+    {"myanmar", "burma"},
+    {"eswatini", "swaziland"},
+    {"north macedonia", "macedonia", "republic of north macedonia"},
+    {"cape verde", "cabo verde"},
+    {"moldova", "republic of moldova"},
+    {"tanzania", "united republic of tanzania"},
+    {"bolivia", "plurinational state of bolivia"},
+    {"venezuela", "bolivarian republic of venezuela"},
+    {"netherlands", "the netherlands", "holland"},
+    {"united arab emirates", "uae"},
+    {"democratic republic of the congo", "drc", "congo kinshasa", "dr congo"},
+    {"republic of the congo", "congo brazzaville"},
+    {"palestine", "state of palestine", "palestinian territories"},
+    {"timor leste", "east timor"},
+    {"brunei", "brunei darussalam"},
+    {"hong kong", "hong kong sar"},
+    {"macau", "macao", "macao sar"},
+    {"kyrgyzstan", "kyrgyz republic"},
+    {"vatican city", "holy see"},
+    {"micronesia", "federated states of micronesia"},
+    {"gambia", "the gambia"},
+    {"bahamas", "the bahamas"},
+    {"philippines", "the philippines"},
+]
+
+
+def build_match_index(conn: sqlite3.Connection) -> Dict[str, int]:
+    """
+    Rebuild the trigram and alias index from the reference tables.
+
+    Called at the end of a migration, after all reference tables are loaded.
+
+    Args:
+        conn: Open connection to the database being migrated
+
+    Returns:
+        Dict[str, int]: Number of indexed terms per entity type and aliases
+    """
+    logger.info("Building fuzzy matching index...")
+
+    conn.execute("DELETE FROM search_trigram")
+    conn.execute("DELETE FROM search_term")
+    conn.execute("DELETE FROM entity_alias")
+
+    # (entity_type, scope, entity_key, folded_text)
+    terms: List[Tuple[str, str, str, str]] = []
+    aliases: List[Tuple[str, str, str]] = []
+
+    for (country_name,) in conn.execute("SELECT country_name FROM country"):
+        folded = fold_text(country_name)
+        terms.append((ENTITY_COUNTRY, "", country_name, folded))
+
+        for group in COUNTRY_ALIAS_GROUPS:
+            if folded in group:
+                for alias in sorted(group - {folded}):
+                    aliases.append((ENTITY_COUNTRY, alias, country_name))
+                    terms.append((ENTITY_COUNTRY, "", country_name, alias))
+
+    for institution_uuid, country_name, name, english_name in conn.execute("""
+        SELECT institution_uuid, country_name, institution_name, institution_english_name
+        FROM institution
+    """):
+        for text in {fold_text(name), fold_text(english_name)} - {""}:
+            terms.append((ENTITY_INSTITUTION, country_name, institution_uuid, text))
+
+    for credential_uuid, country_name, foreign, english in conn.execute("""
+        SELECT credential_uuid, country_name, foreign_credential, english_credential
+        FROM foreign_credential
+    """):
+        for text in {fold_text(foreign), fold_text(english)} - {""}:
+            terms.append((ENTITY_FOREIGN_CREDENTIAL, country_name, credential_uuid, text))
+
+    conn.executemany("""
+        INSERT INTO search_term (term_id, entity_type, scope, entity_key, folded_text)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(term_id, *term) for term_id, term in enumerate(terms, 1)])
+
+    conn.executemany("""
+        INSERT OR IGNORE INTO search_trigram (entity_type, scope, trigram, term_id)
+        VALUES (?, ?, ?, ?)
+    """, (
+        (entity_type, scope, trigram, term_id)
+        for term_id, (entity_type, scope, _, text) in enumerate(terms, 1)
+        for trigram in text_trigrams(text)
+    ))
+
+    conn.executemany(
+        "INSERT OR IGNORE INTO entity_alias (entity_type, alias, entity_key) VALUES (?, ?, ?)",
+        aliases
+    )
+
+    conn.commit()
+
+    counts = {
+        entity_type: sum(1 for term in terms if term[0] == entity_type)
+        for entity_type in (ENTITY_COUNTRY, ENTITY_INSTITUTION, ENTITY_FOREIGN_CREDENTIAL)
+    }
+    counts["aliases"] = len(aliases)
+    logger.info(f"Fuzzy matching index built: {counts}")
+    return counts
+
+
+def match_countries(query: str, limit: int = 5, min_score: float = 0.45) -> List[Dict[str, Any]]:
+    """
+    Find countries whose name or alias approximately matches the query.
+
+    Args:
+        query: Country name as written (any spelling, script accents, or alias)
+        limit: Maximum number of candidates to return
+        min_score: Minimum similarity score (0-1) for a candidate
+
+    Returns:
+        List[Dict]: Candidates with entity_key (country_name), matched_text, score and match_type
+    """
+    return _find_matches(ENTITY_COUNTRY, "", query, limit, min_score)
+
+
+def match_institutions(country_name: str, query: str, limit: int = 10,
+                       min_score: float = 0.4) -> List[Dict[str, Any]]:
+    """
+    Find institutions in a country whose native or English name approximately matches.
+
+    Args:
+        country_name: Exact country name
+        query: Institution name as written (possibly misspelled or OCR-garbled)
+        limit: Maximum number of candidates to return
+        min_score: Minimum similarity score (0-1) for a candidate
+
+    Returns:
+        List[Dict]: Candidates with entity_key (institution_uuid), matched_text, score and match_type
+    """
+    return _find_matches(ENTITY_INSTITUTION, country_name, query, limit, min_score)
+
+
+def match_foreign_credentials(country_name: str, query: str, limit: int = 10,
+                              min_score: float = 0.4) -> List[Dict[str, Any]]:
+    """
+    Find foreign credentials in a country whose foreign or English name approximately matches.
+
+    Args:
+        country_name: Exact country name
+        query: Credential name as written
+        limit: Maximum number of candidates to return
+        min_score: Minimum similarity score (0-1) for a candidate
+
+    Returns:
+        List[Dict]: Candidates with entity_key (credential_uuid), matched_text, score and match_type
+    """
+    return _find_matches(ENTITY_FOREIGN_CREDENTIAL, country_name, query, limit, min_score)
+
+
+def score_text_match(query: str, candidate: str) -> float:
+    """
+    Score how well folded candidate text matches a folded query.
+
+    Blends trigram overlap with edit-distance similarity, taking the better
+    of whole-string and per-word similarity so that short queries still
+    score well against long official names.
+
+    Args:
+        query: Folded query text
+        candidate: Folded candidate text
+
+    Returns:
+        float: Score between 0.0 and 1.0
+    """
+    if not query or not candidate:
+        return 0.0
+    if query == candidate:
+        return 1.0
+
+    query_grams = text_trigrams(query)
+    candidate_grams = text_trigrams(candidate)
+    total = len(query_grams) + len(candidate_grams)
+    dice = 2 * len(query_grams & candidate_grams) / total if total else 0.0
+
+    candidate_words = candidate.split()
+    word_scores = [
+        max(text_similarity(word, other) for other in candidate_words)
+        for word in query.split()
+    ]
+    word_score = sum(word_scores) / len(word_scores)
+
+    return round(0.4 * dice + 0.6 * max(text_similarity(query, candidate), word_score), 4)
+
+
+def _find_matches(entity_type: str, scope: str, query: str, limit: int,
+                  min_score: float) -> List[Dict[str, Any]]:
+    """Look up trigram candidates for one entity type and scope and re-rank them."""
+    folded_query = fold_text((query or "")[:MAX_QUERY_LENGTH])
+    query_grams = sorted(text_trigrams(folded_query))
+    if not query_grams:
+        return []
+
+    placeholders = ", ".join("?" for _ in query_grams)
+
+    with get_db_connection() as conn:
+        try:
+            alias_row = conn.execute(
+                "SELECT entity_key FROM entity_alias WHERE entity_type = ? AND alias = ?",
+                (entity_type, folded_query)
+            ).fetchone()
+
+            candidates = conn.execute(f"""
+                SELECT t.entity_key, t.folded_text
+                FROM search_trigram g
+                JOIN search_term t ON t.term_id = g.term_id
+                WHERE g.entity_type = ? AND g.scope = ? AND g.trigram IN ({placeholders})
+                GROUP BY g.term_id
+                ORDER BY COUNT(*) DESC
+                LIMIT ?
+            """, (entity_type, scope, *query_grams, CANDIDATE_LIMIT)).fetchall()
+
+        except sqlite3.OperationalError as e:
+            # Databases migrated before the match index existed
+            logger.debug(f"Fuzzy match index unavailable: {e}")
+            return []
+
+    best: Dict[str, Dict[str, Any]] = {}
+
+    if alias_row:
+        best[alias_row['entity_key']] = {
+            "entity_key": alias_row['entity_key'],
+            "matched_text": folded_query,
+            "score": 1.0,
+            "match_type": "alias"
+        }
+
+    for row in candidates:
+        score = score_text_match(folded_query, row['folded_text'])
+        key = row['entity_key']
+        if score >= min_score and (key not in best or score > best[key]["score"]):
+            best[key] = {
+                "entity_key": key,
+                "matched_text": row['folded_text'],
+                "score": score,
+                "match_type": "fuzzy"
+            }
+
+    ranked = sorted(best.values(), key=lambda match: match["score"], reverse=True)
+    return ranked[:limit]
@@ -6,15 +6,143 @@ Handles the ETL process from Salesforce to SQLite.
 
 import sqlite3
 import logging
+import time
 import uuid
-from typing import List, Dict, Any, Optional
+from datetime import datetime, timezone
+from pathlib import Path
+from itertools import islice
+from typing import List, Dict, Any, Optional, Set, Tuple, Iterable, Iterator
 from salesforce.extractors import SalesforceExtractor
-from database.connection import get_db_connection
+from database.connection import (
+    get_db_connection, get_bulk_load_connection, create_shadow_database, swap_database
+)
+from database.queries import get_database_statistics, validate_data_integrity
+from database.schema import rebuild_institution_search_index, create_indexes, drop_indexes
+from database.matching import build_match_index
+from database.reference_store import bump_reference_version, get_reference_store
 from utils.helpers import clean_string, validate_country_name
+from config import SF_PAGE_SIZE
 
 
 logger = logging.getLogger(__name__)
 
+# Namespace for deterministic row keys derived from Salesforce record Ids
+SALESFORCE_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "salesforce:Credentials_Form_Setup_Data__c")
+
+# Tables kept up to date by the incremental sync. Columns are the key column,
+# then country_name (country_scoped) or the cleaned Key__c, then one column
+# per Salesforce value field.
+SYNC_TABLES: List[Dict[str, Any]] = [
+    {
+        "table": "foreign_credential",
+        "record_type": "Country",
+        "fields": ["Value_1__c", "Value_2__c", "Value_3__c"],
+        "columns": ["credential_uuid", "country_name", "foreign_credential", "english_credential", "additional_info"],
+        "country_scoped": True
+    },
+    {
+        "table": "institution",
+        "record_type": "Country Institute",
+        "fields": ["Value_1__c", "Value_2__c", "Value_3__c", "Value_4__c"],
+        "columns": ["institution_uuid", "country_name", "institution_name", "institution_english_name",
+                    "institution_history", "accreditation_status"],
+        "country_scoped": True
+    },
+    {
+        "table": "program_length",
+        "record_type": "Program Length",
+        "fields": ["Value_1__c"],
+        "columns": ["program_length_uuid", "country_name", "program_length"],
+        "country_scoped": True
+    },
+    {
+        "table": "grade_scale",
+        "record_type": "Country Grade",
+        "fields": ["Value_1__c", "Value_2__c", "Value_3__c", "Value_5__c"],
+        "columns": ["grade_scale_uuid", "country_name", "grade_scale", "bifurcation_setup", "grade_notes", "conversion_factor"],
+        "country_scoped": True
+    },
+    {
+        "table": "us_equivalency",
+        "record_type": "All Equivalncy",
+        "fields": ["Value_1__c"],
+        "columns": ["equivalency_uuid", "overall_equivalency", "equivalency_description"],
+        "country_scoped": False
+    },
+    {
+        "table": "notes",
+        "record_type": None,
+        "condition": "Key__c LIKE '%note%'",
+        "fields": [],
+        "columns": ["note_uuid", "note_content"],
+        "country_scoped": False
+    },
+]
+
+
+def record_uuid(record: Dict[str, Any]) -> str:
+    """
+    Get the primary key for a Salesforce record.
+    
+    Derived from the record Id so that the same record always maps to the
+    same row across full migrations and incremental syncs.
+    
+    Args:
+        record: Salesforce record
+        
+    Returns:
+        str: UUID string (random if the record has no Id)
+    """
+    sf_id = record.get('Id')
+    if not sf_id:
+        return str(uuid.uuid4())
+    return str(uuid.uuid5(SALESFORCE_ID_NAMESPACE, sf_id))
+
+
+def to_soql_datetime(modstamp: str) -> str:
+    """
+    Convert a SystemModstamp value to a SOQL datetime literal.
+    
+    Truncated to whole seconds; callers query with >= so nothing is missed.
+    
+    Args:
+        modstamp: Salesforce datetime (e.g. 2024-01-31T08:00:00.000+0000)
+        
+    Returns:
+        str: SOQL datetime literal in UTC (e.g. 2024-01-31T08:00:00Z)
+    """
+    parsed = datetime.strptime(modstamp, "%Y-%m-%dT%H:%M:%S.%f%z")
+    return parsed.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class RecordStream:
+    """
+    Single-pass view over extracted records that remembers what it has seen.
+    
+    Loaders consume records as a stream, so the sync high-water mark and
+    record count are tracked on the way through instead of being computed
+    from a materialized list afterwards.
+    """
+    
+    def __init__(self, records: Iterable[Dict[str, Any]]):
+        """
+        Wrap a list or iterator of Salesforce records.
+        
+        Args:
+            records: Records from a SalesforceExtractor get_* method
+        """
+        self._records = records
+        self.count = 0
+        self.latest_modstamp: Optional[str] = None
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for record in self._records:
+            self.count += 1
+            modstamp = record.get('SystemModstamp')
+            if modstamp and (self.latest_modstamp is None or modstamp > self.latest_modstamp):
+                self.latest_modstamp = modstamp
+            yield record
+
 
 class DataMigrator:
     """Handles ETL operations from Salesforce to SQLite."""
@@ -27,391 +155,725 @@ class DataMigrator:
             sf_extractor: Configured Salesforce extractor instance
         """
         self.sf_extractor = sf_extractor
+        # Database being loaded: None for the live database, or a shadow file during a full migration
+        self.db_path: Optional[Path] = None
     
     def run_full_migration(self) -> None:
         """
         Run the complete ETL pipeline.
         
-        1. Extract countries and populate Country table
-        2. Extract and load Foreign Credentials
-        3. Extract and load Institutions
-        4. Extract and load Program Lengths
-        5. Extract and load Grade Scales
-        6. Extract and load US Equivalencies
-        7. Extract and load Notes
+        Everything is loaded into a fresh shadow database, which replaces the
+        live database only after it passes validation, so readers never see
+        partially loaded tables. If any step fails the live database is left
+        untouched and the shadow file is kept for inspection.
+        
+        1-7. Extract all seven object types concurrently; load Countries
+             first, then Foreign Credentials, Institutions, Program Lengths,
+             Grade Scales, US Equivalencies and Notes as their queries finish
+        8. Build the fuzzy matching index
+        9. Publish a new reference data version stamp
+        10. Validate the shadow database and swap it into place
         """
         logger.info("Starting full data migration from Salesforce...")
         
+        self.db_path = create_shadow_database()
+        
         try:
-            # Step 1: Countries (master reference)
-            self.migrate_countries()
-            
-            # Step 2: Foreign Credentials
-            self.migrate_foreign_credentials()
-            
-            # Step 3: Institutions
-            self.migrate_institutions()
+            # Steps 1-7: Concurrent extraction, loaded as each object type arrives
+            self.extract_and_load()
             
-            # Step 4: Program Lengths
-            self.migrate_program_lengths()
+            # Step 8: Fuzzy matching index over the loaded reference data
+            self.build_search_indexes()
             
-            # Step 5: Grade Scales
-            self.migrate_grade_scales()
+            # Step 9: Publish a new reference data version for cached readers
+            self.publish_reference_version()
             
-            # Step 6: US Equivalencies (standalone)
-            self.migrate_us_equivalencies()
-            
-            # Step 7: Notes (standalone)
-            self.migrate_notes()
+            # Step 10: Validate the shadow database, then atomically replace the live one
+            self.validate_shadow_database()
+            swap_database(self.db_path)
+            get_reference_store().invalidate()
             
             logger.info("Full data migration completed successfully")
             
         except Exception as e:
-            logger.error(f"Migration failed: {e}")
+            logger.error(f"Migration failed (live database unchanged; shadow kept at {self.db_path}): {e}")
             raise
+        
+        finally:
+            self.db_path = None
+    
+    def extract_and_load(self) -> None:
+        """
+        Extract every object type concurrently and load each as it streams in.
+        
+        Countries are the master reference for the per-country tables, so
+        they are loaded first; the other object types follow in the order
+        their first page arrives. Records flow page by page from Salesforce
+        into the bulk loader, so no object type is ever held in memory whole.
+        """
+        loaders = {
+            "countries": self.migrate_countries,
+            "foreign_credentials": self.migrate_foreign_credentials,
+            "institutions": self.migrate_institutions,
+            "program_lengths": self.migrate_program_lengths,
+            "grade_scales": self.migrate_grade_scales,
+            "us_equivalencies": self.migrate_us_equivalencies,
+            "notes": self.migrate_notes,
+        }
+        jobs = {name: (lambda extractor, name=name: getattr(extractor, f"get_{name}")(stream=True))
+                for name in loaders if name != "countries"}
+        # A single aggregate page; GROUP BY queries cannot be paged with query_more
+        jobs["countries"] = lambda extractor: extractor.get_countries()
+        
+        for name, records in self.sf_extractor.extract_concurrently(jobs, priority=["countries"]):
+            loaders[name](records)
     
-    def migrate_countries(self) -> None:
-        """Extract unique countries and populate Country table."""
+    def migrate_countries(self, countries: Optional[Iterable[Dict[str, Any]]] = None) -> None:
+        """
+        Extract unique countries and populate Country table.
+        
+        Args:
+            countries: Records already extracted from Salesforce (extracted here if omitted)
+        """
         logger.info("Migrating countries...")
         
         # Extract country data from Salesforce
-        countries = self.sf_extractor.get_countries()
-        
-        with get_db_connection() as conn:
-            inserted_count = 0
-            for country_record in countries:
-                country_name = country_record.get('Key__c')
-                if country_name:
-                    success = self._insert_country(conn, country_name)
-                    if success:
-                        inserted_count += 1
-                        logger.debug(f"Inserted country: {country_name}")
+        if countries is None:
+            countries = self.sf_extractor.get_countries()
+        
+        # Stage cleaned, de-duplicated names (first occurrence wins)
+        staged = {}
+        for country_record in countries:
+            country_name = country_record.get('Key__c')
+            if not country_name:
+                continue
             
-            conn.commit()
-            logger.info(f"Countries migration completed - inserted {inserted_count} countries")
+            cleaned_name = clean_string(country_name)
+            if not cleaned_name or not validate_country_name(cleaned_name):
+                logger.warning(f"Invalid country name: {country_name}")
+                continue
+            staged.setdefault(cleaned_name, (cleaned_name,))
+        
+        with get_bulk_load_connection(self.db_path) as conn:
+            inserted_count, _, rate = self._bulk_insert(
+                conn, "country", ["country_name"], list(staged.values()), on_conflict="IGNORE"
+            )
+            logger.info(f"Countries migration completed - inserted {inserted_count} countries ({rate:,.0f} rows/sec)")
     
-    def migrate_foreign_credentials(self) -> None:
-        """Extract and load Foreign Credential data."""
+    def migrate_foreign_credentials(self, credentials: Optional[Iterable[Dict[str, Any]]] = None) -> None:
+        """
+        Extract and load Foreign Credential data.
+        
+        Args:
+            credentials: Records already extracted from Salesforce (extracted here if omitted)
+        """
         logger.info("Migrating foreign credentials...")
         
         # Extract foreign credential data from Salesforce
-        credentials = self.sf_extractor.get_foreign_credentials()
+        if credentials is None:
+            credentials = self.sf_extractor.get_foreign_credentials()
         
-        with get_db_connection() as conn:
-            inserted_count = 0
+        with get_bulk_load_connection(self.db_path) as conn:
+            known_countries = self._load_country_names(conn)
+            records = RecordStream(credentials)
             skipped_count = 0
             
-            for cred_record in credentials:
-                country_name = cred_record.get('Key__c')
-                foreign_credential = cred_record.get('Value_1__c')
-                english_credential = cred_record.get('Value_2__c')
-                additional_info = cred_record.get('Value_3__c')
-                
-                if not country_name:
-                    skipped_count += 1
-                    continue
-                
-                # Check if country exists
-                if not self._country_exists(conn, country_name):
-                    logger.warning(f"Country not found for foreign credential: {country_name}")
-                    skipped_count += 1
-                    continue
-                
-                # Insert foreign credential with UUID
-                try:
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        INSERT INTO foreign_credential 
-                        (credential_uuid, country_name, foreign_credential, english_credential, additional_info)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (
-                        str(uuid.uuid4()),
-                        country_name,
-                        clean_string(foreign_credential),
-                        clean_string(english_credential),
-                        clean_string(additional_info)
-                    ))
-                    inserted_count += 1
+            def stage_rows() -> Iterator[Tuple]:
+                nonlocal skipped_count
+                for cred_record in records:
+                    country_name = cred_record.get('Key__c')
                     
-                except Exception as e:
-                    logger.error(f"Failed to insert foreign credential for {country_name}: {e}")
-                    skipped_count += 1
+                    if not country_name:
+                        skipped_count += 1
+                        continue
+                    
+                    # Check if country exists
+                    if country_name not in known_countries:
+                        logger.warning(f"Country not found for foreign credential: {country_name}")
+                        skipped_count += 1
+                        continue
+                    
+                    yield (
+                        record_uuid(cred_record),
+                        country_name,
+                        clean_string(cred_record.get('Value_1__c')),
+                        clean_string(cred_record.get('Value_2__c')),
+                        clean_string(cred_record.get('Value_3__c'))
+                    )
             
-            conn.commit()
-            logger.info(f"Foreign credentials migration completed - inserted {inserted_count}, skipped {skipped_count}")
+            inserted_count, failed_count, rate = self._bulk_insert(
+                conn, "foreign_credential",
+                ["credential_uuid", "country_name", "foreign_credential", "english_credential", "additional_info"],
+                stage_rows(), on_conflict="REPLACE"
+            )
+            skipped_count += failed_count
+            self._save_sync_state(conn, "foreign_credential", records.latest_modstamp, records.count)
+            logger.info(f"Foreign credentials migration completed - inserted {inserted_count}, skipped {skipped_count} ({rate:,.0f} rows/sec)")
     
-    def migrate_institutions(self) -> None:
-        """Extract and load Institution data."""
+    def migrate_institutions(self, institutions: Optional[Iterable[Dict[str, Any]]] = None) -> None:
+        """
+        Extract and load Institution data.
+        
+        Args:
+            institutions: Records already extracted from Salesforce (extracted here if omitted)
+        """
         logger.info("Migrating institutions...")
         
         # Extract institution data from Salesforce
-        institutions = self.sf_extractor.get_institutions()
+        if institutions is None:
+            institutions = self.sf_extractor.get_institutions()
         
-        with get_db_connection() as conn:
-            inserted_count = 0
+        with get_bulk_load_connection(self.db_path) as conn:
+            known_countries = self._load_country_names(conn)
+            records = RecordStream(institutions)
             skipped_count = 0
             
-            for inst_record in institutions:
-                country_name = inst_record.get('Key__c')
-                institution_name = inst_record.get('Value_1__c')
-                institution_english_name = inst_record.get('Value_2__c')
-                institution_history = inst_record.get('Value_3__c')
-                accreditation_status = inst_record.get('Value_4__c')
-                
-                if not country_name:
-                    skipped_count += 1
-                    continue
-                
-                # Check if country exists
-                if not self._country_exists(conn, country_name):
-                    logger.warning(f"Country not found for institution: {country_name}")
-                    skipped_count += 1
-                    continue
-                
-                # Insert institution with UUID
-                try:
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        INSERT INTO institution 
-                        (institution_uuid, country_name, institution_name, institution_english_name, institution_history, accreditation_status)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    """, (
-                        str(uuid.uuid4()),
-                        country_name,
-                        clean_string(institution_name),
-                        clean_string(institution_english_name),
-                        clean_string(institution_history),
-                        clean_string(accreditation_status)
-                    ))
-                    inserted_count += 1
+            def stage_rows() -> Iterator[Tuple]:
+                nonlocal skipped_count
+                for inst_record in records:
+                    country_name = inst_record.get('Key__c')
                     
-                except Exception as e:
-                    logger.error(f"Failed to insert institution for {country_name}: {e}")
-                    skipped_count += 1
+                    if not country_name:
+                        skipped_count += 1
+                        continue
+                    
+                    # Check if country exists
+                    if country_name not in known_countries:
+                        logger.warning(f"Country not found for institution: {country_name}")
+                        skipped_count += 1
+                        continue
+                    
+                    yield (
+                        record_uuid(inst_record),
+                        country_name,
+                        clean_string(inst_record.get('Value_1__c')),
+                        clean_string(inst_record.get('Value_2__c')),
+                        clean_string(inst_record.get('Value_3__c')),
+                        clean_string(inst_record.get('Value_4__c'))
+                    )
             
+            inserted_count, failed_count, rate = self._bulk_insert(
+                conn, "institution",
+                ["institution_uuid", "country_name", "institution_name", "institution_english_name",
+                 "institution_history", "accreditation_status"],
+                stage_rows(), on_conflict="REPLACE"
+            )
+            skipped_count += failed_count
+            self._save_sync_state(conn, "institution", records.latest_modstamp, records.count)
+            
+            # Refresh the full-text index over the loaded institutions
+            rebuild_institution_search_index(conn)
             conn.commit()
-            logger.info(f"Institutions migration completed - inserted {inserted_count}, skipped {skipped_count}")
+            
+            logger.info(f"Institutions migration completed - inserted {inserted_count}, skipped {skipped_count} ({rate:,.0f} rows/sec)")
     
-    def migrate_program_lengths(self) -> None:
-        """Extract and load Program Length data."""
+    def migrate_program_lengths(self, programs: Optional[Iterable[Dict[str, Any]]] = None) -> None:
+        """
+        Extract and load Program Length data.
+        
+        Args:
+            programs: Records already extracted from Salesforce (extracted here if omitted)
+        """
         logger.info("Migrating program lengths...")
         
         # Extract program length data from Salesforce
-        programs = self.sf_extractor.get_program_lengths()
+        if programs is None:
+            programs = self.sf_extractor.get_program_lengths()
         
-        with get_db_connection() as conn:
-            inserted_count = 0
+        with get_bulk_load_connection(self.db_path) as conn:
+            known_countries = self._load_country_names(conn)
+            records = RecordStream(programs)
             skipped_count = 0
             
-            for prog_record in programs:
-                country_name = prog_record.get('Key__c')
-                program_length = prog_record.get('Value_1__c')
-                
-                if not country_name:
-                    skipped_count += 1
-                    continue
-                
-                # Check if country exists
-                if not self._country_exists(conn, country_name):
-                    logger.warning(f"Country not found for program length: {country_name}")
-                    skipped_count += 1
-                    continue
-                
-                # Insert program length with UUID
-                try:
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        INSERT INTO program_length (program_length_uuid, country_name, program_length)
-                        VALUES (?, ?, ?)
-                    """, (
-                        str(uuid.uuid4()),
-                        country_name,
-                        clean_string(program_length)
-                    ))
-                    inserted_count += 1
+            def stage_rows() -> Iterator[Tuple]:
+                nonlocal skipped_count
+                for prog_record in records:
+                    country_name = prog_record.get('Key__c')
                     
-                except Exception as e:
-                    logger.error(f"Failed to insert program length for {country_name}: {e}")
-                    skipped_count += 1
+                    if not country_name:
+                        skipped_count += 1
+                        continue
+                    
+                    # Check if country exists
+                    if country_name not in known_countries:
+                        logger.warning(f"Country not found for program length: {country_name}")
+                        skipped_count += 1
+                        continue
+                    
+                    yield (
+                        record_uuid(prog_record),
+                        country_name,
+                        clean_string(prog_record.get('Value_1__c'))
+                    )
             
-            conn.commit()
-            logger.info(f"Program lengths migration completed - inserted {inserted_count}, skipped {skipped_count}")
+            inserted_count, failed_count, rate = self._bulk_insert(
+                conn, "program_length", ["program_length_uuid", "country_name", "program_length"], stage_rows(), on_conflict="REPLACE"
+            )
+            skipped_count += failed_count
+            self._save_sync_state(conn, "program_length", records.latest_modstamp, records.count)
+            logger.info(f"Program lengths migration completed - inserted {inserted_count}, skipped {skipped_count} ({rate:,.0f} rows/sec)")
     
-    def migrate_grade_scales(self) -> None:
-        """Extract and load Grade Scale data."""
+    def migrate_grade_scales(self, scales: Optional[Iterable[Dict[str, Any]]] = None) -> None:
+        """
+        Extract and load Grade Scale data.
+        
+        Args:
+            scales: Records already extracted from Salesforce (extracted here if omitted)
+        """
         logger.info("Migrating grade scales...")
         
         # Extract grade scale data from Salesforce
-        scales = self.sf_extractor.get_grade_scales()
+        if scales is None:
+            scales = self.sf_extractor.get_grade_scales()
         
-        with get_db_connection() as conn:
-            inserted_count = 0
+        with get_bulk_load_connection(self.db_path) as conn:
+            known_countries = self._load_country_names(conn)
+            records = RecordStream(scales)
             skipped_count = 0
             
-            for scale_record in scales:
-                country_name = scale_record.get('Key__c')
-                grade_scale = scale_record.get('Value_1__c')
-                bifurcation_setup = scale_record.get('Value_2__c')
-                grade_notes = scale_record.get('Value_3__c')
-                conversion_factor = scale_record.get('Value_5__c')
-                
-                if not country_name:
-                    skipped_count += 1
-                    continue
-                
-                # Check if country exists
-                if not self._country_exists(conn, country_name):
-                    logger.warning(f"Country not found for grade scale: {country_name}")
-                    skipped_count += 1
-                    continue
-                
-                # Insert grade scale with UUID
-                try:
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        INSERT INTO grade_scale 
-                        (grade_scale_uuid, country_name, grade_scale, bifurcation_setup, grade_notes, conversion_factor)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    """, (
-                        str(uuid.uuid4()),
-                        country_name,
-                        clean_string(grade_scale),
-                        clean_string(bifurcation_setup),
-                        clean_string(grade_notes),
-                        clean_string(conversion_factor)
-                    ))
-                    inserted_count += 1
+            def stage_rows() -> Iterator[Tuple]:
+                nonlocal skipped_count
+                for scale_record in records:
+                    country_name = scale_record.get('Key__c')
                     
-                except Exception as e:
-                    logger.error(f"Failed to insert grade scale for {country_name}: {e}")
-                    skipped_count += 1
+                    if not country_name:
+                        skipped_count += 1
+                        continue
+                    
+                    # Check if country exists
+                    if country_name not in known_countries:
+                        logger.warning(f"Country not found for grade scale: {country_name}")
+                        skipped_count += 1
+                        continue
+                    
+                    yield (
+                        record_uuid(scale_record),
+                        country_name,
+                        clean_string(scale_record.get('Value_1__c')),
+                        clean_string(scale_record.get('Value_2__c')),
+                        clean_string(scale_record.get('Value_3__c')),
+                        clean_string(scale_record.get('Value_5__c'))
+                    )
             
-            conn.commit()
-            logger.info(f"Grade scales migration completed - inserted {inserted_count}, skipped {skipped_count}")
+            inserted_count, failed_count, rate = self._bulk_insert(
+                conn, "grade_scale",
+                ["grade_scale_uuid", "country_name", "grade_scale", "bifurcation_setup", "grade_notes", "conversion_factor"],
+                stage_rows(), on_conflict="REPLACE"
+            )
+            skipped_count += failed_count
+            self._save_sync_state(conn, "grade_scale", records.latest_modstamp, records.count)
+            logger.info(f"Grade scales migration completed - inserted {inserted_count}, skipped {skipped_count} ({rate:,.0f} rows/sec)")
     
-    def migrate_us_equivalencies(self) -> None:
-        """Extract and load US Equivalency data."""
+    def migrate_us_equivalencies(self, equivalencies: Optional[Iterable[Dict[str, Any]]] = None) -> None:
+        """
+        Extract and load US Equivalency data.
+        
+        Args:
+            equivalencies: Records already extracted from Salesforce (extracted here if omitted)
+        """
         logger.info("Migrating US equivalencies...")
         
         # Extract US equivalency data from Salesforce
-        equivalencies = self.sf_extractor.get_us_equivalencies()
+        if equivalencies is None:
+            equivalencies = self.sf_extractor.get_us_equivalencies()
         
-        with get_db_connection() as conn:
-            inserted_count = 0
-            skipped_count = 0
-            
-            for equiv_record in equivalencies:
+        records = RecordStream(equivalencies)
+        skipped_count = 0
+        
+        def stage_rows() -> Iterator[Tuple]:
+            nonlocal skipped_count
+            for equiv_record in records:
                 overall_equivalency = equiv_record.get('Key__c')
-                equivalency_description = equiv_record.get('Value_1__c')
                 
                 if not overall_equivalency:
                     skipped_count += 1
                     continue
                 
-                # Insert US equivalency with UUID (standalone table)
-                try:
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        INSERT INTO us_equivalency (equivalency_uuid, overall_equivalency, equivalency_description)
-                        VALUES (?, ?, ?)
-                    """, (
-                        str(uuid.uuid4()),
-                        clean_string(overall_equivalency),
-                        clean_string(equivalency_description)
-                    ))
-                    inserted_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"Failed to insert US equivalency {overall_equivalency}: {e}")
-                    skipped_count += 1
-            
-            conn.commit()
-            logger.info(f"US equivalencies migration completed - inserted {inserted_count}, skipped {skipped_count}")
+                yield (
+                    record_uuid(equiv_record),
+                    clean_string(overall_equivalency),
+                    clean_string(equiv_record.get('Value_1__c'))
+                )
+        
+        with get_bulk_load_connection(self.db_path) as conn:
+            inserted_count, failed_count, rate = self._bulk_insert(
+                conn, "us_equivalency", ["equivalency_uuid", "overall_equivalency", "equivalency_description"], stage_rows(), on_conflict="REPLACE"
+            )
+            skipped_count += failed_count
+            self._save_sync_state(conn, "us_equivalency", records.latest_modstamp, records.count)
+            logger.info(f"US equivalencies migration completed - inserted {inserted_count}, skipped {skipped_count} ({rate:,.0f} rows/sec)")
     
-    def migrate_notes(self) -> None:
-        """Extract and load Notes data."""
+    def migrate_notes(self, notes: Optional[Iterable[Dict[str, Any]]] = None) -> None:
+        """
+        Extract and load Notes data.
+        
+        Args:
+            notes: Records already extracted from Salesforce (extracted here if omitted)
+        """
         logger.info("Migrating notes...")
         
         # Extract notes data from Salesforce
-        notes = self.sf_extractor.get_notes()
+        if notes is None:
+            notes = self.sf_extractor.get_notes()
         
-        with get_db_connection() as conn:
-            inserted_count = 0
-            skipped_count = 0
-            
-            for note_record in notes:
+        records = RecordStream(notes)
+        skipped_count = 0
+        
+        def stage_rows() -> Iterator[Tuple]:
+            nonlocal skipped_count
+            for note_record in records:
                 note_content = note_record.get('Key__c')
                 
                 if not note_content:
                     skipped_count += 1
                     continue
                 
-                # Insert note with UUID (standalone table)
-                try:
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        INSERT INTO notes (note_uuid, note_content)
-                        VALUES (?, ?)
-                    """, (
-                        str(uuid.uuid4()),
-                        clean_string(note_content)
-                    ))
-                    inserted_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"Failed to insert note: {e}")
+                yield (record_uuid(note_record), clean_string(note_content))
+        
+        with get_bulk_load_connection(self.db_path) as conn:
+            inserted_count, failed_count, rate = self._bulk_insert(
+                conn, "notes", ["note_uuid", "note_content"], stage_rows(), on_conflict="REPLACE"
+            )
+            skipped_count += failed_count
+            self._save_sync_state(conn, "notes", records.latest_modstamp, records.count)
+            logger.info(f"Notes migration completed - inserted {inserted_count}, skipped {skipped_count} ({rate:,.0f} rows/sec)")
+    
+    def run_incremental_sync(self) -> Dict[str, Dict[str, int]]:
+        """
+        Apply only the Salesforce changes made since the last sync.
+        
+        For each table, records with a SystemModstamp at or after the stored
+        high-water mark are fetched (including deleted ones, via queryAll),
+        then upserted or deleted by their stable Salesforce-derived keys. All
+        changes are applied in one transaction, so readers never see a
+        partially loaded database. Tables without a high-water mark (never
+        synced, or loaded before stable keys existed) are reloaded in full
+        within the same transaction.
+        
+        Deletes are only visible while they are in the Salesforce recycle bin,
+        so run a full migration if syncs have been paused for longer than that.
+        
+        Returns:
+            Dict[str, Dict[str, int]]: Upserted, deleted and skipped counts per table
+        """
+        logger.info("Starting incremental sync from Salesforce...")
+        start = time.perf_counter()
+        
+        try:
+            # Extract everything first so the write transaction stays short
+            with get_db_connection() as conn:
+                marks = {spec["table"]: self._get_high_water_mark(conn, spec["table"]) for spec in SYNC_TABLES}
+            
+            jobs = {
+                spec["table"]: (lambda extractor, spec=spec: extractor.get_changed_records(
+                    spec["fields"],
+                    since=to_soql_datetime(marks[spec["table"]]) if marks[spec["table"]] else None,
+                    record_type=spec["record_type"],
+                    condition=spec.get("condition")
+                ))
+                for spec in SYNC_TABLES
+            }
+            changes = {table: list(records) for table, records in self.sf_extractor.extract_concurrently(jobs)}
+            
+            summary = {}
+            with get_db_connection() as conn:
+                known_countries = self._load_country_names(conn)
+                
+                for spec in SYNC_TABLES:
+                    table = spec["table"]
+                    summary[table] = self._apply_changes(
+                        conn, spec, changes[table], known_countries, full_reload=marks[table] is None
+                    )
+                
+                if summary["foreign_credential"]["deleted"]:
+                    summary["country"] = {"upserted": 0, "deleted": self._prune_countries(conn), "skipped": 0}
+                
+                if summary["institution"]["upserted"] or summary["institution"]["deleted"]:
+                    rebuild_institution_search_index(conn)
+                
+                conn.commit()
+            
+            changed = any(counts["upserted"] or counts["deleted"] for counts in summary.values())
+            
+            if changed:
+                self.build_search_indexes()
+                self.publish_reference_version()
+            
+            duration = time.perf_counter() - start
+            logger.info(f"Incremental sync completed in {duration:.1f}s: {summary}")
+            return summary
+            
+        except Exception as e:
+            logger.error(f"Incremental sync failed: {e}")
+            raise
+    
+    def _apply_changes(self, conn: sqlite3.Connection, spec: Dict[str, Any], records: List[Dict[str, Any]],
+                       known_countries: Set[str], full_reload: bool = False) -> Dict[str, int]:
+        """
+        Upsert and delete changed records for one synced table.
+        
+        Args:
+            conn: Database connection (the caller commits)
+            spec: Entry from SYNC_TABLES
+            records: Changed records from get_changed_records()
+            known_countries: Existing country names (updated with new countries)
+            full_reload: Replace the table's existing rows instead of merging
+            
+        Returns:
+            Dict[str, int]: Upserted, deleted and skipped counts
+        """
+        table = spec["table"]
+        columns = spec["columns"]
+        key_column = columns[0]
+        
+        upserts = []
+        deletes = []
+        skipped_count = 0
+        
+        records = RecordStream(records)
+        for record in records:
+            key = record_uuid(record)
+            key_value = record.get('Key__c')
+            
+            # Deleted in Salesforce, or no longer has a key: drop the local row
+            if record.get('IsDeleted') or not key_value:
+                deletes.append((key,))
+                continue
+            
+            if spec["country_scoped"]:
+                if spec["record_type"] == "Country" and key_value not in known_countries:
+                    cleaned_name = clean_string(key_value)
+                    if cleaned_name and validate_country_name(cleaned_name):
+                        conn.execute("INSERT OR IGNORE INTO country (country_name) VALUES (?)", (cleaned_name,))
+                        known_countries.add(cleaned_name)
+                
+                if key_value not in known_countries:
+                    logger.warning(f"Country not found for {table}: {key_value}")
+                    deletes.append((key,))
                     skipped_count += 1
+                    continue
+                
+                row = [key, key_value]
+            else:
+                row = [key, clean_string(key_value)]
             
-            conn.commit()
-            logger.info(f"Notes migration completed - inserted {inserted_count}, skipped {skipped_count}")
+            row.extend(clean_string(record.get(field)) for field in spec["fields"])
+            upserts.append(tuple(row))
+        
+        deleted_before = conn.total_changes
+        if full_reload:
+            logger.info(f"No sync high-water mark for {table}; reloading it in full")
+            conn.execute(f"DELETE FROM {table}")
+        
+        conn.executemany(f"DELETE FROM {table} WHERE {key_column} = ?", deletes)
+        deleted_count = conn.total_changes - deleted_before
+        
+        # Only rows whose values actually differ count as changes (the >= mark re-reads the last second)
+        value_columns = ", ".join(columns[1:])
+        upserted_before = conn.total_changes
+        conn.executemany(f"""
+            INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})
+            ON CONFLICT({key_column}) DO UPDATE SET
+                {', '.join(f'{column} = excluded.{column}' for column in columns[1:])}
+            WHERE ({value_columns}) IS NOT ({', '.join(f'excluded.{column}' for column in columns[1:])})
+        """, upserts)
+        upserted_count = conn.total_changes - upserted_before
+        
+        self._save_sync_state(conn, table, records.latest_modstamp, records.count, commit=False)
+        
+        logger.info(f"Synced {table} - upserted {upserted_count}, deleted {deleted_count}, skipped {skipped_count}")
+        return {"upserted": upserted_count, "deleted": deleted_count, "skipped": skipped_count}
+    
+    def _prune_countries(self, conn: sqlite3.Connection) -> int:
+        """
+        Delete countries that no longer have any rows referencing them.
+        
+        Args:
+            conn: Database connection (the caller commits)
+            
+        Returns:
+            int: Number of countries deleted
+        """
+        cursor = conn.cursor()
+        cursor.execute("""
+            DELETE FROM country
+            WHERE country_name NOT IN (SELECT country_name FROM foreign_credential)
+              AND country_name NOT IN (SELECT country_name FROM institution)
+              AND country_name NOT IN (SELECT country_name FROM program_length)
+              AND country_name NOT IN (SELECT country_name FROM grade_scale)
+        """)
+        if cursor.rowcount:
+            logger.info(f"Removed {cursor.rowcount} countries no longer present in Salesforce")
+        return cursor.rowcount
     
-    def _insert_country(self, conn: sqlite3.Connection, country_name: str) -> bool:
+    def _get_high_water_mark(self, conn: sqlite3.Connection, table: str) -> Optional[str]:
         """
-        Insert a country using country_name as natural key.
+        Get the latest SystemModstamp synced into a table.
         
         Args:
             conn: Database connection
-            country_name: Name of the country
+            table: Synced table name
             
         Returns:
-            bool: True if inserted successfully, False if already exists or invalid
+            Optional[str]: SystemModstamp, or None if the table has never been synced
+        """
+        cursor = conn.cursor()
+        cursor.execute("SELECT last_modstamp FROM sync_state WHERE table_name = ?", (table,))
+        row = cursor.fetchone()
+        return row['last_modstamp'] if row else None
+    
+    def _save_sync_state(self, conn: sqlite3.Connection, table: str, latest_modstamp: Optional[str],
+                         record_count: int, commit: bool = True) -> None:
+        """
+        Advance a table's high-water mark to the newest SystemModstamp seen.
+        
+        Args:
+            conn: Database connection
+            table: Synced table name
+            latest_modstamp: Newest SystemModstamp among the records just loaded
+            record_count: Number of records just loaded into the table
+            commit: Commit immediately (False when part of a larger transaction)
         """
-        # Clean the country name
-        cleaned_name = clean_string(country_name)
-        if not cleaned_name or not validate_country_name(cleaned_name):
-            logger.warning(f"Invalid country name: {country_name}")
-            return False
+        if latest_modstamp is None:
+            if record_count:
+                logger.debug(f"No SystemModstamp on {table} records; high-water mark unchanged")
+                return
+            # Nothing changed: keep the existing mark, but record that the table was synced
+            latest_modstamp = self._get_high_water_mark(conn, table)
+            if latest_modstamp is None:
+                return
         
-        # Check if country already exists
-        if self._country_exists(conn, cleaned_name):
-            return False  # Already exists
+        record_type = next(spec["record_type"] for spec in SYNC_TABLES if spec["table"] == table)
+        conn.execute("""
+            INSERT INTO sync_state (table_name, record_type, last_modstamp, records_synced, synced_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(table_name) DO UPDATE SET
+                last_modstamp = MAX(last_modstamp, excluded.last_modstamp),
+                records_synced = excluded.records_synced,
+                synced_at = excluded.synced_at
+        """, (table, record_type, latest_modstamp, record_count))
         
-        # Insert new country
-        cursor = conn.cursor()
-        try:
-            cursor.execute(
-                "INSERT INTO country (country_name) VALUES (?)",
-                (cleaned_name,)
-            )
-            logger.debug(f"Inserted new country: {cleaned_name}")
-            return True
+        if commit:
+            conn.commit()
+    
+    def build_search_indexes(self) -> None:
+        """Rebuild the trigram/alias matching index and refresh query planner statistics."""
+        with get_bulk_load_connection(self.db_path) as conn:
+            build_match_index(conn)
+            conn.execute("ANALYZE")
+            conn.commit()
+    
+    def publish_reference_version(self) -> None:
+        """Bump the reference data version stamp so snapshot readers reload."""
+        with get_db_connection(db_path=self.db_path) as conn:
+            bump_reference_version(conn)
+        
+        # Drop this process's snapshot immediately rather than waiting for the next check
+        get_reference_store().invalidate()
+    
+    def validate_shadow_database(self) -> None:
+        """
+        Check the shadow database before it replaces the live one.
+        
+        Raises:
+            RuntimeError: If the file is corrupt, integrity checks fail or no countries were loaded
+        """
+        with get_db_connection(db_path=self.db_path) as conn:
+            quick_check = conn.execute("PRAGMA quick_check").fetchone()[0]
+        if quick_check != "ok":
+            raise RuntimeError(f"Shadow database failed quick_check: {quick_check}")
+        
+        integrity = validate_data_integrity(db_path=self.db_path)
+        if not integrity['valid']:
+            raise RuntimeError(f"Shadow database failed integrity validation: {integrity['issues']}")
+        
+        stats = get_database_statistics(db_path=self.db_path)
+        if not stats.get('country'):
+            raise RuntimeError("Shadow database has no countries; refusing to replace the live database")
+        
+        logger.info(f"Shadow database validated: {stats}")
+    
+    def _bulk_insert(self, conn: sqlite3.Connection, table: str, columns: List[str],
+                     rows: Iterable[Tuple], on_conflict: Optional[str] = None,
+                     batch_size: int = SF_PAGE_SIZE) -> Tuple[int, int, float]:
+        """
+        Write staged rows to a table in a single transaction.
+        
+        Rows are consumed in batches as they are produced, so a generator
+        fed from a Salesforce stream is loaded without ever being held in
+        memory as a whole. The table's secondary indexes are dropped for the
+        load and rebuilt once at the end, which is much cheaper than
+        maintaining them row by row. If a batch hits a constraint error it
+        is retried row by row so that only the offending rows are skipped.
+        
+        Args:
+            conn: Bulk load connection
+            table: Target table name
+            columns: Column names, in the order of each row tuple
+            rows: Staged row tuples (a list or a generator)
+            on_conflict: Conflict resolution for existing keys ("IGNORE" or "REPLACE")
+            batch_size: Rows written per executemany() call
             
-        except sqlite3.IntegrityError:
-            # Handle race condition where country was inserted by another process
-            logger.debug(f"Country already exists during insert: {cleaned_name}")
-            return False
+        Returns:
+            Tuple[int, int, float]: Inserted rows, failed rows and rows/sec
+        """
+        start = time.perf_counter()
+        verb = f"INSERT OR {on_conflict}" if on_conflict else "INSERT"
+        sql = f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+        
+        conn.execute("BEGIN")
+        drop_indexes(conn, table)
+        
+        row_count = 0
+        inserted_count = 0
+        failed_count = 0
+        rows = iter(rows)
+        
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            row_count += len(batch)
+            changes_before = conn.total_changes
+            
+            conn.execute("SAVEPOINT bulk_batch")
+            try:
+                conn.executemany(sql, batch)
+                conn.execute("RELEASE SAVEPOINT bulk_batch")
+                
+            except sqlite3.IntegrityError as e:
+                logger.warning(f"Bulk insert batch into {table} failed ({e}); retrying row by row")
+                conn.execute("ROLLBACK TO SAVEPOINT bulk_batch")
+                conn.execute("RELEASE SAVEPOINT bulk_batch")
+                changes_before = conn.total_changes
+                
+                for row in batch:
+                    try:
+                        conn.execute(sql, row)
+                    except sqlite3.IntegrityError as row_error:
+                        logger.error(f"Failed to insert {table} row {row[:2]}: {row_error}")
+                        failed_count += 1
+            
+            inserted_count += conn.total_changes - changes_before
+        
+        create_indexes(conn, [table])
+        conn.commit()
+        
+        elapsed = time.perf_counter() - start
+        rate = row_count / elapsed if elapsed > 0 else 0.0
+        logger.debug(f"Bulk loaded {inserted_count} rows into {table} in {elapsed:.3f}s")
+        return inserted_count, failed_count, rate
     
-    def _country_exists(self, conn: sqlite3.Connection, country_name: str) -> bool:
+    def _load_country_names(self, conn: sqlite3.Connection) -> Set[str]:
         """
-        Check if a country exists in the database.
+        Load every country name once so staged rows can be checked in memory.
         
         Args:
             conn: Database connection
-            country_name: Name of the country
             
         Returns:
-            bool: True if country exists, False otherwise
+            Set[str]: Existing country names
         """
         cursor = conn.cursor()
-        cursor.execute("SELECT 1 FROM country WHERE country_name = ?", (country_name,))
-        return cursor.fetchone() is not None
\ No newline at end of file
+        cursor.execute("SELECT country_name FROM country")
+        return {row[0] for row in cursor.fetchall()}
\ No newline at end of file
@@ -4,14 +4,35 @@ Common database queries and utilities.
 Provides reusable query functions for data validation and reporting.
 """
 
+import re
 import sqlite3
 import logging
+from pathlib import Path
 from typing import List, Dict, Any, Optional
 from .connection import get_db_connection
 
 
 logger = logging.getLogger(__name__)
 
+# Queries issued on every analysis (tool lookups and the reference snapshot
+# load), keyed by name. "?" placeholders are bound to a sample country name.
+HOT_QUERIES = {
+    "country_by_name": "SELECT * FROM country WHERE country_name = ?",
+    "institutions_by_country": "SELECT * FROM institution WHERE country_name = ? ORDER BY institution_name",
+    "foreign_credentials_by_country": "SELECT * FROM foreign_credential WHERE country_name = ?",
+    "program_lengths_by_country": "SELECT * FROM program_length WHERE country_name = ?",
+    "grade_scales_by_country": "SELECT * FROM grade_scale WHERE country_name = ?",
+    "all_us_equivalencies": "SELECT * FROM us_equivalency ORDER BY overall_equivalency",
+    "snapshot_institutions": "SELECT * FROM institution ORDER BY country_name, institution_name",
+    "snapshot_foreign_credentials": "SELECT * FROM foreign_credential ORDER BY country_name, rowid",
+    "orphaned_institutions": """
+        SELECT COUNT(*) as count
+        FROM institution i
+        LEFT JOIN country c ON i.country_name = c.country_name
+        WHERE c.country_name IS NULL
+    """,
+}
+
 
 def get_all_countries() -> List[Dict[str, Any]]:
     """
@@ -64,6 +85,96 @@ def get_institutions_by_country(country_name: str) -> List[Dict[str, Any]]:
         return [dict(row) for row in cursor.fetchall()]
 
 
+def build_fts_query(query: str, match_all: bool = True) -> Optional[str]:
+    """
+    Build a safe FTS5 MATCH expression from free text.
+    
+    Each word becomes a quoted prefix term, so user input can never be
+    interpreted as FTS5 query syntax.
+    
+    Args:
+        query: Free-text search input
+        match_all: Require every term (AND) instead of any term (OR)
+        
+    Returns:
+        Optional[str]: MATCH expression, or None if the query has no words
+    """
+    terms = [f'"{token}"*' for token in re.findall(r"\w+", query or "", re.UNICODE)]
+    if not terms:
+        return None
+    
+    return (" AND " if match_all else " OR ").join(terms)
+
+
+def search_institutions(country_name: str, query: str, limit: int = 10) -> Optional[Dict[str, Any]]:
+    """
+    Ranked full-text search for institutions in a specific country.
+    
+    Matches native and English names with prefix and token matching and
+    diacritic folding, ranked by BM25. All terms must match; if that finds
+    nothing, any-term matching is tried before giving up.
+    
+    Args:
+        country_name: Exact name of the country
+        query: Institution name or partial name
+        limit: Maximum number of matches to return
+        
+    Returns:
+        Optional[Dict]: {"matches": [...], "total_found": int, "match_mode": str},
+        or None if the query has no searchable words or the index is unavailable
+    """
+    country_filter = build_fts_query(country_name)
+    
+    with get_db_connection() as conn:
+        try:
+            for match_all in (True, False):
+                name_filter = build_fts_query(query, match_all=match_all)
+                if not name_filter or not country_filter:
+                    return None
+                
+                match_expr = f"country_name : ({country_filter}) AND {{institution_name institution_english_name}} : ({name_filter})"
+                
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT COUNT(*) AS count
+                    FROM institution_fts
+                    JOIN institution i ON i.rowid = institution_fts.rowid
+                    WHERE institution_fts MATCH ? AND i.country_name = ?
+                """, (match_expr, country_name))
+                total_found = cursor.fetchone()['count']
+                
+                if total_found == 0:
+                    continue
+                
+                cursor.execute("""
+                    SELECT i.*, bm25(institution_fts, 0.0, 10.0, 10.0) AS rank
+                    FROM institution_fts
+                    JOIN institution i ON i.rowid = institution_fts.rowid
+                    WHERE institution_fts MATCH ? AND i.country_name = ?
+                    ORDER BY rank
+                    LIMIT ?
+                """, (match_expr, country_name, limit))
+                
+                matches = []
+                for row in cursor.fetchall():
+                    match = dict(row)
+                    match['relevance'] = round(-match.pop('rank'), 4)
+                    matches.append(match)
+                
+                return {
+                    "matches": matches,
+                    "total_found": total_found,
+                    "match_mode": "all_terms" if match_all else "any_term"
+                }
+            
+            return {"matches": [], "total_found": 0, "match_mode": "none"}
+            
+        except sqlite3.OperationalError as e:
+            # Older databases without the FTS index (or SQLite builds without FTS5)
+            logger.debug(f"Institution full-text search unavailable: {e}")
+            return None
+
+
 def get_foreign_credentials_by_country(country_name: str) -> List[Dict[str, Any]]:
     """
     Get all foreign credentials for a specific country.
@@ -150,16 +261,19 @@ def get_all_notes() -> List[Dict[str, Any]]:
         return [dict(row) for row in cursor.fetchall()]
 
 
-def get_database_statistics() -> Dict[str, int]:
+def get_database_statistics(db_path: Optional[Path] = None) -> Dict[str, int]:
     """
     Get record counts for all tables.
     
+    Args:
+        db_path: Database file to inspect (defaults to the live database)
+    
     Returns:
         Dict[str, int]: Table names and their record counts
     """
     stats = {}
     
-    with get_db_connection() as conn:
+    with get_db_connection(db_path=db_path) as conn:
         tables = [
             'country', 'foreign_credential', 'institution', 
             'program_length', 'grade_scale', 'us_equivalency', 'notes'
@@ -174,16 +288,19 @@ def get_database_statistics() -> Dict[str, int]:
     return stats
 
 
-def validate_data_integrity() -> Dict[str, Any]:
+def validate_data_integrity(db_path: Optional[Path] = None) -> Dict[str, Any]:
     """
     Validate data integrity across tables.
     
+    Args:
+        db_path: Database file to validate (defaults to the live database)
+    
     Returns:
         Dict[str, Any]: Validation results and any issues found
     """
     issues = []
     
-    with get_db_connection() as conn:
+    with get_db_connection(db_path=db_path) as conn:
         # Check for orphaned foreign credentials
         cursor = conn.cursor()
         cursor.execute("""
@@ -235,4 +352,36 @@ def validate_data_integrity() -> Dict[str, Any]:
         'valid': len(issues) == 0,
         'issues': issues,
         'checked_at': 'now'  # TODO: Use actual timestamp
-    }
\ No newline at end of file
+    }
+
+
+def explain_hot_queries(country_name: Optional[str] = None) -> Dict[str, List[str]]:
+    """
+    Get the SQLite query plan for each hot query.
+    
+    Args:
+        country_name: Country bound to the query parameters (defaults to the
+                      first country in the database)
+        
+    Returns:
+        Dict[str, List[str]]: Query name mapped to its EXPLAIN QUERY PLAN steps
+    """
+    plans = {}
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        if country_name is None:
+            cursor.execute("SELECT country_name FROM country ORDER BY country_name LIMIT 1")
+            row = cursor.fetchone()
+            country_name = row['country_name'] if row else ""
+        
+        for name, sql in HOT_QUERIES.items():
+            params = (country_name,) * sql.count("?")
+            try:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                plans[name] = [row['detail'] for row in cursor.fetchall()]
+            except sqlite3.OperationalError as e:
+                plans[name] = [f"unavailable: {e}"]
+    
+    return plans
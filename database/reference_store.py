@@ -0,0 +1,251 @@
+"""
+In-memory snapshot of the reference data used by LLM tool lookups.
+
+The reference tables only change when a migration runs, so the whole set is
+loaded once into per-country indexed structures and served from memory.
+A version stamp stored in the metadata table is bumped at the end of each
+migration; the store compares it periodically and reloads when it changes.
+"""
+
+import sqlite3
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+from config import REFERENCE_CACHE_CHECK_INTERVAL
+from .connection import get_db_connection
+
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_VERSION_KEY = "reference_version"
+
+Row = Dict[str, Any]
+
+
+def get_reference_version(conn: Optional[sqlite3.Connection] = None) -> Optional[str]:
+    """
+    Get the current reference data version stamp.
+
+    Args:
+        conn: Optional open connection (a pooled one is used if omitted)
+
+    Returns:
+        Optional[str]: Version stamp, or None if no migration has recorded one
+    """
+    if conn is None:
+        with get_db_connection() as pooled_conn:
+            return get_reference_version(pooled_conn)
+
+    try:
+        row = conn.execute(
+            "SELECT value FROM metadata WHERE key = ?", (REFERENCE_VERSION_KEY,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        # Databases created before the metadata table existed
+        return None
+    return row[0] if row else None
+
+
+def bump_reference_version(conn: sqlite3.Connection) -> str:
+    """
+    Record a new reference data version stamp.
+
+    Called at the end of a migration so that every ReferenceDataStore
+    (in this or any other process) reloads on its next freshness check.
+
+    Args:
+        conn: Open connection to the database being migrated
+
+    Returns:
+        str: The new version stamp
+    """
+    version = uuid.uuid4().hex
+    conn.execute("""
+        INSERT INTO metadata (key, value, updated_at)
+        VALUES (?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+    """, (REFERENCE_VERSION_KEY, version))
+    conn.commit()
+    logger.info(f"Reference data version bumped to {version}")
+    return version
+
+
+@dataclass(frozen=True)
+class ReferenceSnapshot:
+    """Immutable, fully loaded copy of the reference tables."""
+    version: Optional[str]
+    loaded_at: str
+    countries: Tuple[Row, ...] = ()
+    countries_by_name: Dict[str, Row] = field(default_factory=dict)
+    institutions: Dict[str, Tuple[Row, ...]] = field(default_factory=dict)
+    foreign_credentials: Dict[str, Tuple[Row, ...]] = field(default_factory=dict)
+    program_lengths: Dict[str, Tuple[Row, ...]] = field(default_factory=dict)
+    grade_scales: Dict[str, Tuple[Row, ...]] = field(default_factory=dict)
+    us_equivalencies: Tuple[Row, ...] = ()
+
+
+class ReferenceDataStore:
+    """
+    Shared, read-only view of the reference tables.
+
+    Lookups return rows in the same order as the equivalent functions in
+    database.queries. Returned rows are shared with the snapshot and must be
+    treated as read-only.
+    """
+
+    def __init__(self, check_interval: float = REFERENCE_CACHE_CHECK_INTERVAL):
+        """
+        Initialize the store. Data is loaded lazily on first access.
+
+        Args:
+            check_interval: Minimum seconds between version stamp checks
+        """
+        self.check_interval = check_interval
+        self._snapshot: Optional[ReferenceSnapshot] = None
+        self._last_checked = 0.0
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> ReferenceSnapshot:
+        """
+        Get the current snapshot, reloading it if the version stamp changed.
+
+        Returns:
+            ReferenceSnapshot: Loaded reference data
+        """
+        now = time.monotonic()
+        snapshot = self._snapshot
+        if snapshot is not None and now - self._last_checked < self.check_interval:
+            return snapshot
+
+        with self._lock:
+            now = time.monotonic()
+            if self._snapshot is not None and now - self._last_checked < self.check_interval:
+                return self._snapshot
+
+            with get_db_connection() as conn:
+                version = get_reference_version(conn)
+                if self._snapshot is None or self._snapshot.version != version:
+                    self._snapshot = self._load(conn, version)
+
+            self._last_checked = now
+            return self._snapshot
+
+    def load(self) -> ReferenceSnapshot:
+        """
+        Force a reload from the database.
+
+        Call this before forking worker processes so that they share the
+        loaded snapshot copy-on-write instead of each loading their own.
+
+        Returns:
+            ReferenceSnapshot: Freshly loaded reference data
+        """
+        self.invalidate()
+        return self.snapshot()
+
+    def invalidate(self) -> None:
+        """Drop the current snapshot so the next access reloads it."""
+        with self._lock:
+            self._snapshot = None
+            self._last_checked = 0.0
+
+    def get_all_countries(self) -> List[Row]:
+        """Get all countries ordered by name."""
+        return list(self.snapshot().countries)
+
+    def get_country_by_name(self, country_name: str) -> Optional[Row]:
+        """Get a specific country by exact name."""
+        return self.snapshot().countries_by_name.get(country_name)
+
+    def get_institutions_by_country(self, country_name: str) -> List[Row]:
+        """Get all institutions for a country ordered by institution name."""
+        return list(self.snapshot().institutions.get(country_name, ()))
+
+    def get_foreign_credentials_by_country(self, country_name: str) -> List[Row]:
+        """Get all foreign credentials for a country."""
+        return list(self.snapshot().foreign_credentials.get(country_name, ()))
+
+    def get_program_lengths_by_country(self, country_name: str) -> List[Row]:
+        """Get all program lengths for a country."""
+        return list(self.snapshot().program_lengths.get(country_name, ()))
+
+    def get_grade_scales_by_country(self, country_name: str) -> List[Row]:
+        """Get all grade scales for a country."""
+        return list(self.snapshot().grade_scales.get(country_name, ()))
+
+    def get_all_us_equivalencies(self) -> List[Row]:
+        """Get all US equivalency records ordered by equivalency."""
+        return list(self.snapshot().us_equivalencies)
+
+    @staticmethod
+    def _load(conn: sqlite3.Connection, version: Optional[str]) -> ReferenceSnapshot:
+        """Read every reference table into a new snapshot."""
+        start = time.perf_counter()
+
+        countries = tuple(
+            dict(row) for row in conn.execute("SELECT * FROM country ORDER BY country_name")
+        )
+
+        snapshot = ReferenceSnapshot(
+            version=version,
+            loaded_at=datetime.now().isoformat(),
+            countries=countries,
+            countries_by_name={c["country_name"]: c for c in countries},
+            institutions=ReferenceDataStore._group_by_country(
+                conn, "SELECT * FROM institution ORDER BY country_name, institution_name"
+            ),
+            foreign_credentials=ReferenceDataStore._group_by_country(
+                conn, "SELECT * FROM foreign_credential ORDER BY country_name, rowid"
+            ),
+            program_lengths=ReferenceDataStore._group_by_country(
+                conn, "SELECT * FROM program_length ORDER BY country_name, rowid"
+            ),
+            grade_scales=ReferenceDataStore._group_by_country(
+                conn, "SELECT * FROM grade_scale ORDER BY country_name, rowid"
+            ),
+            us_equivalencies=tuple(
+                dict(row) for row in conn.execute(
+                    "SELECT * FROM us_equivalency ORDER BY overall_equivalency"
+                )
+            )
+        )
+
+        duration_ms = (time.perf_counter() - start) * 1000
+        logger.info(
+            f"Loaded reference data snapshot (version {version}) with "
+            f"{len(countries)} countries in {duration_ms:.1f} ms"
+        )
+        return snapshot
+
+    @staticmethod
+    def _group_by_country(conn: sqlite3.Connection, sql: str) -> Dict[str, Tuple[Row, ...]]:
+        """Run a query ordered by country_name and group its rows per country."""
+        grouped: Dict[str, List[Row]] = {}
+        for row in conn.execute(sql):
+            record = dict(row)
+            grouped.setdefault(record["country_name"], []).append(record)
+        return {country: tuple(rows) for country, rows in grouped.items()}
+
+
+_store: Optional[ReferenceDataStore] = None
+_store_lock = threading.Lock()
+
+
+def get_reference_store() -> ReferenceDataStore:
+    """
+    Get the process-wide reference data store shared by all tool executors.
+
+    Returns:
+        ReferenceDataStore: Shared store instance
+    """
+    global _store
+
+    with _store_lock:
+        if _store is None:
+            _store = ReferenceDataStore()
+        return _store
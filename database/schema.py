@@ -6,11 +6,20 @@ Defines the normalized SQLite tables for Evaluator project.
 
 import sqlite3
 import logging
-from typing import Optional
+from typing import Optional, Dict, List, Tuple, Callable
 
 
 logger = logging.getLogger(__name__)
 
+# Secondary indexes per table as (index name, indexed columns)
+SECONDARY_INDEXES: Dict[str, List[Tuple[str, str]]] = {
+    'institution': [('idx_institution_country_name', 'country_name, institution_name')],
+    'foreign_credential': [('idx_foreign_credential_country', 'country_name')],
+    'program_length': [('idx_program_length_country', 'country_name')],
+    'grade_scale': [('idx_grade_scale_country', 'country_name')],
+    'us_equivalency': [('idx_us_equivalency_overall', 'overall_equivalency')],
+}
+
 
 def create_all_tables(conn: sqlite3.Connection) -> None:
     """
@@ -25,13 +34,22 @@ def create_all_tables(conn: sqlite3.Connection) -> None:
     create_country_table(conn)
     create_foreign_credential_table(conn)
     create_institution_table(conn)
+    create_institution_search_table(conn)
     create_program_length_table(conn)
     create_grade_scale_table(conn)
     create_us_equivalency_table(conn)
     create_notes_table(conn)
+    create_match_index_tables(conn)
+    create_metadata_table(conn)
+    create_schema_version_table(conn)
+    create_sync_state_table(conn)
+    create_indexes(conn)
     
     conn.commit()
     logger.info("All tables created successfully")
+    
+    # Bring databases created by older releases up to date
+    upgrade_schema(conn)
 
 
 def create_country_table(conn: sqlite3.Connection) -> None:
@@ -81,6 +99,41 @@ def create_institution_table(conn: sqlite3.Connection) -> None:
     logger.debug("Institution table created")
 
 
+def create_institution_search_table(conn: sqlite3.Connection) -> None:
+    """
+    Create the FTS5 full-text index over institution names.
+    
+    External-content table backed by institution (rows are not duplicated).
+    The unicode61 tokenizer folds case and diacritics, and prefix indexes
+    keep "univ*"-style lookups fast. Call rebuild_institution_search_index()
+    after loading institutions.
+    """
+    sql = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS institution_fts USING fts5 (
+        country_name,
+        institution_name,
+        institution_english_name,
+        content='institution',
+        content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3 4'
+    )
+    """
+    conn.execute(sql)
+    logger.debug("Institution search index created")
+
+
+def rebuild_institution_search_index(conn: sqlite3.Connection) -> None:
+    """
+    Rebuild the institution full-text index from the institution table.
+    
+    Args:
+        conn: SQLite database connection
+    """
+    conn.execute("INSERT INTO institution_fts(institution_fts) VALUES ('rebuild')")
+    logger.debug("Institution search index rebuilt")
+
+
 def create_program_length_table(conn: sqlite3.Connection) -> None:
     """Create the Program Length table with UUID PK and text FK."""
     sql = """
@@ -141,6 +194,195 @@ def create_notes_table(conn: sqlite3.Connection) -> None:
     logger.debug("Notes table created")
 
 
+def create_match_index_tables(conn: sqlite3.Connection) -> None:
+    """
+    Create the fuzzy matching index tables.
+    
+    search_term holds one folded name per searchable entity (countries,
+    country aliases, institution names and foreign credentials), and
+    search_trigram is the inverted trigram index over those names, keyed by
+    entity type and country scope so lookups only touch one country's slice.
+    entity_alias maps folded alternative names to canonical entities.
+    Populated by database.matching.build_match_index().
+    """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS search_term (
+        term_id INTEGER PRIMARY KEY,
+        entity_type TEXT NOT NULL,
+        scope TEXT NOT NULL DEFAULT '',
+        entity_key TEXT NOT NULL,
+        folded_text TEXT NOT NULL
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS search_trigram (
+        entity_type TEXT NOT NULL,
+        scope TEXT NOT NULL DEFAULT '',
+        trigram TEXT NOT NULL,
+        term_id INTEGER NOT NULL,
+        PRIMARY KEY (entity_type, scope, trigram, term_id)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS entity_alias (
+        entity_type TEXT NOT NULL,
+        alias TEXT NOT NULL,
+        entity_key TEXT NOT NULL,
+        PRIMARY KEY (entity_type, alias)
+    )
+    """)
+    logger.debug("Match index tables created")
+
+
+def create_metadata_table(conn: sqlite3.Connection) -> None:
+    """Create the key/value Metadata table (e.g. the reference data version stamp)."""
+    sql = """
+    CREATE TABLE IF NOT EXISTS metadata (
+        key TEXT PRIMARY KEY,
+        value TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """
+    conn.execute(sql)
+    logger.debug("Metadata table created")
+
+
+def create_schema_version_table(conn: sqlite3.Connection) -> None:
+    """Create the Schema Version table recording each applied upgrade."""
+    sql = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """
+    conn.execute(sql)
+    logger.debug("Schema Version table created")
+
+
+def create_sync_state_table(conn: sqlite3.Connection) -> None:
+    """Create the Sync State table holding the incremental sync high-water mark per table."""
+    sql = """
+    CREATE TABLE IF NOT EXISTS sync_state (
+        table_name TEXT PRIMARY KEY,
+        record_type TEXT,
+        last_modstamp TEXT,
+        records_synced INTEGER DEFAULT 0,
+        synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """
+    conn.execute(sql)
+    logger.debug("Sync State table created")
+
+
+def create_indexes(conn: sqlite3.Connection, tables: Optional[List[str]] = None) -> None:
+    """
+    Create secondary indexes for the country-keyed lookups.
+    
+    Every per-country query filters on country_name, so each child table is
+    indexed by it (with institution_name appended so institution lookups come
+    back already sorted). The implicit rowid in each index also serves the
+    reference snapshot's ORDER BY country_name, rowid scans, and the orphan
+    checks in validate_data_integrity() run entirely from these indexes.
+    
+    Args:
+        conn: SQLite database connection
+        tables: Only create the indexes of these tables (default: all)
+    """
+    for table, indexes in SECONDARY_INDEXES.items():
+        if tables is not None and table not in tables:
+            continue
+        for index_name, columns in indexes:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({columns})")
+    logger.debug("Secondary indexes created")
+
+
+def drop_indexes(conn: sqlite3.Connection, table: str) -> None:
+    """
+    Drop the secondary indexes of a table ahead of a bulk load.
+    
+    Args:
+        conn: SQLite database connection
+        table: Table whose indexes should be dropped
+    """
+    for index_name, _ in SECONDARY_INDEXES.get(table, []):
+        conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+    logger.debug(f"Secondary indexes dropped for {table}")
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """
+    Get the highest schema upgrade applied to the database.
+    
+    Args:
+        conn: SQLite database connection
+        
+    Returns:
+        int: Schema version, or 0 for databases that predate versioning
+    """
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+
+def upgrade_schema(conn: sqlite3.Connection) -> int:
+    """
+    Apply any schema upgrades newer than the recorded schema version.
+    
+    Tables and indexes are created with IF NOT EXISTS by create_all_tables(),
+    so upgrades only need to backfill derived data (search indexes, planner
+    statistics) for databases populated by an older release.
+    
+    Args:
+        conn: SQLite database connection
+        
+    Returns:
+        int: Number of upgrades applied
+    """
+    current = get_schema_version(conn)
+    pending = [upgrade for upgrade in SCHEMA_UPGRADES if upgrade[0] > current]
+    
+    if not pending:
+        logger.debug(f"Database schema is current (version {current})")
+        return 0
+    
+    for version, description, apply in pending:
+        logger.info(f"Upgrading database schema to version {version}: {description}")
+        if apply is not None:
+            apply(conn)
+        conn.execute(
+            "INSERT OR REPLACE INTO schema_version (version, description) VALUES (?, ?)",
+            (version, description)
+        )
+        conn.commit()
+    
+    logger.info(f"Database schema upgraded from version {current} to {pending[-1][0]}")
+    return len(pending)
+
+
+def _upgrade_match_index(conn: sqlite3.Connection) -> None:
+    """Build the fuzzy matching index for data loaded before it existed."""
+    from database.matching import build_match_index
+    build_match_index(conn)
+
+
+def _upgrade_planner_statistics(conn: sqlite3.Connection) -> None:
+    """Gather statistics so the query planner picks the new indexes."""
+    conn.execute("ANALYZE")
+
+
+# (version, description, backfill function) in the order they are applied
+SCHEMA_UPGRADES: List[Tuple[int, str, Optional[Callable[[sqlite3.Connection], None]]]] = [
+    (1, "Baseline reference tables", None),
+    (2, "Institution full-text search index", rebuild_institution_search_index),
+    (3, "Fuzzy matching index", _upgrade_match_index),
+    (4, "Country-keyed secondary indexes", _upgrade_planner_statistics),
+    (5, "Incremental sync state", None),
+]
+
+
 def drop_all_tables(conn: sqlite3.Connection) -> None:
     """
     Drop all tables in the database.
@@ -153,13 +395,20 @@ def drop_all_tables(conn: sqlite3.Connection) -> None:
     logger.warning("Dropping all tables - this will delete all data!")
     
     tables = [
+        'institution_fts',
         'foreign_credential',
         'institution', 
         'program_length',
         'grade_scale',
         'country',
         'us_equivalency',
-        'notes'
+        'notes',
+        'search_trigram',
+        'search_term',
+        'entity_alias',
+        'metadata',
+        'schema_version',
+        'sync_state'
     ]
     
     for table in tables:
@@ -0,0 +1,218 @@
+"""
+Concurrent batch analysis of credential documents.
+
+Analyzing a folio is almost entirely network wait on the LLM provider, so a
+batch is spread over a bounded pool of worker threads. Each worker thread
+has its own DocumentProcessor (LLM services keep per-conversation state),
+a per-provider semaphore caps the LLM analyses in flight to each provider
+(each chunk of a split document takes its own slot, and cache hits take
+none), and results are returned in input order whatever order they
+complete in.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Dict, Optional, Callable
+
+from .models import CredentialAnalysisResult
+from .processor import DocumentProcessor
+from llm_services.rate_limiter import get_rate_limiter
+from config import LLM_PROVIDER, BATCH_MAX_WORKERS, PROVIDER_MAX_CONCURRENCY, RESULT_CACHE_ENABLED
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchItem:
+    """Outcome of analyzing one document in a batch."""
+    pdf_path: str
+    result: CredentialAnalysisResult
+    duration_seconds: float = 0.0
+
+
+@dataclass
+class BatchProgress:
+    """Running totals for a batch, passed to the progress callback."""
+    total: int
+    completed: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    
+    @property
+    def elapsed_seconds(self) -> float:
+        """Seconds since the batch started."""
+        return time.monotonic() - self.started_at
+    
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        """Estimated seconds until the batch finishes, from the average pace so far."""
+        if not self.completed:
+            return None
+        return self.elapsed_seconds / self.completed * (self.total - self.completed)
+
+
+ProgressCallback = Callable[[BatchProgress, BatchItem], None]
+
+
+_provider_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_provider_semaphores_lock = threading.Lock()
+
+
+def get_provider_semaphore(provider: str) -> threading.BoundedSemaphore:
+    """
+    Get the process-wide semaphore limiting concurrent LLM analyses for a provider.
+    
+    Shared by every batch in the process, so running several batches at
+    once still respects the provider's limit. Processors hold a slot for
+    each LLM analysis, i.e. for each chunk of a split document.
+    
+    Args:
+        provider: LLM provider name ('anthropic', 'gemini')
+    
+    Returns:
+        threading.BoundedSemaphore: Semaphore sized from PROVIDER_MAX_CONCURRENCY
+    """
+    with _provider_semaphores_lock:
+        if provider not in _provider_semaphores:
+            limit = max(1, PROVIDER_MAX_CONCURRENCY.get(provider, BATCH_MAX_WORKERS))
+            _provider_semaphores[provider] = threading.BoundedSemaphore(limit)
+        return _provider_semaphores[provider]
+
+
+def log_progress(progress: BatchProgress, item: BatchItem) -> None:
+    """Default progress reporter: one log line per finished document."""
+    status = "ok" if item.result.success else "FAILED"
+    eta = f", ETA {progress.eta_seconds:.0f}s" if progress.eta_seconds is not None else ""
+    logger.info(
+        f"[{progress.completed}/{progress.total}] {Path(item.pdf_path).name}: {status} "
+        f"in {item.duration_seconds:.1f}s ({progress.succeeded} ok, {progress.failed} failed, "
+        f"{progress.elapsed_seconds:.0f}s elapsed{eta})"
+    )
+
+
+class BatchAnalyzer:
+    """Analyzes many PDF documents concurrently with bounded parallelism."""
+    
+    def __init__(self, max_workers: int = BATCH_MAX_WORKERS, llm_provider: Optional[str] = None,
+                 progress_callback: Optional[ProgressCallback] = log_progress,
+                 use_cache: bool = RESULT_CACHE_ENABLED, refresh_cache: bool = False):
+        """
+        Initialize the batch analyzer.
+        
+        Args:
+            max_workers: Maximum number of documents analyzed at once
+            llm_provider: LLM provider to use (defaults to the provider from config)
+            progress_callback: Called after each document finishes (None disables reporting)
+            use_cache: Reuse and store LLM results in the result cache
+            refresh_cache: Ignore cached results but store the new ones
+        """
+        self.max_workers = max(1, max_workers)
+        self.llm_provider = llm_provider or LLM_PROVIDER
+        self.progress_callback = progress_callback
+        self.use_cache = use_cache
+        self.refresh_cache = refresh_cache
+        self._local = threading.local()
+    
+    def analyze(self, pdf_paths: List[str], document_type: str = "general") -> List[BatchItem]:
+        """
+        Analyze documents concurrently.
+        
+        Args:
+            pdf_paths: Paths of the PDF files to analyze
+            document_type: Type of document analysis ("general" or "cbc")
+        
+        Returns:
+            List[BatchItem]: One item per input path, in input order
+        """
+        if not pdf_paths:
+            return []
+        
+        workers = min(self.max_workers, len(pdf_paths))
+        progress = BatchProgress(total=len(pdf_paths))
+        items: List[Optional[BatchItem]] = [None] * len(pdf_paths)
+        
+        logger.info(f"Analyzing {len(pdf_paths)} documents with {workers} workers ({self.llm_provider})")
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-analyze") as executor:
+            futures = {
+                executor.submit(self._analyze_one, pdf_path, document_type): index
+                for index, pdf_path in enumerate(pdf_paths)
+            }
+            
+            for future in as_completed(futures):
+                item = future.result()
+                items[futures[future]] = item
+                
+                progress.completed += 1
+                if item.result.success:
+                    progress.succeeded += 1
+                else:
+                    progress.failed += 1
+                
+                if self.progress_callback:
+                    try:
+                        self.progress_callback(progress, item)
+                    except Exception as e:
+                        logger.warning(f"Progress callback failed: {e}")
+        
+        logger.info(
+            f"Batch completed in {progress.elapsed_seconds:.1f}s: "
+            f"{progress.succeeded} succeeded, {progress.failed} failed"
+        )
+        logger.info(f"{self.llm_provider} rate limiter: {get_rate_limiter(self.llm_provider).stats()}")
+        return items
+    
+    def analyze_folder(self, folder_path: str, pattern: str = "*.pdf",
+                       document_type: str = "general") -> List[BatchItem]:
+        """
+        Analyze every matching PDF in a folder concurrently.
+        
+        Args:
+            folder_path: Path to folder containing PDF files
+            pattern: File pattern to match (default: "*.pdf")
+            document_type: Type of document analysis ("general" or "cbc")
+        
+        Returns:
+            List[BatchItem]: One item per file, sorted by file name
+        """
+        folder = Path(folder_path)
+        if not folder.is_dir():
+            logger.error(f"Invalid folder path: {folder_path}")
+            return []
+        
+        pdf_files = sorted(str(path) for path in folder.glob(pattern))
+        if not pdf_files:
+            logger.warning(f"No PDF files found in: {folder_path}")
+            return []
+        
+        return self.analyze(pdf_files, document_type)
+    
+    def _analyze_one(self, pdf_path: str, document_type: str) -> BatchItem:
+        """Analyze one document on this worker's processor (which holds the provider slots)."""
+        start = time.perf_counter()
+        try:
+            result = self._get_processor().process_pdf(pdf_path, document_type=document_type)
+        except Exception as e:
+            logger.error(f"Failed to process {pdf_path}: {e}", exc_info=True)
+            result = CredentialAnalysisResult(
+                analysis_summary=None,
+                credentials=[],
+                extraction_notes=[],
+                success=False,
+                errors=[f"File processing failed: {str(e)}"]
+            )
+        return BatchItem(pdf_path=pdf_path, result=result, duration_seconds=time.perf_counter() - start)
+    
+    def _get_processor(self) -> DocumentProcessor:
+        """Get this worker thread's document processor, creating it on first use."""
+        processor = getattr(self._local, "processor", None)
+        if processor is None:
+            processor = DocumentProcessor(self.llm_provider, self.use_cache, self.refresh_cache,
+                                          provider_slots=get_provider_semaphore(self.llm_provider))
+            self._local.processor = processor
+        return processor
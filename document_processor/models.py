@@ -4,10 +4,13 @@ Data models for credential analysis results.
 Defines the structure for credential analysis results and related data.
 """
 
+import logging
 from dataclasses import dataclass, field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class CountryMatch:
@@ -168,6 +171,10 @@ class CredentialAnalysisResultBuilder:
         """
         Build a CredentialAnalysisResult from LLM JSON response.
         
+        The response is first checked against the schema derived from these
+        dataclasses (see output_schema.py). Mismatches are logged, and the
+        parsing below still accepts what it can.
+        
         Args:
             response_data: Dictionary containing LLM analysis results
             
@@ -175,6 +182,13 @@ class CredentialAnalysisResultBuilder:
             CredentialAnalysisResult: Structured result object
         """
         try:
+            # Imported here because output_schema is generated from this module's dataclasses
+            from .output_schema import validate_analysis_output
+            schema_issues = validate_analysis_output(response_data)
+            if schema_issues:
+                logger.warning(f"LLM response does not match the analysis schema ({len(schema_issues)} issues): "
+                               f"{'; '.join(schema_issues[:5])}")
+            
             # Parse analysis summary
             summary_data = response_data.get("analysis_summary", {})
             analysis_summary = AnalysisSummary(
@@ -184,123 +198,10 @@ class CredentialAnalysisResultBuilder:
             )
             
             # Parse credentials
-            credentials = []
-            for cred_data in response_data.get("credentials", []):
-                
-                # Parse country match
-                country_data = cred_data.get("country", {})
-                country = CountryMatch(
-                    extracted_name=country_data.get("extracted_name", ""),
-                    validated_name=country_data.get("validated_name"),
-                    match_confidence=country_data.get("match_confidence", "not_found")
-                )
-                
-                # Parse institution match
-                institution_data = cred_data.get("institution", {})
-                institution = InstitutionMatch(
-                    extracted_name=institution_data.get("extracted_name", ""),
-                    validated_name=institution_data.get("validated_name"),
-                    validated_english_name=institution_data.get("validated_english_name"),
-                    match_confidence=institution_data.get("match_confidence", "not_found")
-                )
-                
-                # Parse credential match
-                credential_data = cred_data.get("foreign_credential", {})
-                credential = CredentialMatch(
-                    extracted_type=credential_data.get("extracted_type", ""),
-                    validated_type=credential_data.get("validated_type"),
-                    validated_english_type=credential_data.get("validated_english_type"),
-                    match_confidence=credential_data.get("match_confidence", "not_found")
-                )
-                
-                # Parse attendance dates (support multiple non-contiguous periods)
-                dates_data = cred_data.get("attendance_dates")
-                attendance_dates = None
-                if dates_data:
-                    periods: List[AttendancePeriod] = []
-
-                    # Case 1: String like "1999, 2004-2007"
-                    if isinstance(dates_data, str):
-                        for segment in [s.strip() for s in dates_data.split(",") if s.strip()]:
-                            if "-" in segment:
-                                start, end = [p.strip() or None for p in segment.split("-", 1)]
-                                periods.append(AttendancePeriod(start_date=start or None, end_date=end or None))
-                            else:
-                                periods.append(AttendancePeriod(start_date=segment, end_date=None))
-
-                    # Case 2: Dict with explicit periods list
-                    elif isinstance(dates_data, dict) and isinstance(dates_data.get("periods"), list):
-                        for p in dates_data.get("periods", []):
-                            periods.append(AttendancePeriod(
-                                start_date=p.get("start_date"),
-                                end_date=p.get("end_date")
-                            ))
-
-                    # Case 3: Backward compatibility: single start/end at top-level
-                    elif isinstance(dates_data, dict) and ("start_date" in dates_data or "end_date" in dates_data):
-                        periods.append(AttendancePeriod(
-                            start_date=dates_data.get("start_date"),
-                            end_date=dates_data.get("end_date")
-                        ))
-
-                    if periods:
-                        attendance_dates = AttendanceDates(periods=periods)
-                
-                # Parse program length
-                length_data = cred_data.get("program_length", {})
-                program_length = ProgramLength(
-                    extracted_length=length_data.get("extracted_length"),
-                    validated_length=length_data.get("validated_length")
-                ) if length_data else None
-                
-                # Parse US equivalency
-                # Parse grade scale
-                grade_data = cred_data.get("grade_scale", {})
-                if grade_data:
-                    validated_scale_data = grade_data.get("validated_scale", {}) or {}
-                    validated_scale = ValidatedGradeScale(
-                        id=validated_scale_data.get("id"),
-                        name=validated_scale_data.get("name")
-                    ) if validated_scale_data else None
-                    grade_scale = GradeScaleInfo(
-                        extracted_hint=grade_data.get("extracted_hint"),
-                        validated_scale=validated_scale,
-                        match_confidence=grade_data.get("match_confidence", "not_found")
-                    )
-                else:
-                    grade_scale = None
-
-                # Parse US equivalency
-                equivalency_data = cred_data.get("us_equivalency", {})
-                us_equivalency = USEquivalency(
-                    equivalency_statement=equivalency_data.get("equivalency_statement"),
-                    match_confidence=equivalency_data.get("match_confidence", "not_found")
-                ) if equivalency_data else None
-                
-                # Parse additional info
-                additional_data = cred_data.get("additional_info", {})
-                additional_info = AdditionalInfo(
-                    grades=additional_data.get("grades"),
-                    honors=additional_data.get("honors"),
-                    notes=additional_data.get("notes")
-                ) if additional_data else None
-                
-                # Create credential info
-                credential_info = CredentialInfo(
-                    credential_id=cred_data.get("credential_id", ""),
-                    country=country,
-                    institution=institution,
-                    foreign_credential=credential,
-                    program_of_study=cred_data.get("program_of_study"),
-                    award_date=cred_data.get("award_date"),
-                    attendance_dates=attendance_dates,
-                    program_length=program_length,
-                    grade_scale=grade_scale,
-                    us_equivalency=us_equivalency,
-                    additional_info=additional_info
-                )
-                
-                credentials.append(credential_info)
+            credentials = [
+                CredentialAnalysisResultBuilder.credential_from_llm(cred_data)
+                for cred_data in response_data.get("credentials", [])
+            ]
             
             # Create final result
             result = CredentialAnalysisResult(
@@ -325,6 +226,135 @@ class CredentialAnalysisResultBuilder:
                 errors=[f"Failed to parse LLM response: {str(e)}"]
             )
     
+    @staticmethod
+    def credential_from_llm(cred_data: Dict[str, Any]) -> CredentialInfo:
+        """
+        Build a CredentialInfo from one entry of the LLM response's credentials list.
+        
+        Used for complete responses and for credentials surfaced while the
+        response is still streaming.
+        
+        Args:
+            cred_data: Dictionary for one credential
+            
+        Returns:
+            CredentialInfo: Structured credential
+        """
+        # Parse country match
+        country_data = cred_data.get("country", {})
+        country = CountryMatch(
+            extracted_name=country_data.get("extracted_name", ""),
+            validated_name=country_data.get("validated_name"),
+            match_confidence=country_data.get("match_confidence", "not_found")
+        )
+        
+        # Parse institution match
+        institution_data = cred_data.get("institution", {})
+        institution = InstitutionMatch(
+            extracted_name=institution_data.get("extracted_name", ""),
+            validated_name=institution_data.get("validated_name"),
+            validated_english_name=institution_data.get("validated_english_name"),
+            match_confidence=institution_data.get("match_confidence", "not_found")
+        )
+        
+        # Parse credential match
+        credential_data = cred_data.get("foreign_credential", {})
+        credential = CredentialMatch(
+            extracted_type=credential_data.get("extracted_type", ""),
+            validated_type=credential_data.get("validated_type"),
+            validated_english_type=credential_data.get("validated_english_type"),
+            match_confidence=credential_data.get("match_confidence", "not_found")
+        )
+        
+        # Parse attendance dates (support multiple non-contiguous periods)
+        dates_data = cred_data.get("attendance_dates")
+        attendance_dates = None
+        if dates_data:
+            periods: List[AttendancePeriod] = []
+
+            # Case 1: String like "1999, 2004-2007"
+            if isinstance(dates_data, str):
+                for segment in [s.strip() for s in dates_data.split(",") if s.strip()]:
+                    if "-" in segment:
+                        start, end = [p.strip() or None for p in segment.split("-", 1)]
+                        periods.append(AttendancePeriod(start_date=start or None, end_date=end or None))
+                    else:
+                        periods.append(AttendancePeriod(start_date=segment, end_date=None))
+
+            # Case 2: Dict with explicit periods list
+            elif isinstance(dates_data, dict) and isinstance(dates_data.get("periods"), list):
+                for p in dates_data.get("periods", []):
+                    periods.append(AttendancePeriod(
+                        start_date=p.get("start_date"),
+                        end_date=p.get("end_date")
+                    ))
+
+            # Case 3: Backward compatibility: single start/end at top-level
+            elif isinstance(dates_data, dict) and ("start_date" in dates_data or "end_date" in dates_data):
+                periods.append(AttendancePeriod(
+                    start_date=dates_data.get("start_date"),
+                    end_date=dates_data.get("end_date")
+                ))
+
+            if periods:
+                attendance_dates = AttendanceDates(periods=periods)
+        
+        # Parse program length
+        length_data = cred_data.get("program_length", {})
+        program_length = ProgramLength(
+            extracted_length=length_data.get("extracted_length"),
+            validated_length=length_data.get("validated_length")
+        ) if length_data else None
+        
+        # Parse US equivalency
+        # Parse grade scale
+        grade_data = cred_data.get("grade_scale", {})
+        if grade_data:
+            validated_scale_data = grade_data.get("validated_scale", {}) or {}
+            validated_scale = ValidatedGradeScale(
+                id=validated_scale_data.get("id"),
+                name=validated_scale_data.get("name")
+            ) if validated_scale_data else None
+            grade_scale = GradeScaleInfo(
+                extracted_hint=grade_data.get("extracted_hint"),
+                validated_scale=validated_scale,
+                match_confidence=grade_data.get("match_confidence", "not_found")
+            )
+        else:
+            grade_scale = None
+
+        # Parse US equivalency
+        equivalency_data = cred_data.get("us_equivalency", {})
+        us_equivalency = USEquivalency(
+            equivalency_statement=equivalency_data.get("equivalency_statement"),
+            match_confidence=equivalency_data.get("match_confidence", "not_found")
+        ) if equivalency_data else None
+        
+        # Parse additional info
+        additional_data = cred_data.get("additional_info", {})
+        additional_info = AdditionalInfo(
+            grades=additional_data.get("grades"),
+            honors=additional_data.get("honors"),
+            notes=additional_data.get("notes")
+        ) if additional_data else None
+        
+        # Create credential info
+        credential_info = CredentialInfo(
+            credential_id=cred_data.get("credential_id", ""),
+            country=country,
+            institution=institution,
+            foreign_credential=credential,
+            program_of_study=cred_data.get("program_of_study"),
+            award_date=cred_data.get("award_date"),
+            attendance_dates=attendance_dates,
+            program_length=program_length,
+            grade_scale=grade_scale,
+            us_equivalency=us_equivalency,
+            additional_info=additional_info
+        )
+        
+        return credential_info
+    
     @staticmethod
     def to_dict(result: CredentialAnalysisResult) -> Dict[str, Any]:
         """
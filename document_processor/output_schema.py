@@ -0,0 +1,183 @@
+"""
+JSON schema of the analysis answer, derived from the result dataclasses.
+
+The schema describes what the model returns: a CredentialAnalysisResult
+without the fields the pipeline fills in itself. It is generated from the
+dataclasses in models.py, so a field added there reaches the structured
+output tools of both providers and the validation in
+CredentialAnalysisResultBuilder without further changes.
+"""
+
+import dataclasses
+from typing import Any, Dict, FrozenSet, List, Union, get_args, get_origin, get_type_hints
+
+from .models import CredentialAnalysisResult
+
+# Fields of CredentialAnalysisResult set by the pipeline rather than the model
+PIPELINE_FIELDS = frozenset({"success", "errors", "conversation_metadata"})
+
+# Fields without a default that the model may still leave out (the prompts do not ask for a summary)
+OPTIONAL_OUTPUT_FIELDS = frozenset({"analysis_summary"})
+
+# Allowed values of string fields by field name, as documented on the dataclasses
+FIELD_ENUMS = {
+    "match_confidence": ["high", "medium", "low", "not_found"],
+    "analysis_confidence": ["high", "medium", "low"],
+}
+
+_JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean"}
+
+
+def analysis_output_schema(nullable_keyword: bool = False) -> Dict[str, Any]:
+    """
+    Build the JSON schema of the analysis answer.
+    
+    Args:
+        nullable_keyword: Mark optional fields with "nullable": true and give untyped fields a
+            string type, as Gemini's OpenAPI schemas require, instead of adding "null" to the
+            field's type as in JSON Schema
+    
+    Returns:
+        Dict: Schema of the answer object
+    """
+    return _object_schema(CredentialAnalysisResult, nullable_keyword, PIPELINE_FIELDS)
+
+
+def validate_analysis_output(data: Any) -> List[str]:
+    """
+    Check an analysis answer against the schema.
+    
+    Keys the schema does not describe are ignored, so the metadata that
+    the services add to the answer never counts as an issue.
+    
+    Args:
+        data: Answer returned by the model
+    
+    Returns:
+        List[str]: One message per mismatch, e.g. "credentials[0].country: missing"; empty if the answer matches
+    """
+    issues: List[str] = []
+    _validate(data, ANALYSIS_OUTPUT_SCHEMA, "", issues)
+    return issues
+
+
+def _object_schema(cls: type, nullable_keyword: bool, exclude: FrozenSet[str] = frozenset()) -> Dict[str, Any]:
+    """Build the schema of one dataclass."""
+    hints = get_type_hints(cls)
+    properties: Dict[str, Any] = {}
+    required: List[str] = []
+    
+    for field in dataclasses.fields(cls):
+        if field.name in exclude:
+            continue
+        
+        hint = hints[field.name]
+        optional = _is_optional(hint)
+        schema = _type_schema(_strip_optional(hint) if optional else hint, nullable_keyword)
+        if field.name in FIELD_ENUMS:
+            schema["enum"] = FIELD_ENUMS[field.name]
+        if optional:
+            _make_nullable(schema, nullable_keyword)
+        
+        has_default = field.default is not dataclasses.MISSING or field.default_factory is not dataclasses.MISSING
+        if not (has_default or optional or field.name in OPTIONAL_OUTPUT_FIELDS):
+            required.append(field.name)
+        properties[field.name] = schema
+    
+    schema = {
+        "type": "object",
+        "description": (cls.__doc__ or cls.__name__).strip().splitlines()[0],
+        "properties": properties
+    }
+    if required:
+        schema["required"] = required
+    return schema
+
+
+def _type_schema(hint: Any, nullable_keyword: bool) -> Dict[str, Any]:
+    """Build the schema of one field type."""
+    if dataclasses.is_dataclass(hint):
+        return _object_schema(hint, nullable_keyword)
+    
+    origin = get_origin(hint)
+    if origin in (list, List):
+        args = get_args(hint)
+        return {"type": "array", "items": _type_schema(args[0] if args else Any, nullable_keyword)}
+    if origin in (dict, Dict):
+        return {"type": "object"}
+    if hint in _JSON_TYPES:
+        return {"type": _JSON_TYPES[hint]}
+    
+    # Any (e.g. database IDs); Gemini needs a type for every field
+    return {"type": "string"} if nullable_keyword else {}
+
+
+def _is_optional(hint: Any) -> bool:
+    """Check whether a type hint is Optional[...]."""
+    return get_origin(hint) is Union and type(None) in get_args(hint)
+
+
+def _strip_optional(hint: Any) -> Any:
+    """Get the type inside Optional[...]."""
+    args = [arg for arg in get_args(hint) if arg is not type(None)]
+    return args[0] if len(args) == 1 else Any
+
+
+def _make_nullable(schema: Dict[str, Any], nullable_keyword: bool) -> None:
+    """Allow null for a field."""
+    if nullable_keyword:
+        schema["nullable"] = True
+    elif "type" in schema:
+        schema["type"] = [schema["type"], "null"]
+
+
+def _matches_type(value: Any, json_type: str) -> bool:
+    """Check a value against one JSON Schema type."""
+    if json_type == "null":
+        return value is None
+    if json_type == "boolean":
+        return isinstance(value, bool)
+    if json_type == "integer":
+        return isinstance(value, int) and not isinstance(value, bool)
+    if json_type == "number":
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if json_type == "string":
+        return isinstance(value, str)
+    if json_type == "array":
+        return isinstance(value, list)
+    if json_type == "object":
+        return isinstance(value, dict)
+    return True
+
+
+def _validate(value: Any, schema: Dict[str, Any], path: str, issues: List[str]) -> None:
+    """Validate a value against a schema, appending mismatches to issues."""
+    location = path or "answer"
+    json_types = schema.get("type")
+    if json_types is not None:
+        allowed = json_types if isinstance(json_types, list) else [json_types]
+        if not any(_matches_type(value, json_type) for json_type in allowed):
+            issues.append(f"{location}: expected {' or '.join(allowed)}, got {type(value).__name__}")
+            return
+    
+    if value is None:
+        return
+    
+    if "enum" in schema and value not in schema["enum"]:
+        issues.append(f"{location}: {value!r} is not one of {', '.join(schema['enum'])}")
+    
+    if isinstance(value, dict) and "properties" in schema:
+        for name in schema.get("required", []):
+            if name not in value:
+                issues.append(f"{path + '.' if path else ''}{name}: missing")
+        for name, property_schema in schema["properties"].items():
+            if name in value:
+                _validate(value[name], property_schema, f"{path + '.' if path else ''}{name}", issues)
+    
+    elif isinstance(value, list) and "items" in schema:
+        for index, item in enumerate(value):
+            _validate(item, schema["items"], f"{location}[{index}]", issues)
+
+
+# JSON Schema form used for validation
+ANALYSIS_OUTPUT_SCHEMA = analysis_output_schema()
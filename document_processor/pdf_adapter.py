@@ -74,6 +74,24 @@ class PDFAdapter:
         
         return credential_groups, case_info, options
     
+    @staticmethod
+    def convert_credential(cred: CredentialInfo, index: int, is_cbc: bool = False) -> CredentialGroup:
+        """
+        Convert one credential to PDF generator format.
+        
+        Lets callers build credential groups as credentials are surfaced
+        during a streamed analysis, before the whole result is available.
+        
+        Args:
+            cred: The credential to convert
+            index: Position of the credential in the analysis result
+            is_cbc: Whether this is a course-by-course evaluation
+            
+        Returns:
+            CredentialGroup (or CredentialGroupWithCBC) for the PDF generator
+        """
+        return PDFAdapter._convert_credential(cred, index, is_cbc)
+    
     @staticmethod
     def _convert_credential(cred: CredentialInfo, index: int, is_cbc: bool = False) -> CredentialGroup:
         """Convert a single CredentialInfo to CredentialGroup or CredentialGroupWithCBC."""
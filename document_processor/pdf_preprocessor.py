@@ -0,0 +1,498 @@
+"""
+Page-level preprocessing of PDF documents before LLM analysis.
+
+Folios are often multi-megabyte scans padded with blank separator sheets and
+pages scanned twice, and every page is paid for in upload size, input tokens
+and latency. PDFPreprocessor reads a document page by page with pypdf,
+extracts the page text where there is a text layer, drops blank pages and
+exact duplicates, and writes the pages that remain to a smaller PDF. Very
+large documents can also be split into page-range chunks, which are analyzed
+in parallel and combined with merge_chunk_results().
+
+Duplicate detection is exact: a page counts as a duplicate when its text and
+embedded images match an earlier page byte for byte, as happens when the same
+scan is added to a folio twice. Pages scanned again are kept.
+"""
+
+import copy
+import hashlib
+import logging
+import shutil
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from pypdf import PdfReader, PdfWriter
+
+from config import (
+    PDF_BLANK_INK_RATIO,
+    PDF_CHUNK_MAX_PAGES,
+    PDF_CHUNK_OVERLAP_PAGES,
+    PDF_CHUNK_MAX_WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Bumped when page selection or the page notes in the prompt change, so cached results are not reused
+PREPROCESSING_VERSION = 2
+
+# Characters of extracted text that make a page non-blank
+MIN_TEXT_CHARS = 3
+
+# Pages without text or images whose content stream is shorter than this draw next to nothing
+BLANK_CONTENT_BYTES = 256
+
+# Scans are reduced to this size before counting ink
+BLANK_CHECK_SIZE = (512, 512)
+
+# Grey levels a pixel must be darker than the paper (the median grey) to count as ink
+INK_CONTRAST = 40
+
+_CONFIDENCE_ORDER = ["low", "medium", "high"]
+
+
+@dataclass
+class PageInfo:
+    """What preprocessing found out about one page."""
+    number: int  # 1-based page number in the original document
+    text: str = ""  # Extracted text with whitespace collapsed; empty for scans
+    image_count: int = 0
+    blank: bool = False
+    duplicate_of: Optional[int] = None  # Number of the earlier page this page repeats
+    fingerprint: Optional[str] = None
+    
+    @property
+    def kept(self) -> bool:
+        """Whether the page is sent to the LLM."""
+        return not self.blank and self.duplicate_of is None
+
+
+@dataclass
+class DocumentChunk:
+    """A PDF file sent to the LLM in one analysis."""
+    path: str
+    pages: List[int] = field(default_factory=list)  # Original page numbers in the file, empty if unknown
+    
+    @property
+    def page_range(self) -> Optional[Tuple[int, int]]:
+        """First and last original page number in the chunk."""
+        return (self.pages[0], self.pages[-1]) if self.pages else None
+
+
+@dataclass
+class PreparedDocument:
+    """A document ready for analysis: its pages and the files to send."""
+    source_path: str
+    pages: List[PageInfo]
+    chunks: List[DocumentChunk]
+    temp_dir: Optional[str] = None
+    
+    @property
+    def kept_pages(self) -> List[int]:
+        """Numbers of the pages sent to the LLM."""
+        return [page.number for page in self.pages if page.kept]
+    
+    def summary(self) -> Dict[str, Any]:
+        """
+        Describe the preprocessing for the conversation metadata.
+        
+        Returns:
+            Dict: Page counts, dropped pages and chunk page ranges
+        """
+        return {
+            "page_count": len(self.pages),
+            "pages_sent": len(self.kept_pages),
+            "text_pages": sum(1 for page in self.pages if page.text),
+            "blank_pages": [page.number for page in self.pages if page.blank],
+            "duplicate_pages": [
+                {"page": page.number, "duplicate_of": page.duplicate_of}
+                for page in self.pages if page.duplicate_of is not None
+            ],
+            "chunks": [list(chunk.page_range) for chunk in self.chunks if chunk.page_range]
+        }
+    
+    def cleanup(self) -> None:
+        """Delete the chunk files written for the analysis."""
+        if self.temp_dir:
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+            self.temp_dir = None
+
+
+class PDFPreprocessor:
+    """Drops blank and duplicate pages and splits large documents into chunks."""
+    
+    def __init__(self, blank_ink_ratio: float = PDF_BLANK_INK_RATIO, max_pages: int = PDF_CHUNK_MAX_PAGES,
+                 overlap_pages: int = PDF_CHUNK_OVERLAP_PAGES, max_workers: int = PDF_CHUNK_MAX_WORKERS):
+        """
+        Initialize the preprocessor.
+        
+        Args:
+            blank_ink_ratio: Share of dark pixels below which a scanned page is blank
+            max_pages: Split documents with more pages than this into chunks (0 never splits)
+            overlap_pages: Pages repeated at the start of the next chunk
+            max_workers: Chunks of one document analyzed at once
+        """
+        self.blank_ink_ratio = blank_ink_ratio
+        self.max_pages = max(0, max_pages)
+        self.overlap_pages = max(0, min(overlap_pages, self.max_pages - 1)) if self.max_pages else 0
+        self.max_workers = max(1, max_workers)
+    
+    def signature(self) -> str:
+        """
+        Describe the settings that change what is sent to the LLM, for the result cache key.
+        
+        Returns:
+            str: Settings signature
+        """
+        return (f"pdf-preprocessing:v{PREPROCESSING_VERSION}:ink={self.blank_ink_ratio}:"
+                f"chunk={self.max_pages}/{self.overlap_pages}")
+    
+    def prepare(self, pdf_path: str) -> PreparedDocument:
+        """
+        Analyze the pages of a PDF and write the files to send to the LLM.
+        
+        The original file is sent unchanged when no page is dropped and the
+        document is not split, when every page would be dropped, or when the
+        PDF cannot be read with pypdf.
+        
+        Args:
+            pdf_path: Path to the PDF file
+        
+        Returns:
+            PreparedDocument: Page details and the chunk files; call cleanup() when done
+        """
+        try:
+            reader = PdfReader(pdf_path)
+            pages = self._analyze_pages(reader)
+        except Exception as e:
+            logger.warning(f"Skipping preprocessing of {pdf_path}: {e}")
+            return PreparedDocument(pdf_path, [], [DocumentChunk(pdf_path)])
+        
+        document = PreparedDocument(pdf_path, pages, [])
+        kept = document.kept_pages
+        if not kept and pages:
+            logger.warning(f"All {len(pages)} pages of {pdf_path} look blank; sending the original file")
+            for page in pages:
+                page.blank, page.duplicate_of = False, None
+            kept = document.kept_pages
+        
+        ranges = self._chunk_ranges(kept)
+        if len(ranges) == 1 and len(kept) == len(pages):
+            document.chunks = [DocumentChunk(pdf_path, kept)]
+            return document
+        
+        document.temp_dir = tempfile.mkdtemp(prefix="eval-worker-pdf-")
+        try:
+            for index, chunk_pages in enumerate(ranges):
+                chunk_path = str(Path(document.temp_dir) / f"{Path(pdf_path).stem}.part{index + 1}.pdf")
+                self._write_pages(reader, chunk_pages, chunk_path)
+                document.chunks.append(DocumentChunk(chunk_path, chunk_pages))
+        except Exception as e:
+            logger.warning(f"Could not write preprocessed pages of {pdf_path}, sending the original file: {e}")
+            document.cleanup()
+            return PreparedDocument(pdf_path, [], [DocumentChunk(pdf_path)])
+        
+        dropped = len(pages) - len(kept)
+        logger.info(f"Preprocessed {pdf_path}: {len(pages)} pages, {dropped} dropped, "
+                    f"{len(document.chunks)} chunk(s)")
+        return document
+    
+    def _analyze_pages(self, reader: PdfReader) -> List[PageInfo]:
+        """Extract the text of every page and mark blank and duplicate pages."""
+        pages: List[PageInfo] = []
+        seen: Dict[str, int] = {}
+        
+        for index, page in enumerate(reader.pages):
+            info = self._analyze_page(page, index + 1)
+            if not info.blank and info.fingerprint:
+                if info.fingerprint in seen:
+                    info.duplicate_of = seen[info.fingerprint]
+                else:
+                    seen[info.fingerprint] = info.number
+            pages.append(info)
+        
+        return pages
+    
+    def _analyze_page(self, page: Any, number: int) -> PageInfo:
+        """
+        Work out the text, blankness and fingerprint of one page.
+        
+        Args:
+            page: pypdf page object
+            number: 1-based page number
+        
+        Returns:
+            PageInfo: Page details (duplicate_of is filled in by the caller)
+        """
+        info = PageInfo(number=number)
+        try:
+            info.text = " ".join((page.extract_text() or "").split())
+        except Exception as e:
+            logger.debug(f"No text extracted from page {number}: {e}")
+        
+        fingerprint = hashlib.sha256(info.text.encode("utf-8"))
+        images_blank = True
+        try:
+            images = list(page.images)
+            info.image_count = len(images)
+            for image_file in images:
+                fingerprint.update(hashlib.sha256(image_file.data).digest())
+                if images_blank and not self._is_blank_image(image_file.image):
+                    images_blank = False
+        except Exception as e:
+            # An image that cannot be decoded may hold anything, so keep the page and never match it
+            logger.debug(f"Could not read the images of page {number}: {e}")
+            return info
+        
+        if len(info.text) >= MIN_TEXT_CHARS:
+            info.fingerprint = fingerprint.hexdigest()
+            return info
+        
+        if info.image_count:
+            info.blank = images_blank
+            info.fingerprint = fingerprint.hexdigest()
+            return info
+        
+        # Neither text nor images: vector drawings or nothing at all
+        try:
+            contents = page.get_contents()
+            data = contents.get_data() if contents is not None else b""
+        except Exception as e:
+            logger.debug(f"Could not read the content stream of page {number}: {e}")
+            return info
+        
+        info.blank = len(data) < BLANK_CONTENT_BYTES
+        info.fingerprint = hashlib.sha256(data).hexdigest()
+        return info
+    
+    def _is_blank_image(self, image: Any) -> bool:
+        """
+        Check whether a scanned image is an empty sheet.
+        
+        Args:
+            image: PIL image decoded from the page
+        
+        Returns:
+            bool: True if hardly any pixel is clearly darker than the paper
+        """
+        grey = image.convert("L")
+        grey.thumbnail(BLANK_CHECK_SIZE)
+        histogram = grey.histogram()
+        total = sum(histogram)
+        if not total:
+            return True
+        
+        # The median grey level is the paper colour of a mostly empty sheet
+        running, paper = 0, 0
+        for level, count in enumerate(histogram):
+            running += count
+            if running * 2 >= total:
+                paper = level
+                break
+        
+        ink = sum(histogram[:max(0, paper - INK_CONTRAST)])
+        return ink / total < self.blank_ink_ratio
+    
+    def _chunk_ranges(self, kept: List[int]) -> List[List[int]]:
+        """Split the kept page numbers into overlapping chunks of at most max_pages pages."""
+        if not self.max_pages or len(kept) <= self.max_pages:
+            return [kept]
+        
+        step = self.max_pages - self.overlap_pages
+        ranges = []
+        for start in range(0, len(kept), step):
+            ranges.append(kept[start:start + self.max_pages])
+            if start + self.max_pages >= len(kept):
+                break
+        return ranges
+    
+    @staticmethod
+    def _write_pages(reader: PdfReader, page_numbers: List[int], output_path: str) -> None:
+        """Write the given pages of a document to a new PDF file."""
+        writer = PdfWriter()
+        for number in page_numbers:
+            writer.add_page(reader.pages[number - 1])
+        with open(output_path, "wb") as f:
+            writer.write(f)
+
+
+def chunk_prompt(prompt: str, chunk: DocumentChunk, document: PreparedDocument) -> str:
+    """
+    Tell the model which pages of the original document the attached file holds.
+    
+    Files with dropped pages or of a split document number their pages
+    differently from the original folio, so the note maps file pages to
+    original page numbers for the model to use (e.g. in extraction_notes).
+    
+    Args:
+        prompt: Analysis prompt for the whole document
+        chunk: Chunk being analyzed
+        document: Document the chunk belongs to
+    
+    Returns:
+        str: The prompt, with a note on the file's pages unless it is the original document
+    """
+    page_count = len(document.pages)
+    if not chunk.pages or chunk.pages == list(range(1, page_count + 1)):
+        return prompt
+    
+    note = f"The attached file holds {len(chunk.pages)} of the {page_count} pages of the original document."
+    if len(document.kept_pages) < page_count:
+        note += " Blank and duplicate pages were left out."
+    if len(document.chunks) > 1:
+        part = document.chunks.index(chunk) + 1
+        note += (f" It is part {part} of {len(document.chunks)}; the other parts are analyzed separately, so "
+                 f"report only the credentials shown in this part, including any that are only partly shown.")
+    note += (f" Refer to pages by their original page numbers ({_page_mapping(chunk.pages)}), "
+             f"not by their position in the file.")
+    return f"{prompt}\n\n## Document Pages:\n{note}"
+
+
+def _page_mapping(pages: List[int]) -> str:
+    """Describe which original page each page of a file is, e.g. "file pages 1-3 are pages 4-6"."""
+    runs: List[Tuple[int, int, int]] = []  # (first file page, first original page, length)
+    for position, number in enumerate(pages, start=1):
+        if runs and number == runs[-1][1] + runs[-1][2]:
+            runs[-1] = (runs[-1][0], runs[-1][1], runs[-1][2] + 1)
+        else:
+            runs.append((position, number, 1))
+    
+    parts = []
+    for position, number, length in runs:
+        if length == 1:
+            parts.append(f"file page {position} is page {number}")
+        else:
+            parts.append(f"file pages {position}-{position + length - 1} are pages {number}-{number + length - 1}")
+    return "; ".join(parts)
+
+
+def merge_chunk_results(results: List[Dict[str, Any]], document: PreparedDocument) -> Dict[str, Any]:
+    """
+    Combine the LLM results of the chunks of one document into a single result.
+    
+    Credentials found in more than one chunk (e.g. on overlapping pages) are
+    merged into one, keeping the more complete answer and filling its gaps
+    from the other. Credential IDs are renumbered, extraction notes are
+    labelled with their pages, and the analysis confidence is the lowest of
+    the chunks. The result only counts as successful if every chunk was
+    analyzed successfully.
+    
+    Args:
+        results: LLM service results in chunk order
+        document: Document the chunks belong to
+    
+    Returns:
+        Dict: Merged result in the LLM service result format
+    """
+    if len(results) == 1:
+        return results[0]
+    
+    merged: Dict[str, Any] = {"success": all(result.get("success", False) for result in results)}
+    credentials: List[Dict[str, Any]] = []
+    notes: List[str] = []
+    errors: List[str] = []
+    confidences: List[str] = []
+    
+    for result, chunk in zip(results, document.chunks):
+        first, last = chunk.page_range or (0, 0)
+        label = f"Pages {first}-{last}"
+        for credential in result.get("credentials") or []:
+            _add_credential(credentials, credential)
+        notes.extend(f"{label}: {note}" for note in result.get("extraction_notes") or [])
+        errors.extend(f"{label}: {error}" for error in result.get("errors") or [])
+        
+        summary = result.get("analysis_summary") or {}
+        if summary.get("analysis_confidence") in _CONFIDENCE_ORDER:
+            confidences.append(summary["analysis_confidence"])
+        if "analysis_summary" not in merged and summary:
+            merged["analysis_summary"] = dict(summary)
+        
+        # Keep any other answer fields from the first chunk that has them
+        for key, value in result.items():
+            if key not in merged and key not in ("credentials", "extraction_notes", "errors",
+                                                 "conversation_metadata"):
+                merged[key] = value
+    
+    for index, credential in enumerate(credentials):
+        credential["credential_id"] = f"credential_{index + 1}"
+    merged["credentials"] = credentials
+    merged["extraction_notes"] = notes
+    if errors:
+        merged["errors"] = errors
+    
+    summary = merged.setdefault("analysis_summary", {})
+    summary["total_credentials_found"] = len(credentials)
+    if confidences:
+        summary["analysis_confidence"] = min(confidences, key=_CONFIDENCE_ORDER.index)
+    
+    metadata: Dict[str, Any] = {}
+    for result in results:
+        _merge_metadata(metadata, result.get("conversation_metadata") or {})
+    metadata["chunks"] = [
+        {"pages": list(chunk.page_range) if chunk.page_range else None, "success": result.get("success", False)}
+        for result, chunk in zip(results, document.chunks)
+    ]
+    merged["conversation_metadata"] = metadata
+    return merged
+
+
+def _fold(value: Any) -> str:
+    """Normalize a string for comparing credentials."""
+    return " ".join(str(value or "").casefold().split())
+
+
+def _credential_key(credential: Dict[str, Any]) -> Tuple[str, str]:
+    """Institution and credential type, which identify a credential across chunks."""
+    institution = credential.get("institution") or {}
+    foreign_credential = credential.get("foreign_credential") or {}
+    return _fold(institution.get("extracted_name")), _fold(foreign_credential.get("extracted_type"))
+
+
+def _filled_fields(value: Any) -> int:
+    """Count the non-empty leaf values of an answer fragment."""
+    if isinstance(value, dict):
+        return sum(_filled_fields(item) for item in value.values())
+    if isinstance(value, list):
+        return sum(_filled_fields(item) for item in value)
+    return 0 if value in (None, "", "not_found") else 1
+
+
+def _add_credential(credentials: List[Dict[str, Any]], credential: Dict[str, Any]) -> None:
+    """Append a credential, or merge it into an earlier one it repeats."""
+    key = _credential_key(credential)
+    award_date = _fold(credential.get("award_date"))
+    
+    for index, existing in enumerate(credentials):
+        existing_date = _fold(existing.get("award_date"))
+        if _credential_key(existing) != key or (award_date and existing_date and award_date != existing_date):
+            continue
+        
+        best, other = ((credential, existing) if _filled_fields(credential) > _filled_fields(existing)
+                       else (existing, credential))
+        combined = copy.deepcopy(best)
+        for name, value in other.items():
+            if _filled_fields(combined.get(name)) == 0 and _filled_fields(value) > 0:
+                combined[name] = copy.deepcopy(value)
+        credentials[index] = combined
+        return
+    
+    credentials.append(copy.deepcopy(credential))
+
+
+def _merge_metadata(target: Dict[str, Any], source: Dict[str, Any]) -> None:
+    """Add one chunk's conversation metadata to the merged metadata."""
+    for key, value in source.items():
+        if key not in target:
+            target[key] = copy.deepcopy(value)
+        elif key == "started_at":
+            target[key] = min(target[key], value)
+        elif key == "completed_at":
+            target[key] = max(target[key], value)
+        elif isinstance(value, list) and isinstance(target[key], list):
+            target[key].extend(copy.deepcopy(value))
+        elif isinstance(value, dict) and isinstance(target[key], dict):
+            _merge_metadata(target[key], value)
+        elif (isinstance(value, (int, float)) and isinstance(target[key], (int, float))
+              and not isinstance(value, bool)):
+            target[key] += value
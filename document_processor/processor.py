@@ -5,32 +5,54 @@ Orchestrates the PDF analysis process using LLM services and provides
 a simple interface for analyzing credential documents.
 """
 
+import asyncio
 import logging
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Callable, Optional
 
 from llm_services import create_llm_service, BaseLLMService
-from .models import CredentialAnalysisResult, CredentialAnalysisResultBuilder
-from config import LLM_PROVIDER
+from llm_services.streaming import CredentialCallback
+from database.reference_store import get_reference_version
+from .models import CredentialAnalysisResult, CredentialAnalysisResultBuilder, CredentialInfo
+from .result_cache import get_result_cache, hash_file, make_cache_key
+from .pdf_preprocessor import PDFPreprocessor, PreparedDocument, chunk_prompt, merge_chunk_results
+from config import LLM_PROVIDER, RESULT_CACHE_ENABLED, PDF_PREPROCESSING
 
 logger = logging.getLogger(__name__)
 
+# Called with the position of each credential in the result and the credential, as soon as it is complete
+CredentialReadyCallback = Callable[[int, CredentialInfo], None]
+
 
 class DocumentProcessor:
     """Main processor for analyzing credential documents."""
     
-    def __init__(self, llm_provider: str = None):
+    def __init__(self, llm_provider: str = None, use_cache: bool = RESULT_CACHE_ENABLED,
+                 refresh_cache: bool = False, preprocess: bool = PDF_PREPROCESSING,
+                 provider_slots: Optional[threading.BoundedSemaphore] = None):
         """
         Initialize the document processor.
         
         Args:
             llm_provider: LLM provider to use ('anthropic', 'openai', 'gemini')
                          If None, uses the provider from config
+            use_cache: Reuse and store LLM results in the result cache
+            refresh_cache: Ignore cached results but store the new ones
+            preprocess: Drop blank and duplicate pages (and split large documents)
+                        before sending a PDF to the LLM
+            provider_slots: Semaphore to hold during each LLM analysis (one per chunk of
+                            a split document), e.g. the batch's per-provider limit
         """
         self.llm_provider = llm_provider or LLM_PROVIDER
         self.llm_service = self._create_llm_service()
+        self.use_cache = use_cache
+        self.refresh_cache = refresh_cache
+        self.preprocessor = PDFPreprocessor() if preprocess else None
+        self.provider_slots = provider_slots
         
         logger.info(f"Initialized DocumentProcessor with provider: {self.llm_provider}")
     
@@ -38,7 +60,8 @@ class DocumentProcessor:
         """Create the appropriate LLM service based on provider."""
         return create_llm_service()
     
-    def process_pdf(self, pdf_path: str, prompt: Optional[str] = None, document_type: str = "general") -> CredentialAnalysisResult:
+    def process_pdf(self, pdf_path: str, prompt: Optional[str] = None, document_type: str = "general",
+                    on_credential: Optional[CredentialReadyCallback] = None) -> CredentialAnalysisResult:
         """
         Process a PDF document for credential analysis.
         
@@ -46,6 +69,8 @@ class DocumentProcessor:
             pdf_path: Path to the PDF file to analyze
             prompt: Optional custom prompt for analysis
             document_type: Type of document analysis ("general" or "cbc")
+            on_credential: Called with (index, CredentialInfo) as each credential completes,
+                while the LLM response is still streaming (all at once for cached results)
             
         Returns:
             CredentialAnalysisResult: Structured analysis results
@@ -70,36 +95,72 @@ class DocumentProcessor:
             else:
                 analysis_prompt = prompt
             
-            # Analyze with LLM service
-            llm_result = self.llm_service.analyze_pdf_document(pdf_path, analysis_prompt)
+            # Reuse a cached result for an unchanged analysis, otherwise ask the LLM service
+            cache_entry = self._get_cache_entry(pdf_path, analysis_prompt)
+            llm_result = self._load_cached_result(cache_entry)
+            if llm_result is None:
+                llm_result = self._analyze_document(pdf_path, analysis_prompt, on_credential)
+                self._store_cached_result(cache_entry, llm_result)
+            else:
+                self._replay_credentials(llm_result, on_credential)
             
-            # Convert to structured result
-            if llm_result.get("success", False):
-                result = CredentialAnalysisResultBuilder.from_llm_response(llm_result)
-                
-                # Add processor metadata
-                if result.success:
-                    logger.info(f"Successfully processed PDF: {pdf_path}")
-                    logger.info(f"Found {len(result.credentials)} credentials")
-                else:
-                    logger.warning(f"Processing completed with errors for: {pdf_path}")
-                
-                # Save results to JSON file
-                json_path = self._save_results_to_json(result, pdf_path)
-                if json_path:
-                    logger.info(f"Results saved to: {json_path}")
+            return self._build_result(llm_result, pdf_path)
                 
-                return result
-            else:
-                # Handle LLM service failure
+        except Exception as e:
+            logger.error(f"Error processing PDF {pdf_path}: {e}", exc_info=True)
+            return CredentialAnalysisResult(
+                analysis_summary=None,
+                credentials=[],
+                extraction_notes=[],
+                success=False,
+                errors=[f"Processing failed: {str(e)}"]
+            )
+    
+    async def process_pdf_async(self, pdf_path: str, prompt: Optional[str] = None,
+                                document_type: str = "general",
+                                on_credential: Optional[CredentialReadyCallback] = None) -> CredentialAnalysisResult:
+        """
+        Process a PDF document for credential analysis without blocking the event loop.
+        
+        Many documents can be analyzed concurrently on one processor, e.g.
+        with asyncio.gather(); each conversation keeps its own tracking data.
+        
+        Args:
+            pdf_path: Path to the PDF file to analyze
+            prompt: Optional custom prompt for analysis
+            document_type: Type of document analysis ("general" or "cbc")
+            on_credential: Called with (index, CredentialInfo) as each credential completes
+            
+        Returns:
+            CredentialAnalysisResult: Structured analysis results
+        """
+        try:
+            logger.info(f"Processing PDF: {pdf_path}")
+            
+            # Validate file exists
+            if not Path(pdf_path).exists():
                 return CredentialAnalysisResult(
                     analysis_summary=None,
                     credentials=[],
                     extraction_notes=[],
                     success=False,
-                    errors=llm_result.get("errors", ["Unknown LLM service error"])
+                    errors=[f"File not found: {pdf_path}"]
                 )
-                
+            
+            analysis_prompt = prompt if prompt is not None else self.llm_service.get_default_prompt(document_type)
+            
+            # Hashing the PDF and the cache lookup are blocking I/O
+            cache_entry = await asyncio.to_thread(self._get_cache_entry, pdf_path, analysis_prompt)
+            llm_result = await asyncio.to_thread(self._load_cached_result, cache_entry)
+            if llm_result is None:
+                llm_result = await self._analyze_document_async(pdf_path, analysis_prompt, on_credential)
+                await asyncio.to_thread(self._store_cached_result, cache_entry, llm_result)
+            else:
+                self._replay_credentials(llm_result, on_credential)
+            
+            # Result conversion writes the JSON file, so keep it off the event loop
+            return await asyncio.to_thread(self._build_result, llm_result, pdf_path)
+            
         except Exception as e:
             logger.error(f"Error processing PDF {pdf_path}: {e}", exc_info=True)
             return CredentialAnalysisResult(
@@ -110,13 +171,252 @@ class DocumentProcessor:
                 errors=[f"Processing failed: {str(e)}"]
             )
     
-    def process_folder(self, folder_path: str, pattern: str = "*.pdf") -> Dict[str, CredentialAnalysisResult]:
+    def _analyze_document(self, pdf_path: str, prompt: str,
+                          on_credential: Optional[CredentialReadyCallback]) -> Dict[str, Any]:
+        """
+        Analyze a PDF with the LLM service, after dropping blank and duplicate pages.
+        
+        A document split into several chunks has its chunks analyzed in
+        parallel and the results merged. Its credentials reach on_credential
+        once the merged result is ready, so their indexes match the result.
+        
+        Args:
+            pdf_path: Path to the PDF file to analyze
+            prompt: Full prompt text for the analysis
+            on_credential: Called with (index, CredentialInfo) for each credential
+            
+        Returns:
+            Dict: Result dictionary in the LLM service format
+        """
+        if self.preprocessor is None:
+            return self._call_llm(pdf_path, prompt, self._wrap_credential_callback(on_credential))
+        
+        document = self.preprocessor.prepare(pdf_path)
+        try:
+            if len(document.chunks) == 1:
+                chunk = document.chunks[0]
+                llm_result = self._call_llm(
+                    chunk.path, chunk_prompt(prompt, chunk, document), self._wrap_credential_callback(on_credential)
+                )
+            else:
+                workers = min(self.preprocessor.max_workers, len(document.chunks))
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pdf-chunk") as executor:
+                    results = list(executor.map(
+                        lambda chunk: self._call_llm(chunk.path, chunk_prompt(prompt, chunk, document)),
+                        document.chunks
+                    ))
+                llm_result = merge_chunk_results(results, document)
+                if llm_result.get("success", False):
+                    self._replay_credentials(llm_result, on_credential)
+        finally:
+            document.cleanup()
+        
+        return self._add_preprocessing_metadata(llm_result, document)
+    
+    async def _analyze_document_async(self, pdf_path: str, prompt: str,
+                                      on_credential: Optional[CredentialReadyCallback]) -> Dict[str, Any]:
+        """
+        Analyze a PDF with the LLM service without blocking the event loop.
+        
+        Same as _analyze_document(); chunks are analyzed as concurrent tasks.
+        
+        Args:
+            pdf_path: Path to the PDF file to analyze
+            prompt: Full prompt text for the analysis
+            on_credential: Called with (index, CredentialInfo) for each credential
+            
+        Returns:
+            Dict: Result dictionary in the LLM service format
+        """
+        if self.preprocessor is None:
+            return await self._call_llm_async(pdf_path, prompt, self._wrap_credential_callback(on_credential))
+        
+        # Reading and rendering pages is blocking work
+        document = await asyncio.to_thread(self.preprocessor.prepare, pdf_path)
+        try:
+            if len(document.chunks) == 1:
+                chunk = document.chunks[0]
+                llm_result = await self._call_llm_async(
+                    chunk.path, chunk_prompt(prompt, chunk, document), self._wrap_credential_callback(on_credential)
+                )
+            else:
+                semaphore = asyncio.Semaphore(self.preprocessor.max_workers)
+                
+                async def analyze_chunk(chunk):
+                    async with semaphore:
+                        return await self._call_llm_async(chunk.path, chunk_prompt(prompt, chunk, document))
+                
+                results = await asyncio.gather(*(analyze_chunk(chunk) for chunk in document.chunks))
+                llm_result = merge_chunk_results(list(results), document)
+                if llm_result.get("success", False):
+                    self._replay_credentials(llm_result, on_credential)
+        finally:
+            await asyncio.to_thread(document.cleanup)
+        
+        return self._add_preprocessing_metadata(llm_result, document)
+    
+    def _call_llm(self, pdf_path: str, prompt: str,
+                  on_credential: Optional[CredentialCallback] = None) -> Dict[str, Any]:
+        """Run one LLM analysis, holding a provider slot if the processor has a limit."""
+        if self.provider_slots is None:
+            return self.llm_service.analyze_pdf_document(pdf_path, prompt, on_credential)
+        with self.provider_slots:
+            return self.llm_service.analyze_pdf_document(pdf_path, prompt, on_credential)
+    
+    async def _call_llm_async(self, pdf_path: str, prompt: str,
+                              on_credential: Optional[CredentialCallback] = None) -> Dict[str, Any]:
+        """Run one LLM analysis on the async interface, holding a provider slot if the processor has a limit."""
+        if self.provider_slots is None:
+            return await self.llm_service.analyze_pdf_document_async(pdf_path, prompt, on_credential)
+        # The slot is a thread semaphore, so wait for it off the event loop
+        await asyncio.to_thread(self.provider_slots.acquire)
+        try:
+            return await self.llm_service.analyze_pdf_document_async(pdf_path, prompt, on_credential)
+        finally:
+            self.provider_slots.release()
+    
+    @staticmethod
+    def _add_preprocessing_metadata(llm_result: Dict[str, Any], document: PreparedDocument) -> Dict[str, Any]:
+        """Record which pages were sent in the result's conversation metadata."""
+        if document.pages:
+            llm_result.setdefault("conversation_metadata", {})["preprocessing"] = document.summary()
+        return llm_result
+    
+    @staticmethod
+    def _wrap_credential_callback(on_credential: Optional[CredentialReadyCallback]) -> Optional[CredentialCallback]:
+        """Adapt a caller's callback to the raw credential dictionaries surfaced by the LLM service."""
+        if on_credential is None:
+            return None
+        
+        def handle(index: int, cred_data: Dict[str, Any]) -> None:
+            on_credential(index, CredentialAnalysisResultBuilder.credential_from_llm(cred_data))
+        
+        return handle
+    
+    @staticmethod
+    def _replay_credentials(llm_result: Dict[str, Any], on_credential: Optional[CredentialReadyCallback]) -> None:
+        """Hand every credential of a cached result to the caller's callback."""
+        if on_credential is None:
+            return
+        for index, cred_data in enumerate(llm_result.get("credentials", [])):
+            try:
+                on_credential(index, CredentialAnalysisResultBuilder.credential_from_llm(cred_data))
+            except Exception as e:
+                logger.warning(f"Credential callback failed for credential {index}: {e}")
+    
+    def _get_cache_entry(self, pdf_path: str, prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        Work out the result cache key for analyzing a PDF with a prompt.
+        
+        Args:
+            pdf_path: Path of the PDF file to analyze
+            prompt: Full prompt text for the analysis
+            
+        Returns:
+            Optional[Dict]: Cache key and the values it was built from, or None
+            if caching is disabled or the key could not be computed
+        """
+        if not self.use_cache:
+            return None
+        
+        try:
+            model_info = self.llm_service.get_model_info()
+            entry = {
+                "pdf_sha256": hash_file(pdf_path),
+                "provider": model_info.get("provider", self.llm_provider),
+                "model": model_info.get("model", ""),
+                "reference_version": get_reference_version()
+            }
+            preprocessing = self.preprocessor.signature() if self.preprocessor else ""
+            entry["cache_key"] = make_cache_key(prompt=prompt, preprocessing=preprocessing, **entry)
+            return entry
+        except Exception as e:
+            logger.warning(f"Result cache disabled for {pdf_path}: {e}")
+            return None
+    
+    def _load_cached_result(self, cache_entry: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached LLM result (skipped when refreshing the cache).
+        
+        Args:
+            cache_entry: Entry from _get_cache_entry()
+            
+        Returns:
+            Optional[Dict]: Cached LLM result, or None if there is none to reuse
+        """
+        if cache_entry is None or self.refresh_cache:
+            return None
+        
+        llm_result = get_result_cache().get(cache_entry["cache_key"])
+        if llm_result is None:
+            return None
+        
+        logger.info(f"Using cached analysis result {cache_entry['cache_key'][:12]} (no LLM call)")
+        conversation_metadata = llm_result.setdefault("conversation_metadata", {})
+        conversation_metadata["result_cache"] = {"hit": True, "cache_key": cache_entry["cache_key"]}
+        return llm_result
+    
+    def _store_cached_result(self, cache_entry: Optional[Dict[str, Any]], llm_result: Dict[str, Any]) -> None:
+        """
+        Store a successful LLM result in the result cache.
+        
+        Args:
+            cache_entry: Entry from _get_cache_entry()
+            llm_result: Result dictionary from the LLM service
+        """
+        if cache_entry is None or not llm_result.get("success", False):
+            return
+        
+        get_result_cache().put(llm_result=llm_result, **cache_entry)
+    
+    def _build_result(self, llm_result: Dict[str, Any], pdf_path: str) -> CredentialAnalysisResult:
+        """
+        Convert an LLM service result to a structured result and save it to JSON.
+        
+        Args:
+            llm_result: Result dictionary from the LLM service
+            pdf_path: Path of the analyzed PDF file
+            
+        Returns:
+            CredentialAnalysisResult: Structured analysis results
+        """
+        # Convert to structured result
+        if llm_result.get("success", False):
+            result = CredentialAnalysisResultBuilder.from_llm_response(llm_result)
+            
+            # Add processor metadata
+            if result.success:
+                logger.info(f"Successfully processed PDF: {pdf_path}")
+                logger.info(f"Found {len(result.credentials)} credentials")
+            else:
+                logger.warning(f"Processing completed with errors for: {pdf_path}")
+            
+            # Save results to JSON file
+            json_path = self._save_results_to_json(result, pdf_path)
+            if json_path:
+                logger.info(f"Results saved to: {json_path}")
+            
+            return result
+        else:
+            # Handle LLM service failure
+            return CredentialAnalysisResult(
+                analysis_summary=None,
+                credentials=[],
+                extraction_notes=[],
+                success=False,
+                errors=llm_result.get("errors", ["Unknown LLM service error"])
+            )
+    
+    def process_folder(self, folder_path: str, pattern: str = "*.pdf",
+                       max_workers: int = 1) -> Dict[str, CredentialAnalysisResult]:
         """
         Process all PDF files in a folder.
         
         Args:
             folder_path: Path to folder containing PDF files
             pattern: File pattern to match (default: "*.pdf")
+            max_workers: Number of files analyzed concurrently (1 processes them
+                         one after another on this processor's LLM service)
             
         Returns:
             Dict mapping file paths to analysis results
@@ -134,6 +434,14 @@ class DocumentProcessor:
             
             logger.info(f"Processing {len(pdf_files)} PDF files from: {folder_path}")
             
+            if max_workers > 1:
+                from .batch import BatchAnalyzer
+                items = BatchAnalyzer(
+                    max_workers, self.llm_provider, use_cache=self.use_cache, refresh_cache=self.refresh_cache
+                ).analyze([str(f) for f in pdf_files])
+                logger.info(f"Completed processing folder: {folder_path}")
+                return {item.pdf_path: item.result for item in items}
+            
             results = {}
             for pdf_file in pdf_files:
                 try:
@@ -0,0 +1,256 @@
+"""
+On-disk cache of LLM analysis results.
+
+Analyzing a folio is the expensive part of the pipeline, while building the
+structured result, the JSON file and the PDF report from the LLM output is
+cheap. The raw LLM result of every successful analysis is therefore kept in
+a small SQLite database, keyed by everything that determines it: the PDF
+bytes, the prompt text, the provider and model, and the reference data
+version. Re-running an unchanged analysis (after a report layout change or
+a crash) is served from the cache instead of the provider.
+
+The cache is bounded by total size; the least recently used entries are
+evicted first.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from config import RESULT_CACHE_PATH, RESULT_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = Path(__file__).parent.parent / "data" / "result_cache.db"
+
+# Bytes read from a PDF at a time while hashing it
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """
+    Compute the SHA-256 of a file without reading it into memory at once.
+    
+    Args:
+        path: Path to the file
+    
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_cache_key(pdf_sha256: str, prompt: str, provider: str, model: str,
+                   reference_version: Optional[str], preprocessing: str = "") -> str:
+    """
+    Build the cache key for one analysis.
+    
+    Args:
+        pdf_sha256: SHA-256 of the PDF bytes
+        prompt: Full prompt text sent with the document
+        provider: LLM provider name
+        model: LLM model name
+        reference_version: Reference data version stamp (None before the first migration)
+        preprocessing: Signature of the PDF preprocessing settings (empty when the PDF is sent as is)
+    
+    Returns:
+        str: Hex digest identifying the analysis
+    """
+    parts = [pdf_sha256, provider, model, reference_version or "", prompt]
+    # Only added when set, so keys of unpreprocessed analyses stay as they were
+    if preprocessing:
+        parts.append(preprocessing)
+    digest = hashlib.sha256()
+    for part in parts:
+        encoded = part.encode("utf-8")
+        # Length-prefix each part so different splits never collide
+        digest.update(f"{len(encoded)}:".encode("ascii"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Size-bounded LRU cache of LLM analysis results in a SQLite file."""
+    
+    def __init__(self, db_path: Optional[Path] = None, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        """
+        Initialize the cache, creating the database file if needed.
+        
+        Args:
+            db_path: Path to the cache database (defaults to data/result_cache.db)
+            max_bytes: Maximum total size of cached results before eviction
+        """
+        self.db_path = Path(db_path or RESULT_CACHE_PATH or DEFAULT_CACHE_PATH)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS analysis_results (
+                    cache_key TEXT PRIMARY KEY,
+                    pdf_sha256 TEXT NOT NULL,
+                    provider TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    reference_version TEXT,
+                    result_json TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_analysis_results_last_used ON analysis_results(last_used_at)"
+            )
+    
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached result and mark it as recently used.
+        
+        Args:
+            cache_key: Key from make_cache_key()
+        
+        Returns:
+            Optional[Dict]: The cached LLM result, or None on a miss
+        """
+        try:
+            with self._lock, self._connect() as conn:
+                row = conn.execute(
+                    "SELECT result_json FROM analysis_results WHERE cache_key = ?", (cache_key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute(
+                    "UPDATE analysis_results SET last_used_at = ? WHERE cache_key = ?",
+                    (time.time(), cache_key)
+                )
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Result cache lookup failed: {e}")
+            return None
+    
+    def put(self, cache_key: str, llm_result: Dict[str, Any], pdf_sha256: str, provider: str,
+            model: str, reference_version: Optional[str]) -> None:
+        """
+        Store a result and evict the least recently used entries beyond the size limit.
+        
+        Args:
+            cache_key: Key from make_cache_key()
+            llm_result: Successful result dictionary from the LLM service
+            pdf_sha256: SHA-256 of the PDF bytes
+            provider: LLM provider name
+            model: LLM model name
+            reference_version: Reference data version stamp
+        """
+        try:
+            result_json = json.dumps(llm_result, ensure_ascii=False, default=str)
+            size_bytes = len(result_json.encode("utf-8"))
+            if size_bytes > self.max_bytes:
+                logger.info(f"Result of {size_bytes} bytes exceeds the cache size limit, not caching")
+                return
+            
+            now = time.time()
+            with self._lock, self._connect() as conn:
+                conn.execute(
+                    """INSERT OR REPLACE INTO analysis_results
+                       (cache_key, pdf_sha256, provider, model, reference_version,
+                        result_json, size_bytes, created_at, last_used_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (cache_key, pdf_sha256, provider, model, reference_version,
+                     result_json, size_bytes, now, now)
+                )
+                self._evict(conn)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning(f"Failed to store result in cache: {e}")
+    
+    def invalidate(self, cache_key: str) -> None:
+        """
+        Remove one entry from the cache.
+        
+        Args:
+            cache_key: Key from make_cache_key()
+        """
+        try:
+            with self._lock, self._connect() as conn:
+                conn.execute("DELETE FROM analysis_results WHERE cache_key = ?", (cache_key,))
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to invalidate cached result: {e}")
+    
+    def clear(self) -> None:
+        """Remove every cached result."""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM analysis_results")
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+        
+        Returns:
+            Dict: Entry count, total size in bytes and the size limit
+        """
+        with self._connect() as conn:
+            entries, total_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM analysis_results"
+            ).fetchone()
+        return {"entries": entries, "total_bytes": total_bytes, "max_bytes": self.max_bytes}
+    
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Delete least recently used entries until the cache fits its size limit."""
+        total_bytes = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM analysis_results").fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+        
+        evicted = 0
+        rows = conn.execute(
+            "SELECT cache_key, size_bytes FROM analysis_results ORDER BY last_used_at"
+        ).fetchall()
+        for cache_key, size_bytes in rows:
+            if total_bytes <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM analysis_results WHERE cache_key = ?", (cache_key,))
+            total_bytes -= size_bytes
+            evicted += 1
+        
+        logger.info(f"Evicted {evicted} cached results to stay under {self.max_bytes} bytes")
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a short-lived connection, committed on success and always closed."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+
+_result_cache: Optional[ResultCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """
+    Get the process-wide result cache, creating it on first use.
+    
+    Returns:
+        ResultCache: Shared cache instance
+    """
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache()
+        return _result_cache
@@ -5,22 +5,31 @@ Implements the BaseLLMService interface using Anthropic's Claude models
 with tool calling capabilities for PDF credential analysis.
 """
 
+import asyncio
 import base64
 import json
 import logging
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from concurrent.futures import Future
+from typing import Dict, Any, Optional, List, Set, Tuple
 
 import anthropic
 from anthropic.types import MessageParam, ToolUseBlock, ToolResultBlockParam
 
-from ..base import BaseLLMService
-from .tools import TOOL_SCHEMAS, execute_tool
-from config import ANTHROPIC_API_KEY, ANTHROPIC_MODEL, ANTHROPIC_TIMEOUT
+from ..base import BaseLLMService, SUBMIT_ANALYSIS_INSTRUCTION
+from ..json_extraction import extract_json_object
+from ..rate_limiter import CallStats, get_rate_limiter
+from ..streaming import CredentialCallback, CredentialStreamParser
+from .tools import TOOL_SCHEMAS, SUBMIT_ANALYSIS_TOOL, SUBMIT_ANALYSIS_TOOL_NAME, execute_tool
+from config import (ANTHROPIC_API_KEY, ANTHROPIC_MODEL, ANTHROPIC_TIMEOUT, ANTHROPIC_PROMPT_CACHING, LLM_STREAMING,
+                    LLM_STRUCTURED_OUTPUT)
 
 logger = logging.getLogger(__name__)
 
+# Marks the end of a cacheable prompt prefix (tools, then system, then messages)
+CACHE_CONTROL = {"type": "ephemeral"}
+
 
 class AnthropicService(BaseLLMService):
     """Anthropic Claude service for PDF credential analysis."""
@@ -30,12 +39,24 @@ class AnthropicService(BaseLLMService):
         if not ANTHROPIC_API_KEY:
             raise ValueError("ANTHROPIC_API_KEY not found in configuration")
         
+        # Retries are left to the shared rate limiter, which backs off across all conversations
         self.client = anthropic.Anthropic(
             api_key=ANTHROPIC_API_KEY,
-            timeout=ANTHROPIC_TIMEOUT  # 20 minutes for long documents
+            timeout=ANTHROPIC_TIMEOUT,  # 20 minutes for long documents
+            max_retries=0
         )
+        self.rate_limiter = get_rate_limiter("anthropic")
         self.model = ANTHROPIC_MODEL
-        self.tools = TOOL_SCHEMAS
+        self.streaming = LLM_STREAMING
+        self.prompt_caching = ANTHROPIC_PROMPT_CACHING
+        # With structured output Claude must call a tool every turn and finishes by calling submit_analysis
+        self.structured_output = LLM_STRUCTURED_OUTPUT
+        tools = TOOL_SCHEMAS + [SUBMIT_ANALYSIS_TOOL] if self.structured_output else TOOL_SCHEMAS
+        self.tools = self._cacheable_tools(tools) if self.prompt_caching else tools
+        
+        # Async client for analyze_pdf_document_async(), created per event loop
+        self._async_client: Optional[anthropic.AsyncAnthropic] = None
+        self._async_client_loop: Optional[asyncio.AbstractEventLoop] = None
         
         # Initialize tracking variables
         self._reset_tracking()
@@ -47,10 +68,13 @@ class AnthropicService(BaseLLMService):
         self.conversation_metadata = {
             "started_at": datetime.now().isoformat(),
             "tool_calls": [],
+            "tool_cache": {"hits": 0, "misses": 0},
             "llm_interactions": [],
             "token_usage": {
                 "total_input_tokens": 0,
                 "total_output_tokens": 0,
+                "total_cache_creation_input_tokens": 0,
+                "total_cache_read_input_tokens": 0,
                 "total_tokens": 0,
                 "interactions": []
             }
@@ -64,13 +88,15 @@ class AnthropicService(BaseLLMService):
             "version": "1.0.0"
         }
     
-    def analyze_pdf_document(self, pdf_path: str, prompt: Optional[str] = None) -> Dict[str, Any]:
+    def analyze_pdf_document(self, pdf_path: str, prompt: Optional[str] = None,
+                             on_credential: Optional[CredentialCallback] = None) -> Dict[str, Any]:
         """
         Analyze a PDF document for credential information using Claude.
         
         Args:
             pdf_path: Path to the PDF file to analyze
             prompt: Optional custom prompt (uses default if not provided)
+            on_credential: Called with (index, credential dict) as each credential of the final answer completes
             
         Returns:
             Dict containing analysis results
@@ -102,7 +128,7 @@ class AnthropicService(BaseLLMService):
             messages = self._create_initial_message(pdf_data, analysis_prompt)
             
             # Process with Claude using tool calling
-            result = self._process_with_tools(messages)
+            result = self._process_with_tools(messages, on_credential)
             
             # Add conversation metadata to result
             self.conversation_metadata["completed_at"] = datetime.now().isoformat()
@@ -121,6 +147,82 @@ class AnthropicService(BaseLLMService):
                 "conversation_metadata": self.conversation_metadata
             }
     
+    async def analyze_pdf_document_async(self, pdf_path: str, prompt: Optional[str] = None,
+                                         on_credential: Optional[CredentialCallback] = None) -> Dict[str, Any]:
+        """
+        Analyze a PDF document for credential information using Claude, asynchronously.
+        
+        API calls are awaited on the AsyncAnthropic client and tool calls run
+        in a worker thread, so many conversations can share one event loop.
+        
+        Args:
+            pdf_path: Path to the PDF file to analyze
+            prompt: Optional custom prompt (uses default if not provided)
+            on_credential: Called with (index, credential dict) as each credential of the final answer completes
+            
+        Returns:
+            Dict containing analysis results
+        """
+        try:
+            # Reset tracking for new analysis (scoped to this task)
+            self._reset_tracking()
+            
+            # Validate PDF file
+            if not self.validate_pdf_file(pdf_path):
+                return {
+                    "success": False,
+                    "errors": [f"Invalid PDF file: {pdf_path}"],
+                    "credentials": [],
+                    "metadata": {},
+                    "conversation_metadata": self.conversation_metadata
+                }
+            
+            # Load and encode PDF
+            logger.info(f"Starting async analysis of PDF: {pdf_path}")
+            pdf_data = await asyncio.to_thread(self._encode_pdf, pdf_path)
+            
+            # Use provided prompt
+            if not prompt:
+                raise ValueError("Analysis prompt is required")
+            
+            # Create initial message with PDF and prompt
+            messages = self._create_initial_message(pdf_data, prompt)
+            
+            # Process with Claude using tool calling
+            result = await self._process_with_tools_async(messages, on_credential)
+            
+            # Add conversation metadata to result
+            self.conversation_metadata["completed_at"] = datetime.now().isoformat()
+            result["conversation_metadata"] = self.conversation_metadata
+            
+            logger.info(f"Completed async analysis of PDF: {pdf_path}")
+            return result
+            
+        except Exception as e:
+            logger.error(f"Error analyzing PDF {pdf_path}: {e}", exc_info=True)
+            return {
+                "success": False,
+                "errors": [f"Analysis failed: {str(e)}"],
+                "credentials": [],
+                "metadata": {},
+                "conversation_metadata": self.conversation_metadata
+            }
+    
+    def _get_async_client(self) -> anthropic.AsyncAnthropic:
+        """Get the async client for the running event loop, creating it if needed."""
+        loop = asyncio.get_running_loop()
+        
+        # The client's connection pool is bound to the loop it was first used on
+        if self._async_client is None or self._async_client_loop is not loop:
+            self._async_client = anthropic.AsyncAnthropic(
+                api_key=ANTHROPIC_API_KEY,
+                timeout=ANTHROPIC_TIMEOUT,
+                max_retries=0
+            )
+            self._async_client_loop = loop
+        
+        return self._async_client
+    
     def _encode_pdf(self, pdf_path: str) -> str:
         """Encode PDF file as base64."""
         try:
@@ -136,31 +238,76 @@ class AnthropicService(BaseLLMService):
             raise
     
     def _create_initial_message(self, pdf_data: str, prompt: str) -> List[MessageParam]:
-        """Create the initial message with PDF document and analysis prompt."""
+        """
+        Create the initial message with PDF document and analysis prompt.
+        
+        With prompt caching, the document and the prompt each end a cached
+        prefix: later rounds of the conversation read both from the cache,
+        and another analysis of the same document with a different prompt
+        still reuses the document prefix.
+        """
+        document_block = {
+            "type": "document",
+            "source": {
+                "type": "base64",
+                "media_type": "application/pdf",
+                "data": pdf_data
+            }
+        }
+        prompt_block = {
+            "type": "text",
+            "text": prompt + SUBMIT_ANALYSIS_INSTRUCTION if self.structured_output else prompt
+        }
+        
+        if self.prompt_caching:
+            document_block["cache_control"] = CACHE_CONTROL
+            prompt_block["cache_control"] = CACHE_CONTROL
+        
         return [{
             "role": "user",
-            "content": [
-                {
-                    "type": "document",
-                    "source": {
-                        "type": "base64",
-                        "media_type": "application/pdf",
-                        "data": pdf_data
-                    }
-                },
-                {
-                    "type": "text",
-                    "text": prompt
-                }
-            ]
+            "content": [document_block, prompt_block]
         }]
     
-    def _process_with_tools(self, messages: List[MessageParam]) -> Dict[str, Any]:
+    @staticmethod
+    def _cacheable_tools(tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Copy the tool schemas with a cache breakpoint on the last one, caching all of them."""
+        if not tools:
+            return tools
+        return [*tools[:-1], {**tools[-1], "cache_control": CACHE_CONTROL}]
+    
+    def _move_rolling_cache_breakpoint(self, conversation_messages: List[MessageParam]) -> None:
+        """
+        Put the conversation's rolling cache breakpoint on the latest tool results.
+        
+        Each round then reads everything up to the previous round's tool
+        results from the cache. The breakpoint is removed from older
+        messages, as a request may carry at most four (tools, document and
+        prompt use the other three).
+        
+        Args:
+            conversation_messages: Conversation whose last message holds the new tool results
+        """
+        if not self.prompt_caching:
+            return
+        
+        for message in conversation_messages[1:-1]:
+            if message["role"] == "user" and isinstance(message["content"], list):
+                for block in message["content"]:
+                    if isinstance(block, dict):
+                        block.pop("cache_control", None)
+        
+        content = conversation_messages[-1]["content"]
+        if isinstance(content, list) and content and isinstance(content[-1], dict):
+            content[-1]["cache_control"] = CACHE_CONTROL
+    
+    def _process_with_tools(self, messages: List[MessageParam],
+                            on_credential: Optional[CredentialCallback] = None) -> Dict[str, Any]:
         """
         Process the conversation with Claude, handling tool calls iteratively.
         
         Args:
             messages: Initial messages to send to Claude
+            on_credential: Called with each credential of the final answer as it completes
             
         Returns:
             Dict containing final analysis results
@@ -174,18 +321,18 @@ class AnthropicService(BaseLLMService):
             logger.debug(f"Claude conversation iteration {iteration}")
             
             interaction_start = datetime.now()
+            credential_parser = CredentialStreamParser(on_credential) if on_credential else None
             
             try:
-                # Send message to Claude
-                response = self.client.messages.create(
-                    model=self.model,
-                    max_tokens=4096,
-                    tools=self.tools,
-                    messages=conversation_messages
+                # Send message to Claude, waiting for the rate limiter and retrying transient errors
+                (response, started_tools), call_stats = self.rate_limiter.call(
+                    lambda: self._send_message(conversation_messages, credential_parser),
+                    estimated_tokens=self._estimate_request_tokens(),
+                    count_tokens=lambda sent: self._count_rate_limited_tokens(sent[0])
                 )
                 
                 # Track token usage and interaction
-                self._track_llm_interaction(iteration, response, interaction_start)
+                self._track_llm_interaction(iteration, response, interaction_start, call_stats)
                 
                 # Add Claude's response to conversation
                 conversation_messages.append({
@@ -193,16 +340,17 @@ class AnthropicService(BaseLLMService):
                     "content": response.content
                 })
                 
-                # Check if Claude wants to use tools
-                if response.stop_reason == "tool_use":
+                # Check if Claude wants to use tools (a submit_analysis call is the final answer)
+                if response.stop_reason == "tool_use" and self._submitted_analysis(response.content) is None:
                     # Extract and execute tool calls
-                    tool_results = self._execute_tool_calls(response.content, iteration)
+                    tool_results = self._execute_tool_calls(response.content, iteration, started_tools)
                     
                     # Add tool results to conversation
                     conversation_messages.append({
                         "role": "user",
                         "content": tool_results
                     })
+                    self._move_rolling_cache_breakpoint(conversation_messages)
                     
                     # Continue the conversation
                     continue
@@ -229,62 +377,284 @@ class AnthropicService(BaseLLMService):
             "metadata": {"max_iterations_reached": True}
         }
     
-    def _execute_tool_calls(self, content: List, iteration: int) -> List[ToolResultBlockParam]:
+    async def _process_with_tools_async(self, messages: List[MessageParam],
+                                        on_credential: Optional[CredentialCallback] = None) -> Dict[str, Any]:
         """
-        Execute tool calls from Claude's response.
+        Process the conversation with Claude asynchronously, handling tool calls iteratively.
         
         Args:
-            content: Claude's response content containing tool_use blocks
-            iteration: Current conversation iteration number
+            messages: Initial messages to send to Claude
+            on_credential: Called with each credential of the final answer as it completes
             
         Returns:
-            List of tool result blocks to send back to Claude
+            Dict containing final analysis results
         """
-        tool_results = []
+        client = self._get_async_client()
+        conversation_messages = messages.copy()
+        max_iterations = 10  # Prevent infinite loops
+        iteration = 0
         
-        for block in content:
-            if hasattr(block, 'type') and block.type == "tool_use":
-                tool_block: ToolUseBlock = block
-                tool_name = tool_block.name
-                tool_input = tool_block.input
-                tool_id = tool_block.id
+        while iteration < max_iterations:
+            iteration += 1
+            logger.debug(f"Claude async conversation iteration {iteration}")
+            
+            interaction_start = datetime.now()
+            credential_parser = CredentialStreamParser(on_credential) if on_credential else None
+            
+            try:
+                # Send message to Claude, waiting for the rate limiter and retrying transient errors
+                (response, started_tools), call_stats = await self.rate_limiter.call_async(
+                    lambda: self._send_message_async(client, conversation_messages, credential_parser),
+                    estimated_tokens=self._estimate_request_tokens(),
+                    count_tokens=lambda sent: self._count_rate_limited_tokens(sent[0])
+                )
                 
-                logger.debug(f"Executing tool: {tool_name} with input: {tool_input}")
+                # Track token usage and interaction
+                self._track_llm_interaction(iteration, response, interaction_start, call_stats)
                 
-                # Track tool call start
-                tool_start = datetime.now()
+                # Add Claude's response to conversation
+                conversation_messages.append({
+                    "role": "assistant",
+                    "content": response.content
+                })
                 
-                # Execute the tool
-                try:
-                    result = execute_tool(tool_name, **tool_input)
-                    tool_duration = (datetime.now() - tool_start).total_seconds()
-                    
-                    # Track successful tool call
-                    self._track_tool_call(
-                        iteration, tool_name, tool_input, result, tool_duration, True
+                # Check if Claude wants to use tools (a submit_analysis call is the final answer)
+                if response.stop_reason == "tool_use" and self._submitted_analysis(response.content) is None:
+                    # Database lookups are blocking, so keep them off the event loop
+                    tool_results = await asyncio.to_thread(
+                        self._execute_tool_calls, response.content, iteration, started_tools
                     )
                     
-                    tool_results.append({
-                        "type": "tool_result",
-                        "tool_use_id": tool_id,
-                        "content": json.dumps(result, ensure_ascii=False)
+                    # Add tool results to conversation
+                    conversation_messages.append({
+                        "role": "user",
+                        "content": tool_results
                     })
+                    self._move_rolling_cache_breakpoint(conversation_messages)
                     
-                except Exception as e:
-                    tool_duration = (datetime.now() - tool_start).total_seconds()
-                    error_result = {"error": f"Tool execution failed: {str(e)}"}
-                    
-                    # Track failed tool call
-                    self._track_tool_call(
-                        iteration, tool_name, tool_input, error_result, tool_duration, False
-                    )
+                    # Continue the conversation
+                    continue
+                
+                else:
+                    # Claude finished - extract final response
+                    return self._extract_final_response(response.content)
                     
-                    logger.error(f"Tool execution failed for {tool_name}: {e}")
-                    tool_results.append({
-                        "type": "tool_result",
-                        "tool_use_id": tool_id,
-                        "content": json.dumps(error_result)
-                    })
+            except Exception as e:
+                logger.error(f"Error in Claude conversation: {e}")
+                return {
+                    "success": False,
+                    "errors": [f"Claude processing failed: {str(e)}"],
+                    "credentials": [],
+                    "metadata": {"iteration": iteration}
+                }
+        
+        # Max iterations reached
+        logger.warning(f"Max iterations ({max_iterations}) reached in Claude conversation")
+        return {
+            "success": False,
+            "errors": ["Analysis exceeded maximum iterations"],
+            "credentials": [],
+            "metadata": {"max_iterations_reached": True}
+        }
+    
+    def _send_message(self, conversation_messages: List[MessageParam],
+                      credential_parser: Optional[CredentialStreamParser] = None) -> Tuple[Any, Dict[int, Future]]:
+        """
+        Send the conversation to Claude and return its response.
+        
+        When streaming, each tool call is started as soon as its block is
+        complete and the answer text goes to the credential parser as it
+        arrives; otherwise the whole response is awaited first. Credentials
+        in streamed text are held until the stop reason shows the turn is
+        the final answer rather than a draft before tool calls.
+        
+        Args:
+            conversation_messages: Conversation so far
+            credential_parser: Parser surfacing the credentials of a final answer
+            
+        Returns:
+            Tuple of Claude's response and the tool calls started while streaming, by position
+        """
+        started_tools: Dict[int, Future] = {}
+        answer_blocks: Set[int] = set()
+        if credential_parser:
+            credential_parser.reset()
+        
+        if not self.streaming:
+            response = self.client.messages.create(**self._message_params(conversation_messages))
+            self._feed_credential_parser(credential_parser, response)
+            return response, started_tools
+        
+        self._hold_streamed_credentials(credential_parser)
+        with self.client.messages.stream(**self._message_params(conversation_messages)) as stream:
+            for event in stream:
+                self._handle_stream_event(event, credential_parser, started_tools, answer_blocks)
+            response = stream.get_final_message()
+        self._end_streamed_turn(credential_parser, response)
+        return response, started_tools
+    
+    async def _send_message_async(self, client: anthropic.AsyncAnthropic, conversation_messages: List[MessageParam],
+                                  credential_parser: Optional[CredentialStreamParser] = None) -> Tuple[Any, Dict[int, Future]]:
+        """
+        Send the conversation to Claude on the async client and return its response.
+        
+        Args:
+            client: Async client for the running event loop
+            conversation_messages: Conversation so far
+            credential_parser: Parser surfacing the credentials of a final answer
+            
+        Returns:
+            Tuple of Claude's response and the tool calls started while streaming, by position
+        """
+        started_tools: Dict[int, Future] = {}
+        answer_blocks: Set[int] = set()
+        if credential_parser:
+            credential_parser.reset()
+        
+        if not self.streaming:
+            response = await client.messages.create(**self._message_params(conversation_messages))
+            self._feed_credential_parser(credential_parser, response)
+            return response, started_tools
+        
+        self._hold_streamed_credentials(credential_parser)
+        async with client.messages.stream(**self._message_params(conversation_messages)) as stream:
+            async for event in stream:
+                self._handle_stream_event(event, credential_parser, started_tools, answer_blocks)
+            response = await stream.get_final_message()
+        self._end_streamed_turn(credential_parser, response)
+        return response, started_tools
+    
+    def _message_params(self, conversation_messages: List[MessageParam]) -> Dict[str, Any]:
+        """Build the request parameters shared by streamed and non-streamed requests."""
+        params = {
+            "model": self.model,
+            "max_tokens": 4096,
+            "tools": self.tools,
+            "messages": conversation_messages
+        }
+        if self.structured_output:
+            params["tool_choice"] = {"type": "any"}
+        return params
+    
+    def _handle_stream_event(self, event, credential_parser: Optional[CredentialStreamParser],
+                             started_tools: Dict[int, Future], answer_blocks: Set[int]) -> None:
+        """
+        Feed the answer to the credential parser and start each tool call once its block is complete.
+        
+        The answer is the response text, or with structured output the
+        input of the submit_analysis block (answer_blocks holds its index),
+        which is never executed as a tool.
+        """
+        if event.type == "text":
+            if credential_parser and not self.structured_output:
+                credential_parser.feed(event.text)
+        elif event.type == "content_block_start" and event.content_block.type == "tool_use":
+            if event.content_block.name == SUBMIT_ANALYSIS_TOOL_NAME:
+                answer_blocks.add(event.index)
+        elif event.type == "content_block_delta" and event.delta.type == "input_json_delta":
+            if credential_parser and event.index in answer_blocks:
+                credential_parser.feed(event.delta.partial_json)
+        elif event.type == "content_block_stop" and event.content_block.type == "tool_use":
+            block = event.content_block
+            if block.name == SUBMIT_ANALYSIS_TOOL_NAME:
+                return
+            logger.debug(f"Starting tool while streaming: {block.name} with input: {block.input}")
+            started_tools[len(started_tools)] = self._start_tool_call(execute_tool, block.name, block.input)
+    
+    def _hold_streamed_credentials(self, credential_parser: Optional[CredentialStreamParser]) -> None:
+        """Hold the credentials of streamed text until the turn is known to be the final answer."""
+        # A submit_analysis call is always the final answer, so structured output streams straight through
+        if credential_parser and not self.structured_output:
+            credential_parser.hold()
+    
+    @staticmethod
+    def _end_streamed_turn(credential_parser: Optional[CredentialStreamParser], response) -> None:
+        """Release the held credentials of a final answer, or drop those of a turn that calls tools."""
+        if credential_parser and credential_parser.holding:
+            credential_parser.end_turn(response.stop_reason != "tool_use")
+    
+    def _feed_credential_parser(self, credential_parser: Optional[CredentialStreamParser], response) -> None:
+        """Surface the credentials of a complete (non-streamed) final answer."""
+        if not credential_parser:
+            return
+        submitted = self._submitted_analysis(response.content)
+        if submitted is not None:
+            credential_parser.feed(json.dumps(submitted))
+            return
+        if response.stop_reason == "tool_use":
+            return
+        for block in response.content:
+            if block.type == "text":
+                credential_parser.feed(block.text)
+    
+    @staticmethod
+    def _submitted_analysis(content: List) -> Optional[Dict[str, Any]]:
+        """Get the answer Claude passed to submit_analysis, or None if it did not call it."""
+        for block in content:
+            if getattr(block, 'type', None) == "tool_use" and block.name == SUBMIT_ANALYSIS_TOOL_NAME:
+                return dict(block.input) if isinstance(block.input, dict) else None
+        return None
+    
+    def _execute_tool_calls(self, content: List, iteration: int,
+                            started: Optional[Dict[int, Future]] = None) -> List[ToolResultBlockParam]:
+        """
+        Execute tool calls from Claude's response.
+        
+        Args:
+            content: Claude's response content containing tool_use blocks
+            iteration: Current conversation iteration number
+            started: Tool calls already started while the response streamed, by position
+            
+        Returns:
+            List of tool result blocks to send back to Claude
+        """
+        tool_results = []
+        tool_blocks: List[ToolUseBlock] = [
+            block for block in content if hasattr(block, 'type') and block.type == "tool_use"
+        ]
+        
+        for tool_block in tool_blocks:
+            logger.debug(f"Executing tool: {tool_block.name} with input: {tool_block.input}")
+        
+        # Execute the tools (concurrently when Claude asked for several at once)
+        executions, batch_duration = self._run_tool_calls(
+            execute_tool, [(tool_block.name, tool_block.input) for tool_block in tool_blocks], started
+        )
+        
+        for tool_block, execution in zip(tool_blocks, executions):
+            if execution.error is None:
+                # Track successful tool call
+                self._track_tool_call(
+                    iteration, tool_block.name, tool_block.input, execution.call.result,
+                    execution.duration_seconds, True, execution.call.cache_hit,
+                    execution.started_at, len(executions), batch_duration
+                )
+                
+                tool_results.append({
+                    "type": "tool_result",
+                    "tool_use_id": tool_block.id,
+                    "content": execution.call.content_json
+                })
+            
+            else:
+                error_result = {"error": f"Tool execution failed: {str(execution.error)}"}
+                
+                # Track failed tool call
+                self._track_tool_call(
+                    iteration, tool_block.name, tool_block.input, error_result,
+                    execution.duration_seconds, False, False,
+                    execution.started_at, len(executions), batch_duration
+                )
+                
+                logger.error(f"Tool execution failed for {tool_block.name}: {execution.error}")
+                tool_results.append({
+                    "type": "tool_result",
+                    "tool_use_id": tool_block.id,
+                    "content": json.dumps(error_result)
+                })
+        
+        if len(executions) > 1:
+            logger.debug(f"Executed {len(executions)} tool calls concurrently in {batch_duration:.3f}s")
         
         return tool_results
     
@@ -305,13 +675,13 @@ class AnthropicService(BaseLLMService):
                 if hasattr(block, 'type') and block.type == "text":
                     text_content += block.text
             
-            # Try to extract JSON from the response
-            # Claude might wrap JSON in markdown code blocks
-            json_str = self._extract_json_from_text(text_content)
+            # A submit_analysis call carries the answer as its input; otherwise extract the JSON
+            # answer, which Claude might wrap in prose or markdown code blocks
+            analysis_data = self._submitted_analysis(content)
+            if analysis_data is None:
+                analysis_data = extract_json_object(text_content)
             
-            if json_str:
-                analysis_data = json.loads(json_str)
-                
+            if analysis_data is not None:
                 # Add success flag and metadata
                 result = {
                     "success": True,
@@ -335,14 +705,6 @@ class AnthropicService(BaseLLMService):
                     "metadata": {"model": self.model}
                 }
                 
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON from Claude response: {e}")
-            return {
-                "success": False,
-                "errors": [f"Invalid JSON in response: {str(e)}"],
-                "credentials": [],
-                "metadata": {"model": self.model}
-            }
         except Exception as e:
             logger.error(f"Error extracting final response: {e}")
             return {
@@ -352,53 +714,33 @@ class AnthropicService(BaseLLMService):
                 "metadata": {"model": self.model}
             }
     
-    def _extract_json_from_text(self, text: str) -> Optional[str]:
-        """
-        Extract JSON from text that might be wrapped in markdown code blocks.
-        
-        Args:
-            text: Text content from Claude's response
-            
-        Returns:
-            JSON string if found, None otherwise
-        """
-        # Try to find JSON in markdown code blocks
-        import re
-        
-        # Pattern for JSON in markdown code blocks
-        json_pattern = r'```(?:json)?\s*(\{.*?\})\s*```'
-        match = re.search(json_pattern, text, re.DOTALL | re.IGNORECASE)
-        
-        if match:
-            return match.group(1)
-        
-        # Try to find JSON directly (look for { ... } patterns)
-        json_pattern = r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}'
-        matches = re.findall(json_pattern, text, re.DOTALL)
-        
-        # Try to parse each match to find valid JSON
-        for match in matches:
-            try:
-                json.loads(match)
-                return match
-            except json.JSONDecodeError:
-                continue
-        
-        return None
+    @staticmethod
+    def _count_rate_limited_tokens(response) -> int:
+        """Tokens of a response that count against the rate limits (cache reads do not)."""
+        usage = response.usage
+        return (usage.input_tokens + (getattr(usage, 'cache_creation_input_tokens', None) or 0)
+                + usage.output_tokens)
     
-    def _track_llm_interaction(self, iteration: int, response, start_time: datetime):
-        """Track an LLM interaction with token usage and timing."""
+    def _track_llm_interaction(self, iteration: int, response, start_time: datetime,
+                               call_stats: Optional[CallStats] = None):
+        """Track an LLM interaction with token usage, timing and rate limiting."""
         duration = (datetime.now() - start_time).total_seconds()
         
-        # Extract token usage from response
-        input_tokens = response.usage.input_tokens if hasattr(response, 'usage') else 0
-        output_tokens = response.usage.output_tokens if hasattr(response, 'usage') else 0
-        total_tokens = input_tokens + output_tokens
+        # Extract token usage from response (input_tokens excludes tokens written to or read from the cache)
+        usage = getattr(response, 'usage', None)
+        input_tokens = usage.input_tokens if usage else 0
+        output_tokens = usage.output_tokens if usage else 0
+        cache_creation_tokens = (getattr(usage, 'cache_creation_input_tokens', None) or 0) if usage else 0
+        cache_read_tokens = (getattr(usage, 'cache_read_input_tokens', None) or 0) if usage else 0
+        total_tokens = input_tokens + cache_creation_tokens + cache_read_tokens + output_tokens
         
         # Update running totals
-        self.conversation_metadata["token_usage"]["total_input_tokens"] += input_tokens
-        self.conversation_metadata["token_usage"]["total_output_tokens"] += output_tokens
-        self.conversation_metadata["token_usage"]["total_tokens"] += total_tokens
+        token_usage = self.conversation_metadata["token_usage"]
+        token_usage["total_input_tokens"] += input_tokens
+        token_usage["total_output_tokens"] += output_tokens
+        token_usage["total_cache_creation_input_tokens"] += cache_creation_tokens
+        token_usage["total_cache_read_input_tokens"] += cache_read_tokens
+        token_usage["total_tokens"] += total_tokens
         
         # Track individual interaction
         interaction_data = {
@@ -407,30 +749,40 @@ class AnthropicService(BaseLLMService):
             "duration_seconds": duration,
             "input_tokens": input_tokens,
             "output_tokens": output_tokens,
+            "cache_creation_input_tokens": cache_creation_tokens,
+            "cache_read_input_tokens": cache_read_tokens,
             "total_tokens": total_tokens,
             "stop_reason": response.stop_reason,
-            "model": response.model
+            "model": response.model,
+            "rate_limit": call_stats.to_dict() if call_stats else None
         }
         
         self.conversation_metadata["llm_interactions"].append(interaction_data)
-        self.conversation_metadata["token_usage"]["interactions"].append({
+        token_usage["interactions"].append({
             "iteration": iteration,
             "input_tokens": input_tokens,
             "output_tokens": output_tokens,
+            "cache_creation_input_tokens": cache_creation_tokens,
+            "cache_read_input_tokens": cache_read_tokens,
             "total_tokens": total_tokens
         })
     
     def _track_tool_call(self, iteration: int, tool_name: str, tool_input: Dict[str, Any], 
-                        result: Dict[str, Any], duration: float, success: bool):
-        """Track a tool call with parameters and results."""
+                        result: Dict[str, Any], duration: float, success: bool, cache_hit: bool = False,
+                        started_at: Optional[datetime] = None, batch_size: int = 1,
+                        batch_duration: Optional[float] = None):
+        """Track a tool call with parameters and results, and the concurrent batch it ran in."""
         tool_call_data = {
             "iteration": iteration,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": (started_at or datetime.now()).isoformat(),
             "tool_name": tool_name,
             "parameters": tool_input,
             "result": result,
             "duration_seconds": duration,
-            "success": success
+            "success": success,
+            "cache_hit": cache_hit,
+            "batch_size": batch_size,
+            "batch_duration_seconds": duration if batch_duration is None else batch_duration
         }
         
         self.conversation_metadata["tool_calls"].append(tool_call_data)
@@ -4,22 +4,184 @@ Abstract base class for LLM services.
 Defines the interface that all LLM providers must implement for credential analysis.
 """
 
+import asyncio
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Any, Callable, List, Optional, Tuple
 from pathlib import Path
 
+from .streaming import CredentialCallback
+from .tool_cache import ToolCallResult, get_tool_cache
+from config import TOOL_CALL_MAX_WORKERS, LLM_INITIAL_TOKEN_ESTIMATE
+
+
+# Appended to the analysis prompt with LLM_STRUCTURED_OUTPUT; the tool's schema replaces the prompt's JSON format
+SUBMIT_ANALYSIS_INSTRUCTION = (
+    "\n\n## Submitting the Result:\n"
+    "Do not write the result as JSON text. When the analysis is complete, call the submit_analysis tool "
+    "once with the complete result, following the output format above as far as the tool's schema allows."
+)
+
+# Tracking data of the conversation running in the current thread or asyncio task
+_conversation_metadata: ContextVar[Optional[Dict[str, Any]]] = ContextVar("conversation_metadata", default=None)
+
+_tool_executor: Optional[ThreadPoolExecutor] = None
+_tool_executor_lock = threading.Lock()
+
+
+def get_tool_executor() -> ThreadPoolExecutor:
+    """
+    Get the process-wide executor that runs the tool calls of a model turn concurrently.
+    
+    Returns:
+        ThreadPoolExecutor: Shared executor sized by TOOL_CALL_MAX_WORKERS
+    """
+    global _tool_executor
+    with _tool_executor_lock:
+        if _tool_executor is None:
+            _tool_executor = ThreadPoolExecutor(
+                max_workers=max(1, TOOL_CALL_MAX_WORKERS), thread_name_prefix="tool-call"
+            )
+        return _tool_executor
+
+
+@dataclass
+class ToolExecution:
+    """Outcome of one tool call from a model turn."""
+    tool_name: str
+    tool_input: Dict[str, Any]
+    call: Optional[ToolCallResult]
+    error: Optional[Exception]
+    started_at: datetime
+    duration_seconds: float
+
+
+def _run_tool_call(execute: Callable[..., Dict[str, Any]], tool_name: str,
+                   tool_input: Dict[str, Any]) -> ToolExecution:
+    """Run one tool call through the shared tool result cache, capturing its timing and any exception."""
+    started_at = datetime.now()
+    start = time.perf_counter()
+    try:
+        call, error = get_tool_cache().call(execute, tool_name, tool_input), None
+    except Exception as e:
+        call, error = None, e
+    return ToolExecution(tool_name, tool_input, call, error, started_at, time.perf_counter() - start)
+
 
 class BaseLLMService(ABC):
     """Abstract base class for LLM credential analysis services."""
     
+    @property
+    def conversation_metadata(self) -> Dict[str, Any]:
+        """
+        Tracking data (tool calls, LLM interactions, token usage) of the current conversation.
+        
+        Stored in a context variable rather than on the instance, so one
+        service can run many conversations at once: every thread and every
+        asyncio task sees only the conversation it started.
+        """
+        metadata = _conversation_metadata.get()
+        if metadata is None:
+            metadata = {}
+            _conversation_metadata.set(metadata)
+        return metadata
+    
+    @conversation_metadata.setter
+    def conversation_metadata(self, metadata: Dict[str, Any]) -> None:
+        _conversation_metadata.set(metadata)
+    
+    def _start_tool_call(self, execute: Callable[..., Dict[str, Any]], tool_name: str,
+                         tool_input: Dict[str, Any]) -> "Future[ToolExecution]":
+        """
+        Start a tool call on the shared tool executor without waiting for it.
+        
+        Used while a response is still streaming, so a tool runs as soon as
+        its call is complete; hand the future to _run_tool_calls() to collect it.
+        
+        Args:
+            execute: Provider's tool dispatcher (execute_tool from its tools module)
+            tool_name: Name of the tool
+            tool_input: Tool arguments
+            
+        Returns:
+            Future: Resolves to the ToolExecution
+        """
+        return get_tool_executor().submit(_run_tool_call, execute, tool_name, tool_input)
+    
+    def _run_tool_calls(self, execute: Callable[..., Dict[str, Any]],
+                        tool_calls: List[Tuple[str, Dict[str, Any]]],
+                        started: Optional[Dict[int, "Future[ToolExecution]"]] = None) -> Tuple[List[ToolExecution], float]:
+        """
+        Execute the tool calls of one model turn through the shared tool result cache.
+        
+        Several calls are dispatched concurrently on the shared tool
+        executor; a single call runs in the calling thread. Calls already
+        started while the response streamed are only waited for. Results
+        are returned in the order the model requested them, and cache hits
+        and misses are counted in the current conversation's tool_cache
+        metadata.
+        
+        Args:
+            execute: Provider's tool dispatcher (execute_tool from its tools module)
+            tool_calls: (tool name, tool arguments) pairs in request order
+            started: Futures from _start_tool_call() by position in tool_calls
+            
+        Returns:
+            Tuple of the executions in request order and the fan-out latency in seconds
+        """
+        start = time.perf_counter()
+        started = started or {}
+        
+        if len(tool_calls) > 1 or started:
+            futures = [
+                started.get(index) or self._start_tool_call(execute, name, tool_input)
+                for index, (name, tool_input) in enumerate(tool_calls)
+            ]
+            executions = [future.result() for future in futures]
+        else:
+            executions = [_run_tool_call(execute, name, tool_input) for name, tool_input in tool_calls]
+        
+        # Worker threads do not see this conversation's metadata, so count here
+        counters = self.conversation_metadata.setdefault("tool_cache", {"hits": 0, "misses": 0})
+        for execution in executions:
+            if execution.call is not None:
+                counters["hits" if execution.call.cache_hit else "misses"] += 1
+        
+        return executions, time.perf_counter() - start
+    
+    def _estimate_request_tokens(self) -> int:
+        """
+        Get the tokens to reserve with the rate limiter for the next request of the current conversation.
+        
+        Every request resends the whole conversation, so the tokens counted
+        for the previous request are a close lower bound; the first request
+        uses the configured estimate.
+        
+        Returns:
+            int: Estimated tokens of the next request
+        """
+        for interaction in reversed(self.conversation_metadata.get("llm_interactions") or []):
+            counted = (interaction.get("rate_limit") or {}).get("counted_tokens")
+            if counted:
+                return counted
+        return LLM_INITIAL_TOKEN_ESTIMATE
+    
     @abstractmethod
-    def analyze_pdf_document(self, pdf_path: str, prompt: Optional[str] = None) -> Dict[str, Any]:
+    def analyze_pdf_document(self, pdf_path: str, prompt: Optional[str] = None,
+                             on_credential: Optional[CredentialCallback] = None) -> Dict[str, Any]:
         """
         Analyze a PDF document for credential information.
         
         Args:
             pdf_path: Path to the PDF file to analyze
             prompt: Optional custom prompt (uses default if not provided)
+            on_credential: Called with (index, credential dict) as each credential
+                of the final answer completes, before the analysis returns
             
         Returns:
             Dict containing analysis results with standardized structure:
@@ -32,6 +194,26 @@ class BaseLLMService(ABC):
         """
         pass
     
+    async def analyze_pdf_document_async(self, pdf_path: str, prompt: Optional[str] = None,
+                                         on_credential: Optional[CredentialCallback] = None) -> Dict[str, Any]:
+        """
+        Analyze a PDF document without blocking the event loop.
+        
+        Providers with an async client override this to await their API
+        calls directly; the default runs the synchronous analysis in a
+        worker thread.
+        
+        Args:
+            pdf_path: Path to the PDF file to analyze
+            prompt: Optional custom prompt (uses default if not provided)
+            on_credential: Called with (index, credential dict) as each credential
+                of the final answer completes (from a worker thread)
+            
+        Returns:
+            Dict containing analysis results (same structure as analyze_pdf_document)
+        """
+        return await asyncio.to_thread(self.analyze_pdf_document, pdf_path, prompt, on_credential)
+    
     @abstractmethod
     def get_model_info(self) -> Dict[str, str]:
         """
@@ -5,22 +5,33 @@ Implements the BaseLLMService interface using Google's Gemini models
 with manual function calling capabilities for PDF credential analysis using the new genai SDK.
 """
 
+import asyncio
 import base64
 import json
 import logging
+import time
+from concurrent.futures import Future
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 
 from google import genai
 from google.genai import types
 
-from ..base import BaseLLMService
-from .tools import GEMINI_FUNCTION_DECLARATIONS, execute_tool
-from config import GEMINI_API_KEY, GEMINI_MODEL, GEMINI_TEMPERATURE
+from ..base import BaseLLMService, SUBMIT_ANALYSIS_INSTRUCTION
+from ..json_extraction import extract_json_object
+from ..rate_limiter import CallStats, get_rate_limiter
+from ..streaming import CredentialCallback, CredentialStreamParser
+from .tools import GEMINI_FUNCTION_DECLARATIONS, SUBMIT_ANALYSIS_DECLARATION, SUBMIT_ANALYSIS_TOOL_NAME, execute_tool
+from config import (GEMINI_API_KEY, GEMINI_MODEL, GEMINI_TEMPERATURE, GEMINI_PDF_METHOD, GEMINI_CACHE_TTL, LLM_STREAMING,
+                    LLM_STRUCTURED_OUTPUT)
 
 logger = logging.getLogger(__name__)
 
+# Seconds to wait for an uploaded PDF to leave the PROCESSING state, and between checks
+FILE_PROCESSING_TIMEOUT = 120
+FILE_POLL_INTERVAL = 1
+
 
 class GeminiService(BaseLLMService):
     """Google Gemini service for PDF credential analysis."""
@@ -34,9 +45,21 @@ class GeminiService(BaseLLMService):
         self.client = genai.Client(api_key=GEMINI_API_KEY)
         self.model = GEMINI_MODEL
         self.temperature = GEMINI_TEMPERATURE
+        self.pdf_method = GEMINI_PDF_METHOD
+        self.streaming = LLM_STREAMING
+        self.rate_limiter = get_rate_limiter("gemini")
         
         # Prepare tools for manual function calling using function declarations
-        self.tools = [types.Tool(function_declarations=GEMINI_FUNCTION_DECLARATIONS)]
+        self.structured_output = LLM_STRUCTURED_OUTPUT
+        declarations = GEMINI_FUNCTION_DECLARATIONS
+        if self.structured_output:
+            declarations = declarations + [SUBMIT_ANALYSIS_DECLARATION]
+        self.tools = [types.Tool(function_declarations=declarations)]
+        # With structured output Gemini must call a function every turn and finishes by calling submit_analysis
+        # (response_schema cannot be combined with function calling)
+        self.tool_config = types.ToolConfig(
+            function_calling_config=types.FunctionCallingConfig(mode="ANY")
+        ) if self.structured_output else None
         
         # Initialize tracking variables
         self._reset_tracking()
@@ -48,10 +71,12 @@ class GeminiService(BaseLLMService):
         self.conversation_metadata = {
             "started_at": datetime.now().isoformat(),
             "tool_calls": [],
+            "tool_cache": {"hits": 0, "misses": 0},
             "llm_interactions": [],
             "token_usage": {
                 "total_input_tokens": 0,
                 "total_output_tokens": 0,
+                "total_cached_input_tokens": 0,
                 "total_tokens": 0,
                 "interactions": []
             }
@@ -65,13 +90,15 @@ class GeminiService(BaseLLMService):
             "version": "1.0.0"
         }
     
-    def analyze_pdf_document(self, pdf_path: str, prompt: Optional[str] = None) -> Dict[str, Any]:
+    def analyze_pdf_document(self, pdf_path: str, prompt: Optional[str] = None,
+                             on_credential: Optional[CredentialCallback] = None) -> Dict[str, Any]:
         """
         Analyze a PDF document for credential information using Gemini.
         
         Args:
             pdf_path: Path to the PDF file to analyze
             prompt: Optional custom prompt (uses default if not provided)
+            on_credential: Called with (index, credential dict) as each credential of the final answer completes
             
         Returns:
             Dict containing analysis results
@@ -90,20 +117,24 @@ class GeminiService(BaseLLMService):
                     "conversation_metadata": self.conversation_metadata
                 }
             
-            # Load and encode PDF
-            logger.info(f"Starting analysis of PDF: {pdf_path}")
-            pdf_data = self._encode_pdf(pdf_path)
-            
             # Use provided prompt
             if not prompt:
                 raise ValueError("Analysis prompt is required")
             analysis_prompt = prompt
             
-            # Create initial message with PDF and prompt
-            messages = self._create_initial_message(pdf_data, analysis_prompt)
-            
-            # Process with Gemini using manual function calling
-            result = self._process_with_tools(messages)
+            # Upload the PDF once (and cache it) for all iterations, or load and encode it
+            logger.info(f"Starting analysis of PDF: {pdf_path}")
+            uploaded_file, cached_content = self._prepare_document(pdf_path)
+            try:
+                pdf_data = None if uploaded_file else self._encode_pdf(pdf_path)
+                
+                # Create initial message with PDF and prompt
+                messages = self._create_initial_message(pdf_data, analysis_prompt, uploaded_file, cached_content)
+                
+                # Process with Gemini using manual function calling
+                result = self._process_with_tools(messages, cached_content, on_credential)
+            finally:
+                self._delete_document(uploaded_file, cached_content)
             
             # Add conversation metadata to result
             self.conversation_metadata["completed_at"] = datetime.now().isoformat()
@@ -122,6 +153,72 @@ class GeminiService(BaseLLMService):
                 "conversation_metadata": self.conversation_metadata
             }
     
+    async def analyze_pdf_document_async(self, pdf_path: str, prompt: Optional[str] = None,
+                                         on_credential: Optional[CredentialCallback] = None) -> Dict[str, Any]:
+        """
+        Analyze a PDF document for credential information using Gemini, asynchronously.
+        
+        API calls are awaited on the client's async interface (client.aio) and
+        tool calls run in a worker thread, so many conversations can share
+        one event loop.
+        
+        Args:
+            pdf_path: Path to the PDF file to analyze
+            prompt: Optional custom prompt (uses default if not provided)
+            on_credential: Called with (index, credential dict) as each credential of the final answer completes
+            
+        Returns:
+            Dict containing analysis results
+        """
+        try:
+            # Reset tracking for new analysis (scoped to this task)
+            self._reset_tracking()
+            
+            # Validate PDF file
+            if not self.validate_pdf_file(pdf_path):
+                return {
+                    "success": False,
+                    "errors": [f"Invalid PDF file: {pdf_path}"],
+                    "credentials": [],
+                    "metadata": {},
+                    "conversation_metadata": self.conversation_metadata
+                }
+            
+            # Use provided prompt
+            if not prompt:
+                raise ValueError("Analysis prompt is required")
+            
+            # Upload the PDF once (and cache it) for all iterations, or load and encode it
+            logger.info(f"Starting async analysis of PDF: {pdf_path}")
+            uploaded_file, cached_content = await self._prepare_document_async(pdf_path)
+            try:
+                pdf_data = None if uploaded_file else await asyncio.to_thread(self._encode_pdf, pdf_path)
+                
+                # Create initial message with PDF and prompt
+                messages = self._create_initial_message(pdf_data, prompt, uploaded_file, cached_content)
+                
+                # Process with Gemini using manual function calling
+                result = await self._process_with_tools_async(messages, cached_content, on_credential)
+            finally:
+                await self._delete_document_async(uploaded_file, cached_content)
+            
+            # Add conversation metadata to result
+            self.conversation_metadata["completed_at"] = datetime.now().isoformat()
+            result["conversation_metadata"] = self.conversation_metadata
+            
+            logger.info(f"Completed async analysis of PDF: {pdf_path}")
+            return result
+            
+        except Exception as e:
+            logger.error(f"Error analyzing PDF {pdf_path}: {e}", exc_info=True)
+            return {
+                "success": False,
+                "errors": [f"Analysis failed: {str(e)}"],
+                "credentials": [],
+                "metadata": {},
+                "conversation_metadata": self.conversation_metadata
+            }
+    
     def _encode_pdf(self, pdf_path: str) -> str:
         """Encode PDF file as base64."""
         try:
@@ -136,25 +233,194 @@ class GeminiService(BaseLLMService):
             logger.error(f"Failed to encode PDF {pdf_path}: {e}")
             raise
     
-    def _create_initial_message(self, pdf_data: str, prompt: str) -> List[types.Content]:
-        """Create the initial message with PDF document and analysis prompt."""
-        return [types.Content(
-            role="user",
-            parts=[
+    def _create_initial_message(self, pdf_data: Optional[str], prompt: str,
+                                uploaded_file: Optional[types.File] = None,
+                                cached_content: Optional[types.CachedContent] = None) -> List[types.Content]:
+        """
+        Create the initial message with PDF document and analysis prompt.
+        
+        Args:
+            pdf_data: Base64-encoded PDF, sent inline when it was not uploaded
+            prompt: Analysis prompt text
+            uploaded_file: PDF uploaded with the Files API, referenced by URI
+            cached_content: Context cache that already holds the PDF
+            
+        Returns:
+            List containing the initial user message
+        """
+        if self.structured_output:
+            prompt += SUBMIT_ANALYSIS_INSTRUCTION
+        
+        if cached_content:
+            parts = [types.Part(text=prompt)]
+        elif uploaded_file:
+            parts = [
+                types.Part.from_uri(file_uri=uploaded_file.uri, mime_type=uploaded_file.mime_type),
+                types.Part(text=prompt)
+            ]
+        else:
+            parts = [
                 types.Part.from_bytes(
                     data=base64.b64decode(pdf_data),
                     mime_type="application/pdf"
                 ),
                 types.Part(text=prompt)
             ]
-        )]
+        
+        return [types.Content(role="user", parts=parts)]
+    
+    def _prepare_document(self, pdf_path: str) -> Tuple[Optional[types.File], Optional[types.CachedContent]]:
+        """
+        Upload the PDF and cache it with the system instruction and tools, per GEMINI_PDF_METHOD.
+        
+        Each step falls back to the previous method if it fails: no cache
+        means the uploaded file is referenced by URI, no upload means the
+        PDF is sent inline. Delete the returned resources with
+        _delete_document() when the analysis ends.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            
+        Returns:
+            Tuple of the uploaded file and the context cache (either may be None)
+        """
+        uploaded_file = None
+        cached_content = None
+        
+        if self.pdf_method in ("upload", "cache"):
+            try:
+                uploaded_file = self.client.files.upload(file=pdf_path, config=self._build_upload_config(pdf_path))
+                deadline = time.monotonic() + FILE_PROCESSING_TIMEOUT
+                while self._is_file_processing(uploaded_file, deadline):
+                    time.sleep(FILE_POLL_INTERVAL)
+                    uploaded_file = self.client.files.get(name=uploaded_file.name)
+            except Exception as e:
+                logger.warning(f"PDF upload failed, sending it inline instead: {e}")
+                self._delete_document(uploaded_file, None)
+                uploaded_file = None
+        
+        if uploaded_file and self.pdf_method == "cache":
+            try:
+                cached_content = self.client.caches.create(
+                    model=self.model, config=self._build_cache_config(uploaded_file)
+                )
+            except Exception as e:
+                logger.warning(f"Context cache creation failed, referencing the uploaded PDF instead: {e}")
+        
+        self._track_document_input(uploaded_file, cached_content)
+        return uploaded_file, cached_content
+    
+    async def _prepare_document_async(self, pdf_path: str) -> Tuple[Optional[types.File], Optional[types.CachedContent]]:
+        """Async version of _prepare_document() using the client's async interface."""
+        uploaded_file = None
+        cached_content = None
+        
+        if self.pdf_method in ("upload", "cache"):
+            try:
+                uploaded_file = await self.client.aio.files.upload(
+                    file=pdf_path, config=self._build_upload_config(pdf_path)
+                )
+                deadline = time.monotonic() + FILE_PROCESSING_TIMEOUT
+                while self._is_file_processing(uploaded_file, deadline):
+                    await asyncio.sleep(FILE_POLL_INTERVAL)
+                    uploaded_file = await self.client.aio.files.get(name=uploaded_file.name)
+            except Exception as e:
+                logger.warning(f"PDF upload failed, sending it inline instead: {e}")
+                await self._delete_document_async(uploaded_file, None)
+                uploaded_file = None
+        
+        if uploaded_file and self.pdf_method == "cache":
+            try:
+                cached_content = await self.client.aio.caches.create(
+                    model=self.model, config=self._build_cache_config(uploaded_file)
+                )
+            except Exception as e:
+                logger.warning(f"Context cache creation failed, referencing the uploaded PDF instead: {e}")
+        
+        self._track_document_input(uploaded_file, cached_content)
+        return uploaded_file, cached_content
+    
+    def _delete_document(self, uploaded_file: Optional[types.File],
+                         cached_content: Optional[types.CachedContent]) -> None:
+        """Delete the context cache and the uploaded PDF of an analysis (failures are only logged)."""
+        if cached_content:
+            try:
+                self.client.caches.delete(name=cached_content.name)
+            except Exception as e:
+                logger.warning(f"Failed to delete context cache {cached_content.name}: {e}")
+        if uploaded_file:
+            try:
+                self.client.files.delete(name=uploaded_file.name)
+            except Exception as e:
+                logger.warning(f"Failed to delete uploaded file {uploaded_file.name}: {e}")
+    
+    async def _delete_document_async(self, uploaded_file: Optional[types.File],
+                                     cached_content: Optional[types.CachedContent]) -> None:
+        """Async version of _delete_document()."""
+        if cached_content:
+            try:
+                await self.client.aio.caches.delete(name=cached_content.name)
+            except Exception as e:
+                logger.warning(f"Failed to delete context cache {cached_content.name}: {e}")
+        if uploaded_file:
+            try:
+                await self.client.aio.files.delete(name=uploaded_file.name)
+            except Exception as e:
+                logger.warning(f"Failed to delete uploaded file {uploaded_file.name}: {e}")
+    
+    def _build_upload_config(self, pdf_path: str) -> types.UploadFileConfig:
+        """Build the Files API upload config for a PDF."""
+        return types.UploadFileConfig(mime_type="application/pdf", display_name=Path(pdf_path).name)
+    
+    def _build_cache_config(self, uploaded_file: types.File) -> types.CreateCachedContentConfig:
+        """Build a context cache holding the uploaded PDF, the system instruction and the tools."""
+        return types.CreateCachedContentConfig(
+            display_name=uploaded_file.display_name,
+            contents=[types.Content(
+                role="user",
+                parts=[types.Part.from_uri(file_uri=uploaded_file.uri, mime_type=uploaded_file.mime_type)]
+            )],
+            system_instruction=self._get_system_instruction(),
+            tools=self.tools,
+            tool_config=self.tool_config,
+            ttl=f"{GEMINI_CACHE_TTL}s"
+        )
+    
+    @staticmethod
+    def _is_file_processing(uploaded_file: types.File, deadline: float) -> bool:
+        """
+        Check whether an uploaded file is still being processed.
+        
+        Raises:
+            RuntimeError: If processing failed or did not finish before the deadline
+        """
+        if uploaded_file.state == types.FileState.FAILED:
+            raise RuntimeError(f"Processing of uploaded file {uploaded_file.name} failed")
+        if uploaded_file.state != types.FileState.PROCESSING:
+            return False
+        if time.monotonic() >= deadline:
+            raise RuntimeError(f"Uploaded file {uploaded_file.name} still processing after {FILE_PROCESSING_TIMEOUT}s")
+        return True
+    
+    def _track_document_input(self, uploaded_file: Optional[types.File],
+                              cached_content: Optional[types.CachedContent]) -> None:
+        """Record how the PDF is sent to Gemini in the conversation metadata."""
+        self.conversation_metadata["pdf_input"] = {
+            "method": "cache" if cached_content else "upload" if uploaded_file else "inline",
+            "file": uploaded_file.name if uploaded_file else None,
+            "cached_content": cached_content.name if cached_content else None
+        }
     
-    def _process_with_tools(self, messages: List[types.Content]) -> Dict[str, Any]:
+    def _process_with_tools(self, messages: List[types.Content],
+                            cached_content: Optional[types.CachedContent] = None,
+                            on_credential: Optional[CredentialCallback] = None) -> Dict[str, Any]:
         """
         Process the conversation with Gemini, handling tool calls iteratively.
         
         Args:
             messages: Initial messages to send to Gemini
+            cached_content: Context cache holding the PDF, system instruction and tools
+            on_credential: Called with each credential of the final answer as it completes
             
         Returns:
             Dict containing final analysis results
@@ -168,34 +434,101 @@ class GeminiService(BaseLLMService):
             logger.debug(f"Gemini conversation iteration {iteration}")
             
             interaction_start = datetime.now()
+            credential_parser = CredentialStreamParser(on_credential) if on_credential else None
             
             try:
-                # Configure generation with manual function calling
-                config = types.GenerateContentConfig(
-                    tools=self.tools,
-                    temperature=self.temperature,
-                    system_instruction=self._get_system_instruction(),
-                    # Disable automatic function calling
-                    automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True)
+                # Send message to Gemini, waiting for the rate limiter and retrying transient errors
+                (response, started_tools), call_stats = self.rate_limiter.call(
+                    lambda: self._send_message(conversation_messages, cached_content, credential_parser),
+                    estimated_tokens=self._estimate_request_tokens(),
+                    count_tokens=lambda sent: self._count_rate_limited_tokens(sent[0])
                 )
                 
-                # Send message to Gemini
-                response = self.client.models.generate_content(
-                    model=self.model,
-                    contents=conversation_messages,
-                    config=config
+                # Track token usage and interaction
+                self._track_llm_interaction(iteration, response, interaction_start, call_stats)
+                
+                # Add Gemini's response to conversation
+                conversation_messages.append(response.candidates[0].content)
+                
+                # Check if Gemini wants to use tools (a submit_analysis call is the final answer)
+                if self._has_function_calls(response) and self._submitted_analysis(response) is None:
+                    # Extract and execute tool calls
+                    tool_results = self._execute_tool_calls(response, iteration, started_tools)
+                    
+                    # Add tool results to conversation
+                    conversation_messages.append(types.Content(
+                        role="user",
+                        parts=tool_results
+                    ))
+                    
+                    # Continue the conversation
+                    continue
+                
+                else:
+                    # Gemini finished - extract final response
+                    return self._extract_final_response(response)
+                    
+            except Exception as e:
+                logger.error(f"Error in Gemini conversation: {e}")
+                return {
+                    "success": False,
+                    "errors": [f"Gemini processing failed: {str(e)}"],
+                    "credentials": [],
+                    "metadata": {"iteration": iteration}
+                }
+        
+        # Max iterations reached
+        logger.warning(f"Max iterations ({max_iterations}) reached in Gemini conversation")
+        return {
+            "success": False,
+            "errors": ["Analysis exceeded maximum iterations"],
+            "credentials": [],
+            "metadata": {"max_iterations_reached": True}
+        }
+    
+    async def _process_with_tools_async(self, messages: List[types.Content],
+                                        cached_content: Optional[types.CachedContent] = None,
+                                        on_credential: Optional[CredentialCallback] = None) -> Dict[str, Any]:
+        """
+        Process the conversation with Gemini asynchronously, handling tool calls iteratively.
+        
+        Args:
+            messages: Initial messages to send to Gemini
+            cached_content: Context cache holding the PDF, system instruction and tools
+            on_credential: Called with each credential of the final answer as it completes
+            
+        Returns:
+            Dict containing final analysis results
+        """
+        conversation_messages = messages.copy()
+        max_iterations = 10  # Prevent infinite loops
+        iteration = 0
+        
+        while iteration < max_iterations:
+            iteration += 1
+            logger.debug(f"Gemini async conversation iteration {iteration}")
+            
+            interaction_start = datetime.now()
+            credential_parser = CredentialStreamParser(on_credential) if on_credential else None
+            
+            try:
+                # Send message to Gemini, waiting for the rate limiter and retrying transient errors
+                (response, started_tools), call_stats = await self.rate_limiter.call_async(
+                    lambda: self._send_message_async(conversation_messages, cached_content, credential_parser),
+                    estimated_tokens=self._estimate_request_tokens(),
+                    count_tokens=lambda sent: self._count_rate_limited_tokens(sent[0])
                 )
                 
                 # Track token usage and interaction
-                self._track_llm_interaction(iteration, response, interaction_start)
+                self._track_llm_interaction(iteration, response, interaction_start, call_stats)
                 
                 # Add Gemini's response to conversation
                 conversation_messages.append(response.candidates[0].content)
                 
-                # Check if Gemini wants to use tools
-                if self._has_function_calls(response):
-                    # Extract and execute tool calls
-                    tool_results = self._execute_tool_calls(response, iteration)
+                # Check if Gemini wants to use tools (a submit_analysis call is the final answer)
+                if self._has_function_calls(response) and self._submitted_analysis(response) is None:
+                    # Database lookups are blocking, so keep them off the event loop
+                    tool_results = await asyncio.to_thread(self._execute_tool_calls, response, iteration, started_tools)
                     
                     # Add tool results to conversation
                     conversation_messages.append(types.Content(
@@ -228,6 +561,192 @@ class GeminiService(BaseLLMService):
             "metadata": {"max_iterations_reached": True}
         }
     
+    def _send_message(self, conversation_messages: List[types.Content],
+                      cached_content: Optional[types.CachedContent] = None,
+                      credential_parser: Optional[CredentialStreamParser] = None) -> Tuple[Any, Dict[int, Future]]:
+        """
+        Send the conversation to Gemini and return its response.
+        
+        When streaming, each function call is started as soon as its chunk
+        arrives and the answer text goes to the credential parser as it
+        arrives; the chunks are then merged into one response. Otherwise the
+        whole response is awaited first. Credentials in streamed text are
+        held until the response shows no function calls, i.e. the turn is
+        the final answer rather than a draft before tool calls.
+        
+        Args:
+            conversation_messages: Conversation so far
+            cached_content: Context cache holding the PDF, system instruction and tools
+            credential_parser: Parser surfacing the credentials of a final answer
+            
+        Returns:
+            Tuple of Gemini's response and the tool calls started while streaming, by position
+        """
+        started_tools: Dict[int, Future] = {}
+        if credential_parser:
+            credential_parser.reset()
+        
+        params = self._generate_params(conversation_messages, cached_content)
+        if not self.streaming:
+            response = self.client.models.generate_content(**params)
+            self._feed_credential_parser(credential_parser, response)
+            return response, started_tools
+        
+        self._hold_streamed_credentials(credential_parser)
+        chunks = []
+        for chunk in self.client.models.generate_content_stream(**params):
+            self._handle_stream_chunk(chunk, credential_parser, started_tools)
+            chunks.append(chunk)
+        response = self._merge_stream_chunks(chunks)
+        self._end_streamed_turn(credential_parser, response)
+        return response, started_tools
+    
+    async def _send_message_async(self, conversation_messages: List[types.Content],
+                                  cached_content: Optional[types.CachedContent] = None,
+                                  credential_parser: Optional[CredentialStreamParser] = None) -> Tuple[Any, Dict[int, Future]]:
+        """
+        Send the conversation to Gemini on the async interface and return its response.
+        
+        Args:
+            conversation_messages: Conversation so far
+            cached_content: Context cache holding the PDF, system instruction and tools
+            credential_parser: Parser surfacing the credentials of a final answer
+            
+        Returns:
+            Tuple of Gemini's response and the tool calls started while streaming, by position
+        """
+        started_tools: Dict[int, Future] = {}
+        if credential_parser:
+            credential_parser.reset()
+        
+        params = self._generate_params(conversation_messages, cached_content)
+        if not self.streaming:
+            response = await self.client.aio.models.generate_content(**params)
+            self._feed_credential_parser(credential_parser, response)
+            return response, started_tools
+        
+        self._hold_streamed_credentials(credential_parser)
+        chunks = []
+        async for chunk in await self.client.aio.models.generate_content_stream(**params):
+            self._handle_stream_chunk(chunk, credential_parser, started_tools)
+            chunks.append(chunk)
+        response = self._merge_stream_chunks(chunks)
+        self._end_streamed_turn(credential_parser, response)
+        return response, started_tools
+    
+    def _generate_params(self, conversation_messages: List[types.Content],
+                         cached_content: Optional[types.CachedContent] = None) -> Dict[str, Any]:
+        """Build the request parameters shared by streamed and non-streamed requests."""
+        return {
+            "model": self.model,
+            "contents": conversation_messages,
+            "config": self._build_generate_config(cached_content)
+        }
+    
+    def _handle_stream_chunk(self, chunk, credential_parser: Optional[CredentialStreamParser],
+                             started_tools: Dict[int, Future]) -> None:
+        """Feed answer text to the credential parser and start each function call as it arrives."""
+        if not chunk.candidates or not chunk.candidates[0].content:
+            return
+        for part in chunk.candidates[0].content.parts or []:
+            if part.function_call:
+                tool_name = part.function_call.name
+                tool_input = dict(part.function_call.args) if part.function_call.args else {}
+                if tool_name == SUBMIT_ANALYSIS_TOOL_NAME:
+                    # The final answer arrives as one function call and is never executed as a tool
+                    if credential_parser:
+                        credential_parser.feed(json.dumps(tool_input))
+                    continue
+                logger.debug(f"Starting tool while streaming: {tool_name} with input: {tool_input}")
+                started_tools[len(started_tools)] = self._start_tool_call(execute_tool, tool_name, tool_input)
+            elif part.text and not part.thought and credential_parser and not self.structured_output:
+                credential_parser.feed(part.text)
+    
+    def _hold_streamed_credentials(self, credential_parser: Optional[CredentialStreamParser]) -> None:
+        """Hold the credentials of streamed text until the turn is known to be the final answer."""
+        # A submit_analysis call is always the final answer, so structured output streams straight through
+        if credential_parser and not self.structured_output:
+            credential_parser.hold()
+    
+    def _end_streamed_turn(self, credential_parser: Optional[CredentialStreamParser], response) -> None:
+        """Release the held credentials of a final answer, or drop those of a turn that calls functions."""
+        if credential_parser and credential_parser.holding:
+            credential_parser.end_turn(not self._has_function_calls(response))
+    
+    def _feed_credential_parser(self, credential_parser: Optional[CredentialStreamParser], response) -> None:
+        """Surface the credentials of a complete (non-streamed) final answer."""
+        if not credential_parser or not response.candidates:
+            return
+        submitted = self._submitted_analysis(response)
+        if submitted is not None:
+            credential_parser.feed(json.dumps(submitted))
+            return
+        if self._has_function_calls(response):
+            return
+        for part in response.candidates[0].content.parts or []:
+            if part.text and not part.thought:
+                credential_parser.feed(part.text)
+    
+    @staticmethod
+    def _merge_stream_chunks(chunks: List[types.GenerateContentResponse]) -> types.GenerateContentResponse:
+        """
+        Merge streamed chunks into one response for the conversation history and tracking.
+        
+        Consecutive plain text parts are joined; function calls, thoughts and
+        parts carrying thought signatures are kept as they arrived. Usage
+        metadata comes from the last chunk that has it (the stream's totals).
+        """
+        parts: List[types.Part] = []
+        finish_reason = None
+        usage_metadata = None
+        
+        def is_plain_text(part: types.Part) -> bool:
+            return part.text is not None and not part.thought and not part.thought_signature and not part.function_call
+        
+        for chunk in chunks:
+            if chunk.usage_metadata:
+                usage_metadata = chunk.usage_metadata
+            if not chunk.candidates:
+                continue
+            candidate = chunk.candidates[0]
+            finish_reason = candidate.finish_reason or finish_reason
+            for part in (candidate.content.parts if candidate.content else None) or []:
+                if parts and is_plain_text(part) and is_plain_text(parts[-1]):
+                    parts[-1] = types.Part(text=parts[-1].text + part.text)
+                else:
+                    parts.append(part)
+        
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(
+                content=types.Content(role="model", parts=parts),
+                finish_reason=finish_reason
+            )],
+            usage_metadata=usage_metadata
+        )
+    
+    def _build_generate_config(self, cached_content: Optional[types.CachedContent] = None) -> types.GenerateContentConfig:
+        """
+        Build the generation config with manual function calling.
+        
+        With a context cache, the system instruction and tools come from the
+        cache and must not be sent again.
+        """
+        if cached_content:
+            # The tool config, if any, is part of the cache too
+            return types.GenerateContentConfig(
+                cached_content=cached_content.name,
+                temperature=self.temperature,
+                automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True)
+            )
+        return types.GenerateContentConfig(
+            tools=self.tools,
+            tool_config=self.tool_config,
+            temperature=self.temperature,
+            system_instruction=self._get_system_instruction(),
+            # Disable automatic function calling
+            automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True)
+        )
+    
     def _has_function_calls(self, response) -> bool:
         """Check if the response contains function calls."""
         try:
@@ -241,13 +760,25 @@ class GeminiService(BaseLLMService):
         except Exception:
             return False
     
-    def _execute_tool_calls(self, response, iteration: int) -> List[types.Part]:
+    @staticmethod
+    def _submitted_analysis(response) -> Optional[Dict[str, Any]]:
+        """Get the answer Gemini passed to submit_analysis, or None if it did not call it."""
+        if not response.candidates or not response.candidates[0].content:
+            return None
+        for part in response.candidates[0].content.parts or []:
+            if part.function_call and part.function_call.name == SUBMIT_ANALYSIS_TOOL_NAME:
+                return dict(part.function_call.args) if part.function_call.args else {}
+        return None
+    
+    def _execute_tool_calls(self, response, iteration: int,
+                            started: Optional[Dict[int, Future]] = None) -> List[types.Part]:
         """
         Execute tool calls from Gemini's response.
         
         Args:
             response: Gemini's response containing function calls
             iteration: Current conversation iteration number
+            started: Tool calls already started while the response streamed, by position
             
         Returns:
             List of function response parts to send back to Gemini
@@ -255,6 +786,7 @@ class GeminiService(BaseLLMService):
         tool_results = []
         
         try:
+            tool_calls = []
             for part in response.candidates[0].content.parts:
                 if hasattr(part, 'function_call') and part.function_call:
                     function_call = part.function_call
@@ -262,39 +794,43 @@ class GeminiService(BaseLLMService):
                     tool_input = dict(function_call.args) if function_call.args else {}
                     
                     logger.debug(f"Executing tool: {tool_name} with input: {tool_input}")
+                    tool_calls.append((tool_name, tool_input))
+            
+            # Execute the tools (concurrently when Gemini asked for several at once)
+            executions, batch_duration = self._run_tool_calls(execute_tool, tool_calls, started)
+            
+            for execution in executions:
+                if execution.error is None:
+                    # Track successful tool call
+                    self._track_tool_call(
+                        iteration, execution.tool_name, execution.tool_input, execution.call.result,
+                        execution.duration_seconds, True, execution.call.cache_hit,
+                        execution.started_at, len(executions), batch_duration
+                    )
+                    
+                    tool_results.append(types.Part.from_function_response(
+                        name=execution.tool_name,
+                        response=execution.call.result
+                    ))
+                
+                else:
+                    error_result = {"error": f"Tool execution failed: {str(execution.error)}"}
                     
-                    # Track tool call start
-                    tool_start = datetime.now()
+                    # Track failed tool call
+                    self._track_tool_call(
+                        iteration, execution.tool_name, execution.tool_input, error_result,
+                        execution.duration_seconds, False, False,
+                        execution.started_at, len(executions), batch_duration
+                    )
                     
-                    # Execute the tool
-                    try:
-                        result = execute_tool(tool_name, **tool_input)
-                        tool_duration = (datetime.now() - tool_start).total_seconds()
-                        
-                        # Track successful tool call
-                        self._track_tool_call(
-                            iteration, tool_name, tool_input, result, tool_duration, True
-                        )
-                        
-                        tool_results.append(types.Part.from_function_response(
-                            name=tool_name,
-                            response=result
-                        ))
-                        
-                    except Exception as e:
-                        tool_duration = (datetime.now() - tool_start).total_seconds()
-                        error_result = {"error": f"Tool execution failed: {str(e)}"}
-                        
-                        # Track failed tool call
-                        self._track_tool_call(
-                            iteration, tool_name, tool_input, error_result, tool_duration, False
-                        )
-                        
-                        logger.error(f"Tool execution failed for {tool_name}: {e}")
-                        tool_results.append(types.Part.from_function_response(
-                            name=tool_name,
-                            response=error_result
-                        ))
+                    logger.error(f"Tool execution failed for {execution.tool_name}: {execution.error}")
+                    tool_results.append(types.Part.from_function_response(
+                        name=execution.tool_name,
+                        response=error_result
+                    ))
+            
+            if len(executions) > 1:
+                logger.debug(f"Executed {len(executions)} tool calls concurrently in {batch_duration:.3f}s")
         
         except Exception as e:
             logger.error(f"Error processing tool calls: {e}")
@@ -322,12 +858,13 @@ class GeminiService(BaseLLMService):
             elif hasattr(response, 'text'):
                 text_content = response.text
             
-            # Try to extract JSON from the response
-            json_str = self._extract_json_from_text(text_content)
+            # A submit_analysis call carries the answer as its arguments; otherwise extract the JSON
+            # answer, which Gemini might wrap in prose or markdown code blocks
+            analysis_data = self._submitted_analysis(response)
+            if analysis_data is None:
+                analysis_data = extract_json_object(text_content)
             
-            if json_str:
-                analysis_data = json.loads(json_str)
-                
+            if analysis_data is not None:
                 # Add success flag and metadata
                 result = {
                     "success": True,
@@ -351,14 +888,6 @@ class GeminiService(BaseLLMService):
                     "metadata": {"model": self.model}
                 }
                 
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON from Gemini response: {e}")
-            return {
-                "success": False,
-                "errors": [f"Invalid JSON in response: {str(e)}"],
-                "credentials": [],
-                "metadata": {"model": self.model}
-            }
         except Exception as e:
             logger.error(f"Error extracting final response: {e}")
             return {
@@ -368,47 +897,20 @@ class GeminiService(BaseLLMService):
                 "metadata": {"model": self.model}
             }
     
-    def _extract_json_from_text(self, text: str) -> Optional[str]:
-        """
-        Extract JSON from text that might be wrapped in markdown code blocks.
-        
-        Args:
-            text: Text content from Gemini's response
-            
-        Returns:
-            JSON string if found, None otherwise
-        """
-        # Try to find JSON in markdown code blocks
-        import re
-        
-        # Pattern for JSON in markdown code blocks
-        json_pattern = r'```(?:json)?\s*(\{.*?\})\s*```'
-        match = re.search(json_pattern, text, re.DOTALL | re.IGNORECASE)
-        
-        if match:
-            return match.group(1)
-        
-        # Try to find JSON directly (look for { ... } patterns)
-        json_pattern = r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}'
-        matches = re.findall(json_pattern, text, re.DOTALL)
-        
-        # Try to parse each match to find valid JSON
-        for match in matches:
-            try:
-                json.loads(match)
-                return match
-            except json.JSONDecodeError:
-                continue
-        
-        return None
+    @staticmethod
+    def _count_rate_limited_tokens(response) -> int:
+        """Tokens of a response that count against the rate limits."""
+        return getattr(response.usage_metadata, 'total_token_count', 0) or 0
     
-    def _track_llm_interaction(self, iteration: int, response, start_time: datetime):
-        """Track an LLM interaction with token usage and timing."""
+    def _track_llm_interaction(self, iteration: int, response, start_time: datetime,
+                               call_stats: Optional[CallStats] = None):
+        """Track an LLM interaction with token usage, timing and rate limiting."""
         duration = (datetime.now() - start_time).total_seconds()
         
         # Extract token usage from response
         input_tokens = 0
         output_tokens = 0
+        cached_tokens = 0
         total_tokens = 0
         
         try:
@@ -416,6 +918,8 @@ class GeminiService(BaseLLMService):
                 usage = response.usage_metadata
                 input_tokens = getattr(usage, 'prompt_token_count', 0)
                 output_tokens = getattr(usage, 'candidates_token_count', 0)
+                # Part of prompt_token_count served from the context cache
+                cached_tokens = getattr(usage, 'cached_content_token_count', 0) or 0
                 total_tokens = getattr(usage, 'total_token_count', 0)
         except Exception:
             # If we can't get usage stats, continue without them
@@ -424,6 +928,7 @@ class GeminiService(BaseLLMService):
         # Update running totals
         self.conversation_metadata["token_usage"]["total_input_tokens"] += input_tokens
         self.conversation_metadata["token_usage"]["total_output_tokens"] += output_tokens
+        self.conversation_metadata["token_usage"]["total_cached_input_tokens"] += cached_tokens
         self.conversation_metadata["token_usage"]["total_tokens"] += total_tokens
         
         # Track individual interaction
@@ -433,8 +938,10 @@ class GeminiService(BaseLLMService):
             "duration_seconds": duration,
             "input_tokens": input_tokens,
             "output_tokens": output_tokens,
+            "cached_input_tokens": cached_tokens,
             "total_tokens": total_tokens,
-            "model": self.model
+            "model": self.model,
+            "rate_limit": call_stats.to_dict() if call_stats else None
         }
         
         self.conversation_metadata["llm_interactions"].append(interaction_data)
@@ -442,20 +949,26 @@ class GeminiService(BaseLLMService):
             "iteration": iteration,
             "input_tokens": input_tokens,
             "output_tokens": output_tokens,
+            "cached_input_tokens": cached_tokens,
             "total_tokens": total_tokens
         })
     
     def _track_tool_call(self, iteration: int, tool_name: str, tool_input: Dict[str, Any], 
-                        result: Dict[str, Any], duration: float, success: bool):
-        """Track a tool call with parameters and results."""
+                        result: Dict[str, Any], duration: float, success: bool, cache_hit: bool = False,
+                        started_at: Optional[datetime] = None, batch_size: int = 1,
+                        batch_duration: Optional[float] = None):
+        """Track a tool call with parameters and results, and the concurrent batch it ran in."""
         tool_call_data = {
             "iteration": iteration,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": (started_at or datetime.now()).isoformat(),
             "tool_name": tool_name,
             "parameters": tool_input,
             "result": result,
             "duration_seconds": duration,
-            "success": success
+            "success": success,
+            "cache_hit": cache_hit,
+            "batch_size": batch_size,
+            "batch_duration_seconds": duration if batch_duration is None else batch_duration
         }
         
         self.conversation_metadata["tool_calls"].append(tool_call_data)
@@ -0,0 +1,73 @@
+"""
+Extraction of the JSON answer from model output.
+
+Models wrap their final JSON in prose or markdown fences, and course-by-course
+answers nest objects several levels deep and run to hundreds of kilobytes.
+extract_json_object() walks the text once: from each place that can start an
+object it runs the json module's scanner, which tracks nesting and string
+state (so braces and quotes inside strings never confuse it) and stops at the
+end of the object. A decoded object is skipped over as a whole, so nested
+objects are never parsed on their own, and the largest top-level object is
+the answer.
+
+An attempt that fails (a brace followed by a quote in the prose, an answer
+cut off at the token limit) is retried from the next candidate, but objects
+that lie entirely inside the part the failed attempt already scanned are
+nested in a broken object and are not answers. Failed attempts are capped,
+so the extraction stays linear in the length of the output.
+"""
+
+import json
+import re
+from typing import Any, Dict, Optional
+
+# Where a JSON object can start: an opening brace followed by a key or the closing brace
+_OBJECT_START = re.compile(r'\{\s*["}]')
+
+# Failed decode attempts before the rest of the text is given up on
+MAX_FAILED_ATTEMPTS = 32
+
+_decoder = json.JSONDecoder()
+
+
+def extract_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Find and parse the outermost JSON object in model output.
+    
+    Text outside objects (prose, markdown fences) is ignored. If several
+    top-level objects parse, the largest one is returned, so a small example
+    in the prose never wins over the actual answer.
+    
+    Args:
+        text: Model output text
+    
+    Returns:
+        Optional[Dict]: The parsed object, or None if the text contains no valid JSON object
+    """
+    if not text:
+        return None
+    
+    best: Optional[Dict[str, Any]] = None
+    best_length = 0
+    # End of the text scanned by failed attempts; objects ending before it were nested in them
+    failed_until = -1
+    failed_attempts = 0
+    match = _OBJECT_START.search(text)
+    
+    while match:
+        start = match.start()
+        try:
+            value, end = _decoder.raw_decode(text, start)
+        except json.JSONDecodeError as e:
+            failed_attempts += 1
+            if failed_attempts >= MAX_FAILED_ATTEMPTS:
+                break
+            failed_until = max(failed_until, e.pos)
+            match = _OBJECT_START.search(text, start + 1)
+            continue
+        
+        if end > failed_until and end - start > best_length:
+            best, best_length = value, end - start
+        match = _OBJECT_START.search(text, end)
+    
+    return best
@@ -0,0 +1,384 @@
+"""
+Rate limiting and retries for LLM provider requests.
+
+Every request to a provider goes through that provider's RateLimiter,
+shared by all conversations in the process. Two token buckets hold the
+request and token budgets per minute; a request waits until both can
+cover it. Its token cost is only known once the response arrives, so it
+reserves an estimate and the difference is settled afterwards.
+
+Transient failures (429 rate limits, 529/503 overloads, 5xx errors,
+timeouts and dropped connections) are retried with exponential backoff
+and full jitter, honoring Retry-After when the provider sends one. The
+failed request is simply sent again, so a conversation resumes from the
+iteration that failed instead of starting the document over. A rate
+limit also pauses every other caller for the backoff period and halves
+the refill rate, which then recovers gradually with each success, so
+concurrent conversations back off together instead of cascading into
+more rate limits.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from config import (
+    PROVIDER_RATE_LIMITS, LLM_MAX_RETRIES, LLM_RETRY_BASE_DELAY, LLM_RETRY_MAX_DELAY,
+    LLM_INITIAL_TOKEN_ESTIMATE
+)
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying, and the subset that means the provider wants us to slow down
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+RATE_LIMIT_STATUS_CODES = {429, 503, 529}
+
+# Exceptions raised by the provider SDKs and httpx for timeouts and dropped connections
+CONNECTION_ERROR_NAMES = {
+    "APIConnectionError", "APITimeoutError", "ConnectError", "ConnectTimeout",
+    "ReadError", "ReadTimeout", "RemoteProtocolError", "PoolTimeout"
+}
+
+# Refill rate multiplier after a rate limit, its floor, and the recovery per successful request
+RATE_DECREASE_FACTOR = 0.5
+MIN_RATE_SCALE = 0.1
+RATE_RECOVERY_STEP = 0.05
+
+
+@dataclass
+class CallStats:
+    """Rate limiting details of one provider request, recorded with the LLM interaction."""
+    estimated_tokens: int = 0
+    counted_tokens: Optional[int] = None
+    wait_seconds: float = 0.0
+    retries: int = 0
+    backoff_seconds: float = 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to a JSON-serializable dictionary."""
+        return {
+            "estimated_tokens": self.estimated_tokens,
+            "counted_tokens": self.counted_tokens,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "retries": self.retries,
+            "backoff_seconds": round(self.backoff_seconds, 3)
+        }
+
+
+class TokenBucket:
+    """
+    Budget that refills continuously up to its capacity.
+    
+    Not thread-safe on its own; RateLimiter guards it with its lock.
+    """
+    
+    def __init__(self, capacity: float, refill_per_second: float):
+        """
+        Initialize a full bucket.
+        
+        Args:
+            capacity: Maximum budget (one minute's worth)
+            refill_per_second: Budget regained per second at full rate
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.level = capacity
+        self._updated_at = time.monotonic()
+    
+    def reserve(self, amount: float, scale: float) -> float:
+        """
+        Take an amount from the bucket, going into debt if needed.
+        
+        Args:
+            amount: Budget to take (capped at the capacity so it can always be met)
+            scale: Current refill rate multiplier
+        
+        Returns:
+            float: Seconds until the debt is repaid (0 if the budget was available)
+        """
+        self._refill(scale)
+        self.level -= min(amount, self.capacity)
+        if self.level >= 0:
+            return 0.0
+        return -self.level / (self.refill_per_second * scale)
+    
+    def adjust(self, amount: float, scale: float) -> None:
+        """Take a further amount (or give one back, if negative) without waiting."""
+        self._refill(scale)
+        self.level = min(self.capacity, self.level - amount)
+    
+    def available(self, scale: float) -> float:
+        """Budget currently available (negative while in debt)."""
+        self._refill(scale)
+        return self.level
+    
+    def _refill(self, scale: float) -> None:
+        """Add the budget regained since the last update."""
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated_at) * self.refill_per_second * scale)
+        self._updated_at = now
+
+
+def classify_error(error: Exception) -> Tuple[bool, bool, Optional[float]]:
+    """
+    Decide whether a failed provider request should be retried.
+    
+    Works on the exceptions of both the Anthropic and the Google GenAI
+    SDKs without importing either: Anthropic errors carry status_code,
+    GenAI errors carry code.
+    
+    Args:
+        error: Exception raised by the request
+    
+    Returns:
+        Tuple of (retryable, rate_limited, retry_after_seconds)
+    """
+    status = getattr(error, "status_code", None)
+    if not isinstance(status, int):
+        status = getattr(error, "code", None)
+    
+    if isinstance(status, int):
+        retryable = status in RETRYABLE_STATUS_CODES
+        rate_limited = status in RATE_LIMIT_STATUS_CODES
+    else:
+        retryable = isinstance(error, (ConnectionError, TimeoutError)) or type(error).__name__ in CONNECTION_ERROR_NAMES
+        rate_limited = False
+    
+    return retryable, rate_limited, _retry_after(error) if retryable else None
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Read the Retry-After delay from the error's HTTP response, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        # HTTP-date values are rare from these APIs; fall back to our own backoff
+        pass
+    return None
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limiter with retries for one provider."""
+    
+    def __init__(self, provider: str, requests_per_minute: int = 0, tokens_per_minute: int = 0,
+                 max_retries: int = LLM_MAX_RETRIES, base_delay: float = LLM_RETRY_BASE_DELAY,
+                 max_delay: float = LLM_RETRY_MAX_DELAY):
+        """
+        Initialize the limiter.
+        
+        Args:
+            provider: LLM provider name, used in log messages
+            requests_per_minute: Request budget per minute (0 means unlimited)
+            tokens_per_minute: Token budget per minute (0 means unlimited)
+            max_retries: Retries of a failed request before giving up
+            base_delay: Backoff ceiling of the first retry in seconds (doubled for each further retry)
+            max_delay: Largest backoff ceiling in seconds
+        """
+        self.provider = provider
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._requests = TokenBucket(requests_per_minute, requests_per_minute / 60) if requests_per_minute > 0 else None
+        self._tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60) if tokens_per_minute > 0 else None
+        self._rate_scale = 1.0
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "wait_seconds": 0.0,
+            "backoff_seconds": 0.0
+        }
+    
+    def call(self, request: Callable[[], Any], estimated_tokens: int = LLM_INITIAL_TOKEN_ESTIMATE,
+             count_tokens: Optional[Callable[[Any], int]] = None) -> Tuple[Any, CallStats]:
+        """
+        Send a request within the budgets, retrying transient failures.
+        
+        Args:
+            request: Sends the request and returns the response
+            estimated_tokens: Tokens reserved before sending
+            count_tokens: Returns the tokens a response actually used, to settle the reservation
+        
+        Returns:
+            Tuple of the response and the rate limiting details of the call
+        
+        Raises:
+            Exception: The request's error, if it is not retryable or retries are exhausted
+        """
+        stats = CallStats(estimated_tokens=estimated_tokens)
+        while True:
+            wait = self._reserve(estimated_tokens)
+            if wait > 0:
+                time.sleep(wait)
+                stats.wait_seconds += wait
+            
+            try:
+                response = request()
+            except Exception as e:
+                time.sleep(self._handle_failure(e, estimated_tokens, stats))
+                continue
+            
+            self._handle_success(response, estimated_tokens, count_tokens, stats)
+            return response, stats
+    
+    async def call_async(self, request: Callable[[], Awaitable[Any]], estimated_tokens: int = LLM_INITIAL_TOKEN_ESTIMATE,
+                         count_tokens: Optional[Callable[[Any], int]] = None) -> Tuple[Any, CallStats]:
+        """
+        Send an async request within the budgets, retrying transient failures.
+        
+        Args:
+            request: Returns an awaitable that sends the request
+            estimated_tokens: Tokens reserved before sending
+            count_tokens: Returns the tokens a response actually used, to settle the reservation
+        
+        Returns:
+            Tuple of the response and the rate limiting details of the call
+        
+        Raises:
+            Exception: The request's error, if it is not retryable or retries are exhausted
+        """
+        stats = CallStats(estimated_tokens=estimated_tokens)
+        while True:
+            wait = self._reserve(estimated_tokens)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                stats.wait_seconds += wait
+            
+            try:
+                response = await request()
+            except Exception as e:
+                await asyncio.sleep(self._handle_failure(e, estimated_tokens, stats))
+                continue
+            
+            self._handle_success(response, estimated_tokens, count_tokens, stats)
+            return response, stats
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get process-wide limiter metrics.
+        
+        Returns:
+            Dict: Request and retry counters, time spent waiting and backing off,
+            the current refill rate multiplier and the remaining budgets
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+            stats["backoff_seconds"] = round(stats["backoff_seconds"], 3)
+            stats["rate_scale"] = round(self._rate_scale, 3)
+            stats["paused_seconds_remaining"] = round(max(0.0, self._paused_until - time.monotonic()), 3)
+            stats["available_requests"] = (
+                round(self._requests.available(self._rate_scale), 2) if self._requests else None
+            )
+            stats["available_tokens"] = (
+                round(self._tokens.available(self._rate_scale)) if self._tokens else None
+            )
+            return stats
+    
+    def _reserve(self, estimated_tokens: int) -> float:
+        """Reserve one request and the estimated tokens, returning the seconds to wait before sending."""
+        with self._lock:
+            wait = max(0.0, self._paused_until - time.monotonic())
+            if self._requests:
+                wait = max(wait, self._requests.reserve(1, self._rate_scale))
+            if self._tokens:
+                wait = max(wait, self._tokens.reserve(estimated_tokens, self._rate_scale))
+            self._stats["requests"] += 1
+            self._stats["wait_seconds"] += wait
+            return wait
+    
+    def _handle_success(self, response: Any, estimated_tokens: int,
+                        count_tokens: Optional[Callable[[Any], int]], stats: CallStats) -> None:
+        """Settle the token reservation and let the refill rate recover."""
+        counted = None
+        if count_tokens:
+            try:
+                counted = int(count_tokens(response))
+            except Exception as e:
+                logger.debug(f"Could not count tokens of {self.provider} response: {e}")
+        stats.counted_tokens = counted
+        
+        with self._lock:
+            if self._tokens and counted is not None:
+                self._tokens.adjust(counted - estimated_tokens, self._rate_scale)
+            self._rate_scale = min(1.0, self._rate_scale + RATE_RECOVERY_STEP)
+            self._stats["succeeded"] += 1
+    
+    def _handle_failure(self, error: Exception, estimated_tokens: int, stats: CallStats) -> float:
+        """
+        Return the backoff before retrying a failed request, or re-raise its error.
+        
+        A rate-limited request pauses every caller of this limiter for the
+        backoff period and lowers the refill rate.
+        """
+        retryable, rate_limited, retry_after = classify_error(error)
+        
+        with self._lock:
+            # The request was not served, so its tokens go back in the bucket
+            if self._tokens:
+                self._tokens.adjust(-estimated_tokens, self._rate_scale)
+            
+            if not retryable or stats.retries >= self.max_retries:
+                self._stats["failed"] += 1
+                if retryable:
+                    logger.error(f"{self.provider} request failed after {stats.retries} retries: {error}")
+                raise error
+            
+            ceiling = min(self.max_delay, self.base_delay * (2 ** stats.retries))
+            delay = max(random.uniform(0, ceiling), retry_after or 0.0)
+            
+            if rate_limited:
+                self._rate_scale = max(MIN_RATE_SCALE, self._rate_scale * RATE_DECREASE_FACTOR)
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                self._stats["rate_limited"] += 1
+            self._stats["retries"] += 1
+            self._stats["backoff_seconds"] += delay
+        
+        stats.retries += 1
+        stats.backoff_seconds += delay
+        logger.warning(
+            f"{self.provider} request failed ({error}); retry {stats.retries}/{self.max_retries} in {delay:.1f}s"
+        )
+        return delay
+
+
+_rate_limiters: Dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> RateLimiter:
+    """
+    Get the process-wide rate limiter for a provider.
+    
+    Shared by every conversation in the process, so concurrent analyses
+    draw on the same per-minute budgets.
+    
+    Args:
+        provider: LLM provider name ('anthropic', 'gemini')
+    
+    Returns:
+        RateLimiter: Limiter configured from PROVIDER_RATE_LIMITS
+    """
+    with _rate_limiters_lock:
+        if provider not in _rate_limiters:
+            limits = PROVIDER_RATE_LIMITS.get(provider, {})
+            _rate_limiters[provider] = RateLimiter(
+                provider,
+                requests_per_minute=limits.get("requests_per_minute", 0),
+                tokens_per_minute=limits.get("tokens_per_minute", 0)
+            )
+        return _rate_limiters[provider]
@@ -0,0 +1,488 @@
+"""
+Reference data tools shared by the LLM providers.
+
+Implements the lookups the models call while analyzing a document. Each
+provider's tools.py only declares the tool schemas in its own dialect
+(Anthropic input_schema, Gemini function declarations) and dispatches calls
+to execute_tool() here.
+"""
+
+import logging
+from typing import List, Dict, Any, Optional
+from database.queries import search_institutions
+from database.matching import match_countries, match_institutions, match_foreign_credentials, score_text_match
+from database.reference_store import get_reference_store
+from utils.helpers import fold_text
+
+logger = logging.getLogger(__name__)
+
+# Most items handled by one lookup_reference_data call
+MAX_LOOKUP_ITEMS = 20
+
+# Minimum fuzzy score for lookup_reference_data to resolve a country on its own
+COUNTRY_RESOLVE_MIN_SCORE = 0.8
+
+# Page size of the list tools when no limit is given, and the largest page allowed
+DEFAULT_RESULT_LIMIT = 25
+MAX_RESULT_LIMIT = 100
+
+# Foreign credentials returned per lookup_reference_data item; further pages come from get_foreign_credentials
+LOOKUP_RESULT_LIMIT = 10
+
+# Minimum score for a record to count as matching a list tool's query
+QUERY_MIN_SCORE = 0.4
+
+# Compact projections returned unless the model asks for other fields (grade scale IDs are
+# reported in the analysis output, so they stay in); created_at is never useful to the model
+DEFAULT_FIELDS = {
+    "institutions": ["institution_name", "institution_english_name", "institution_history", "accreditation_status",
+                     "relevance"],
+    "foreign_credentials": ["foreign_credential", "english_credential", "additional_info"],
+    "program_lengths": ["program_length"],
+    "grade_scales": ["grade_scale_uuid", "grade_scale", "bifurcation_setup", "grade_notes", "conversion_factor"],
+    "us_equivalencies": ["overall_equivalency", "equivalency_description"],
+}
+
+# Fields a query is matched against
+SEARCH_FIELDS = {
+    "foreign_credentials": ["foreign_credential", "english_credential"],
+    "grade_scales": ["grade_scale", "bifurcation_setup", "grade_notes"],
+    "us_equivalencies": ["overall_equivalency", "equivalency_description"],
+}
+
+
+class DatabaseTools:
+    """Implementation of the reference data tools, shared by all LLM providers."""
+    
+    @staticmethod
+    def search_countries(query: str) -> Dict[str, Any]:
+        """Search for countries by name or partial match."""
+        try:
+            logger.debug(f"Searching countries with query: {query}")
+            
+            # Get all countries and filter by query
+            all_countries = get_reference_store().get_all_countries()
+            query_lower = query.lower().strip()
+            
+            # Find exact matches first, then partial matches
+            exact_matches = [c for c in all_countries if c['country_name'].lower() == query_lower]
+            partial_matches = [c for c in all_countries if query_lower in c['country_name'].lower() and c not in exact_matches]
+            
+            # Combine results, exact matches first
+            matches = exact_matches + partial_matches[:10]  # Limit to prevent overwhelming
+            
+            # Without an exact hit, add alias and fuzzy candidates (e.g. "Viet Nam", "Türkiye", OCR errors)
+            if not exact_matches:
+                store = get_reference_store()
+                listed = {c['country_name'] for c in matches}
+                for candidate in match_countries(query):
+                    country = store.get_country_by_name(candidate['entity_key'])
+                    if country and candidate['entity_key'] not in listed:
+                        matches.append({
+                            **country,
+                            "match_type": candidate['match_type'],
+                            "match_score": candidate['score']
+                        })
+                        listed.add(candidate['entity_key'])
+            
+            result = {
+                "matches": matches,
+                "total_found": len(matches),
+                "search_query": query
+            }
+            
+            logger.debug(f"Found {len(matches)} country matches for '{query}'")
+            return result
+        
+        except Exception as e:
+            logger.error(f"Error searching countries: {e}")
+            return {"error": str(e), "matches": []}
+    
+    @staticmethod
+    def get_country_details(country_name: str) -> Dict[str, Any]:
+        """Get complete details for a specific country."""
+        try:
+            logger.debug(f"Getting details for country: {country_name}")
+            
+            store = get_reference_store()
+            country = store.get_country_by_name(country_name)
+            if not country:
+                return {"error": f"Country '{country_name}' not found"}
+            
+            # Get all related data
+            institutions = store.get_institutions_by_country(country_name)
+            credentials = store.get_foreign_credentials_by_country(country_name)
+            program_lengths = store.get_program_lengths_by_country(country_name)
+            grade_scales = store.get_grade_scales_by_country(country_name)
+            
+            result = {
+                "country": country,
+                "institutions_count": len(institutions),
+                "credentials_count": len(credentials),
+                "program_lengths_count": len(program_lengths),
+                "grade_scales_count": len(grade_scales),
+                "has_data": {
+                    "institutions": len(institutions) > 0,
+                    "credentials": len(credentials) > 0,
+                    "program_lengths": len(program_lengths) > 0,
+                    "grade_scales": len(grade_scales) > 0
+                }
+            }
+            
+            logger.debug(f"Retrieved details for {country_name}")
+            return result
+        
+        except Exception as e:
+            logger.error(f"Error getting country details: {e}")
+            return {"error": str(e)}
+    
+    @staticmethod
+    def find_institutions(country_name: str, query: str) -> Dict[str, Any]:
+        """Find institutions in a specific country."""
+        try:
+            logger.debug(f"Searching institutions in {country_name} with query: {query}")
+            
+            # Get all institutions for the country
+            all_institutions = get_reference_store().get_institutions_by_country(country_name)
+            
+            if not all_institutions:
+                return {"error": f"No institutions found for country '{country_name}'", "matches": []}
+            
+            # Ranked full-text search (BM25, prefix matching, diacritic folding)
+            search = search_institutions(country_name, query, limit=10)
+            if search and search["matches"]:
+                result = {
+                    "country_name": country_name,
+                    "matches": DatabaseTools._project("institutions", search["matches"]),
+                    "total_found": search["total_found"],
+                    "search_query": query
+                }
+                
+                logger.debug(f"Found {search['total_found']} institution matches ({search['match_mode']})")
+                return result
+            
+            # Fall back to substring matching when the index has no hits
+            query_lower = query.lower().strip()
+            
+            # Search in institution names (both native and English)
+            matches = []
+            for inst in all_institutions:
+                # Check institution name
+                if inst.get('institution_name') and query_lower in inst['institution_name'].lower():
+                    matches.append(inst)
+                # Check English name
+                elif inst.get('institution_english_name') and query_lower in inst['institution_english_name'].lower():
+                    matches.append(inst)
+            
+            # Last resort: fuzzy matching for misspelled or OCR-garbled names
+            if not matches:
+                by_uuid = {inst['institution_uuid']: inst for inst in all_institutions}
+                matches = [
+                    {**by_uuid[candidate['entity_key']], "match_type": candidate['match_type'], "match_score": candidate['score']}
+                    for candidate in match_institutions(country_name, query)
+                    if candidate['entity_key'] in by_uuid
+                ]
+            
+            result = {
+                "country_name": country_name,
+                "matches": DatabaseTools._project("institutions", matches[:10]),  # Limit results
+                "total_found": len(matches),
+                "search_query": query
+            }
+            
+            logger.debug(f"Found {len(matches)} institution matches")
+            return result
+        
+        except Exception as e:
+            logger.error(f"Error finding institutions: {e}")
+            return {"error": str(e), "matches": []}
+    
+    @staticmethod
+    def get_foreign_credentials(country_name: str, query: Optional[str] = None, limit: Optional[int] = None,
+                                offset: int = 0, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Get foreign credential types for a country, optionally ranked by a query and paged."""
+        try:
+            logger.debug(f"Getting foreign credentials for: {country_name} (query: {query})")
+            
+            credentials = get_reference_store().get_foreign_credentials_by_country(country_name)
+            
+            if not credentials:
+                return {"error": f"No foreign credentials found for country '{country_name}'", "credentials": []}
+            
+            result = {
+                "country_name": country_name,
+                **DatabaseTools._select_records("foreign_credentials", "credentials", credentials,
+                                                query, limit, offset, fields)
+            }
+            
+            logger.debug(f"Retrieved {len(result['credentials'])} of {len(credentials)} foreign credentials")
+            return result
+        
+        except Exception as e:
+            logger.error(f"Error getting foreign credentials: {e}")
+            return {"error": str(e)}
+    
+    @staticmethod
+    def get_program_lengths(country_name: str) -> Dict[str, Any]:
+        """Get program lengths for a country."""
+        try:
+            logger.debug(f"Getting program lengths for: {country_name}")
+            
+            program_lengths = get_reference_store().get_program_lengths_by_country(country_name)
+            
+            if not program_lengths:
+                return {"error": f"No program length data found for country '{country_name}'", "program_lengths": []}
+            
+            result = {
+                "country_name": country_name,
+                "program_lengths": DatabaseTools._project("program_lengths", program_lengths),
+                "total_count": len(program_lengths)
+            }
+            
+            logger.debug(f"Retrieved {len(program_lengths)} program length entries")
+            return result
+        
+        except Exception as e:
+            logger.error(f"Error getting program lengths: {e}")
+            return {"error": str(e)}
+    
+    @staticmethod
+    def get_grade_scales(country_name: str, query: Optional[str] = None, limit: Optional[int] = None,
+                         offset: int = 0, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Get grade scales for a country, optionally ranked by a query and paged."""
+        try:
+            logger.debug(f"Getting grade scales for: {country_name} (query: {query})")
+            
+            grade_scales = get_reference_store().get_grade_scales_by_country(country_name)
+            
+            if not grade_scales:
+                return {"error": f"No grade scale data found for country '{country_name}'", "grade_scales": []}
+            
+            result = {
+                "country_name": country_name,
+                **DatabaseTools._select_records("grade_scales", "grade_scales", grade_scales,
+                                                query, limit, offset, fields)
+            }
+            
+            logger.debug(f"Retrieved {len(result['grade_scales'])} of {len(grade_scales)} grade scale entries")
+            return result
+        
+        except Exception as e:
+            logger.error(f"Error getting grade scales: {e}")
+            return {"error": str(e)}
+    
+    @staticmethod
+    def get_us_equivalencies(query: Optional[str] = None, limit: Optional[int] = None,
+                             offset: int = 0, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Get US equivalency mappings, optionally ranked by a query and paged."""
+        try:
+            logger.debug(f"Getting US equivalencies (query: {query})")
+            
+            equivalencies = get_reference_store().get_all_us_equivalencies()
+            
+            if not equivalencies:
+                return {"error": "No US equivalency data found", "equivalencies": []}
+            
+            result = DatabaseTools._select_records("us_equivalencies", "equivalencies", equivalencies,
+                                                   query, limit, offset, fields)
+            
+            logger.debug(f"Retrieved {len(result['equivalencies'])} of {len(equivalencies)} US equivalency entries")
+            return result
+        
+        except Exception as e:
+            logger.error(f"Error getting US equivalencies: {e}")
+            return {"error": str(e)}
+    
+    @staticmethod
+    def lookup_reference_data(items: List[Dict[str, Any]], include_us_equivalencies: bool = False) -> Dict[str, Any]:
+        """Look up countries, institutions, credentials, program lengths and grade scales for several credentials."""
+        try:
+            logger.debug(f"Looking up reference data for {len(items)} items")
+            
+            store = get_reference_store()
+            countries: Dict[str, Dict[str, Any]] = {}
+            results = []
+            
+            for item in items[:MAX_LOOKUP_ITEMS]:
+                country_query = (item.get("country") or "").strip()
+                institution_query = (item.get("institution_query") or "").strip()
+                credential_query = (item.get("credential_query") or "").strip()
+                entry: Dict[str, Any] = {"country_query": country_query}
+                
+                country = DatabaseTools._resolve_country(country_query)
+                if country is None:
+                    entry["error"] = f"Country '{country_query}' not found"
+                    entry["country_candidates"] = DatabaseTools.search_countries(country_query).get("matches", [])[:5]
+                    results.append(entry)
+                    continue
+                
+                country_name = country['country_name']
+                entry["country_name"] = country_name
+                
+                # Data that only depends on the country is returned once per country
+                if country_name not in countries:
+                    countries[country_name] = {
+                        "program_lengths": DatabaseTools._project(
+                            "program_lengths", store.get_program_lengths_by_country(country_name)
+                        ),
+                        "grade_scales": DatabaseTools._project(
+                            "grade_scales", store.get_grade_scales_by_country(country_name)
+                        )
+                    }
+                
+                if institution_query:
+                    entry["institution_query"] = institution_query
+                    entry["institutions"] = DatabaseTools.find_institutions(country_name, institution_query).get("matches", [])
+                
+                credentials = store.get_foreign_credentials_by_country(country_name)
+                matched: List[Dict[str, Any]] = []
+                if credential_query:
+                    entry["credential_query"] = credential_query
+                    matched = DatabaseTools._match_credentials(country_name, credential_query, credentials)
+                    entry["foreign_credentials_matched"] = bool(matched)
+                
+                # The matches, or without any the country's whole list, paged like get_foreign_credentials
+                selection = DatabaseTools._select_records("foreign_credentials", "foreign_credentials",
+                                                          matched or credentials, None, LOOKUP_RESULT_LIMIT, 0, None)
+                entry["foreign_credentials"] = selection["foreign_credentials"]
+                entry["foreign_credentials_total"] = selection["total_count"]
+                entry["foreign_credentials_has_more"] = selection["has_more"]
+                
+                results.append(entry)
+            
+            result = {
+                "items": results,
+                "countries": countries,
+                "total_items": len(results)
+            }
+            if len(items) > MAX_LOOKUP_ITEMS:
+                result["truncated"] = f"Only the first {MAX_LOOKUP_ITEMS} items were looked up"
+            if include_us_equivalencies:
+                result["us_equivalencies"] = DatabaseTools._project("us_equivalencies", store.get_all_us_equivalencies())
+            
+            logger.debug(f"Looked up reference data for {len(results)} items in {len(countries)} countries")
+            return result
+        
+        except Exception as e:
+            logger.error(f"Error looking up reference data: {e}")
+            return {"error": str(e), "items": []}
+    
+    @staticmethod
+    def _resolve_country(query: str) -> Optional[Dict[str, Any]]:
+        """Resolve a country as written to its database record (exact, case-insensitive, then alias or close fuzzy match)."""
+        if not query:
+            return None
+        
+        store = get_reference_store()
+        country = store.get_country_by_name(query)
+        if country:
+            return country
+        
+        query_lower = query.lower()
+        for candidate in store.get_all_countries():
+            if candidate['country_name'].lower() == query_lower:
+                return candidate
+        
+        candidates = match_countries(query, limit=1, min_score=COUNTRY_RESOLVE_MIN_SCORE)
+        return store.get_country_by_name(candidates[0]['entity_key']) if candidates else None
+    
+    @staticmethod
+    def _match_credentials(country_name: str, query: str, credentials: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Rank a country's foreign credentials against a credential name as written."""
+        query_lower = query.lower()
+        matches = [
+            c for c in credentials
+            if query_lower in (c.get('foreign_credential') or '').lower()
+            or query_lower in (c.get('english_credential') or '').lower()
+        ]
+        
+        listed = {c['credential_uuid'] for c in matches}
+        by_uuid = {c['credential_uuid']: c for c in credentials}
+        for candidate in match_foreign_credentials(country_name, query):
+            if candidate['entity_key'] in by_uuid and candidate['entity_key'] not in listed:
+                matches.append({
+                    **by_uuid[candidate['entity_key']],
+                    "match_type": candidate['match_type'],
+                    "match_score": candidate['score']
+                })
+                listed.add(candidate['entity_key'])
+        
+        return matches
+    
+    @staticmethod
+    def _select_records(kind: str, key: str, records: List[Dict[str, Any]], query: Optional[str],
+                        limit: Optional[int], offset: int, fields: Optional[List[str]]) -> Dict[str, Any]:
+        """
+        Rank records by a query, take one page of them and project each to a few fields.
+        
+        Records matching the query come first, best match first. If none
+        match, all records are returned in their usual order and
+        query_matched is false, so the model still gets something to choose
+        from without another round-trip.
+        """
+        total_available = len(records)
+        query_matched = None
+        
+        if query and query.strip():
+            folded_query = fold_text(query)
+            scored = []
+            for record in records:
+                score = max(
+                    (score_text_match(folded_query, fold_text(record.get(field))) for field in SEARCH_FIELDS[kind]),
+                    default=0.0
+                )
+                if score >= QUERY_MIN_SCORE:
+                    scored.append((score, record))
+            
+            query_matched = bool(scored)
+            if scored:
+                scored.sort(key=lambda item: item[0], reverse=True)
+                records = [{**record, "match_score": score} for score, record in scored]
+        
+        limit = min(max(1, limit or DEFAULT_RESULT_LIMIT), MAX_RESULT_LIMIT)
+        offset = max(0, offset or 0)
+        page = records[offset:offset + limit]
+        
+        result = {
+            key: DatabaseTools._project(kind, page, fields),
+            "total_count": len(records) if query_matched else total_available,
+            "returned_count": len(page),
+            "offset": offset,
+            "has_more": offset + len(page) < len(records)
+        }
+        if query_matched is not None:
+            result["search_query"] = query
+            result["query_matched"] = query_matched
+        return result
+    
+    @staticmethod
+    def _project(kind: str, records: List[Dict[str, Any]], fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Keep only the requested fields (or the compact default) of each record, plus any match metadata."""
+        keep = [field for field in fields if isinstance(field, str)] if fields else DEFAULT_FIELDS[kind]
+        keep = keep + [field for field in ("match_type", "match_score") if field not in keep]
+        return [{field: record[field] for field in keep if field in record} for record in records]
+
+
+# Tool dispatcher for LLM providers (manual function calling)
+def execute_tool(tool_name: str, **kwargs) -> Dict[str, Any]:
+    """Execute a tool by name with provided arguments."""
+    tools = DatabaseTools()
+    
+    tool_map = {
+        "lookup_reference_data": tools.lookup_reference_data,
+        "search_countries": tools.search_countries,
+        "find_institutions": tools.find_institutions,
+        "get_foreign_credentials": tools.get_foreign_credentials,
+        "get_program_lengths": tools.get_program_lengths,
+        "get_grade_scales": tools.get_grade_scales,
+        "get_us_equivalencies": tools.get_us_equivalencies
+    }
+    
+    if tool_name not in tool_map:
+        return {"error": f"Unknown tool: {tool_name}"}
+    
+    try:
+        return tool_map[tool_name](**kwargs)
+    except Exception as e:
+        logger.error(f"Error executing tool {tool_name}: {e}")
+        return {"error": f"Tool execution failed: {str(e)}"}
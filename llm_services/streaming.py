@@ -0,0 +1,174 @@
+"""
+Incremental parsing of streamed final answers.
+
+The final answer of an analysis is a JSON object whose "credentials" list
+can run to thousands of tokens on a course-by-course transcript. While the
+answer streams in, CredentialStreamParser scans the text as it arrives and
+hands each credential to a callback as soon as its object is closed, so
+callers can start on the first credentials long before the answer is
+complete. The full answer is still parsed as before once it has arrived;
+the parser only surfaces credentials early.
+
+Whether a streamed turn is the final answer is only known once it ends:
+a model may write a draft answer and then call a tool. While a turn may
+still end in tool calls the parser holds its credentials, and end_turn()
+hands them over or drops them.
+"""
+
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Called with the position of a credential in the answer's credentials list and its raw dictionary
+CredentialCallback = Callable[[int, Dict[str, Any]], None]
+
+# Key of the list whose elements are surfaced
+CREDENTIALS_KEY = "credentials"
+
+
+class CredentialStreamParser:
+    """
+    Scans a streamed JSON answer and emits each element of its credentials list once complete.
+    
+    Text before the first "{" (prose, a markdown fence) is skipped, and
+    scanning stops when the top-level object closes. Elements that do not
+    parse are skipped; the final parse of the complete answer remains
+    authoritative.
+    """
+    
+    def __init__(self, on_credential: CredentialCallback):
+        """
+        Initialize the parser.
+        
+        Args:
+            on_credential: Called with (index, credential) for every complete credential
+        """
+        self.on_credential = on_credential
+        # Credentials already handed to the callback; survives reset() so a retried request does not repeat them
+        self.emitted = 0
+        self.holding = False
+        self.reset()
+    
+    def reset(self) -> None:
+        """Start scanning a new answer, e.g. the retry of a failed request."""
+        self._stack: List[str] = []
+        self._done = False
+        self._in_string = False
+        self._escape = False
+        self._string_chars: Optional[List[str]] = None
+        self._last_key: Optional[str] = None
+        self._pending_key: Optional[str] = None
+        self._array_depth: Optional[int] = None
+        self._element_chars: Optional[List[str]] = None
+        self._index = 0
+        self._held: List[Tuple[int, Dict[str, Any]]] = []
+    
+    def hold(self) -> None:
+        """Keep complete credentials back until end_turn(), e.g. while the turn may still end in tool calls."""
+        self.holding = True
+    
+    def end_turn(self, final: bool) -> None:
+        """
+        Finish a turn scanned with hold().
+        
+        Args:
+            final: True if the turn is the final answer, so its held credentials
+                are handed to the callback; otherwise they are dropped
+        """
+        held, self._held = self._held, []
+        self.holding = False
+        if not final:
+            return
+        for index, credential in held:
+            self._deliver(index, credential)
+    
+    def feed(self, text: str) -> None:
+        """
+        Scan the next piece of the answer.
+        
+        Args:
+            text: Text delta from the stream
+        """
+        for char in text:
+            if self._done:
+                return
+            self._scan(char)
+    
+    def _scan(self, char: str) -> None:
+        """Advance the scanner by one character."""
+        if self._element_chars is not None:
+            self._element_chars.append(char)
+        
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._string_chars is not None:
+                    self._last_key = "".join(self._string_chars)
+                    self._string_chars = None
+            elif self._string_chars is not None:
+                self._string_chars.append(char)
+            return
+        
+        if not self._stack:
+            # Skip anything before the top-level object
+            if char == "{":
+                self._stack.append(char)
+            return
+        
+        if char == '"':
+            self._in_string = True
+            # Only strings directly in the top-level object can be the key we look for
+            self._string_chars = [] if len(self._stack) == 1 else None
+            self._last_key = None
+        elif char == ":":
+            self._pending_key = self._last_key if len(self._stack) == 1 else None
+        elif char in "{[":
+            if char == "{" and self._array_depth is not None and len(self._stack) == self._array_depth:
+                self._element_chars = [char]
+            self._stack.append(char)
+            if char == "[" and len(self._stack) == 2 and self._pending_key == CREDENTIALS_KEY:
+                self._array_depth = len(self._stack)
+            self._pending_key = None
+        elif char in "}]":
+            self._stack.pop()
+            if char == "}" and self._element_chars is not None and len(self._stack) == self._array_depth:
+                self._emit("".join(self._element_chars))
+                self._element_chars = None
+            elif char == "]" and self._array_depth is not None and len(self._stack) == self._array_depth - 1:
+                self._array_depth = None
+            if not self._stack:
+                self._done = True
+        elif char == ",":
+            self._pending_key = None
+    
+    def _emit(self, element: str) -> None:
+        """Parse one complete credential and hand it to the callback (or hold it), unless already emitted."""
+        index = self._index
+        self._index += 1
+        if index < self.emitted:
+            return
+        
+        try:
+            credential = json.loads(element)
+        except json.JSONDecodeError:
+            logger.debug(f"Skipping streamed credential {index} that does not parse")
+            return
+        
+        if self.holding:
+            self._held.append((index, credential))
+        else:
+            self._deliver(index, credential)
+    
+    def _deliver(self, index: int, credential: Dict[str, Any]) -> None:
+        """Hand one credential to the callback."""
+        self.emitted = index + 1
+        try:
+            self.on_credential(index, credential)
+        except Exception as e:
+            logger.warning(f"Credential callback failed for credential {index}: {e}")
@@ -0,0 +1,145 @@
+"""
+Memoization of database tool calls.
+
+During an analysis the model often repeats identical tool calls, such as
+get_us_equivalencies() or get_foreign_credentials("India"), across
+iterations and across documents. Results of successful calls are kept in a
+bounded LRU shared by every conversation in the process, keyed by tool name
+and arguments, together with their JSON serialization. Repeats skip both the
+lookup and the serialization, and send byte-identical payloads back to the
+provider, which keeps provider-side prompt caches warm.
+
+The cache is emptied whenever the reference data version changes, so it
+never serves results from an older migration.
+"""
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from database.reference_store import get_reference_store
+from config import TOOL_CACHE_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ToolCallResult:
+    """
+    Result of a tool call, shared between all callers that hit the same entry.
+    
+    The result dictionary must be treated as read-only.
+    """
+    result: Dict[str, Any]
+    content_json: str
+    cache_hit: bool = False
+
+
+class ToolResultCache:
+    """Thread-safe LRU cache of tool results keyed by tool name and arguments."""
+    
+    def __init__(self, max_entries: int = TOOL_CACHE_MAX_ENTRIES):
+        """
+        Initialize the cache.
+        
+        Args:
+            max_entries: Maximum number of cached results (0 disables caching)
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], ToolCallResult]" = OrderedDict()
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def call(self, execute: Callable[..., Dict[str, Any]], tool_name: str,
+             tool_input: Dict[str, Any]) -> ToolCallResult:
+        """
+        Execute a tool, or return the cached result of an identical earlier call.
+        
+        Results containing an "error" key are returned but not cached, so
+        transient failures are retried on the next call.
+        
+        Args:
+            execute: Tool dispatcher, called as execute(tool_name, **tool_input)
+            tool_name: Name of the tool
+            tool_input: Tool arguments
+        
+        Returns:
+            ToolCallResult: The result, its JSON serialization and whether it came from the cache
+        """
+        if self.max_entries <= 0:
+            result = execute(tool_name, **tool_input)
+            return ToolCallResult(result, json.dumps(result, ensure_ascii=False))
+        
+        try:
+            key = (tool_name, json.dumps(tool_input, sort_keys=True, ensure_ascii=False, default=str))
+            version = get_reference_store().snapshot().version
+        except Exception as e:
+            logger.warning(f"Tool result cache bypassed for {tool_name}: {e}")
+            result = execute(tool_name, **tool_input)
+            return ToolCallResult(result, json.dumps(result, ensure_ascii=False))
+        
+        with self._lock:
+            if version != self._version:
+                if self._entries:
+                    logger.info(f"Reference data version changed, dropping {len(self._entries)} cached tool results")
+                self._entries.clear()
+                self._version = version
+            
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return ToolCallResult(cached.result, cached.content_json, cache_hit=True)
+            self.misses += 1
+        
+        # Run outside the lock; concurrent misses on the same key just compute it twice
+        result = execute(tool_name, **tool_input)
+        entry = ToolCallResult(result, json.dumps(result, ensure_ascii=False))
+        
+        if isinstance(result, dict) and "error" not in result:
+            with self._lock:
+                if version == self._version:
+                    self._entries[key] = entry
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        
+        return entry
+    
+    def clear(self) -> None:
+        """Remove every cached result."""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get process-wide cache statistics.
+        
+        Returns:
+            Dict: Entry count, hits and misses since the cache was created
+        """
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_tool_cache: Optional[ToolResultCache] = None
+_tool_cache_lock = threading.Lock()
+
+
+def get_tool_cache() -> ToolResultCache:
+    """
+    Get the process-wide tool result cache shared by all LLM services.
+    
+    Returns:
+        ToolResultCache: Shared cache instance
+    """
+    global _tool_cache
+    with _tool_cache_lock:
+        if _tool_cache is None:
+            _tool_cache = ToolResultCache()
+        return _tool_cache
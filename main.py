@@ -6,6 +6,7 @@ Orchestrates the complete pipeline from Salesforce extraction to SQLite database
 
 import logging
 import sys
+import time
 from pathlib import Path
 from typing import Optional
 
@@ -14,18 +15,26 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from utils.helpers import setup_logging, format_table_stats
 from database.connection import initialize_database, check_database_exists
-from database.queries import get_database_statistics, validate_data_integrity
+from database.queries import get_database_statistics, validate_data_integrity, explain_hot_queries
 from database.migrations import DataMigrator
 from salesforce.client import get_salesforce_client
 from salesforce.extractors import SalesforceExtractor
 from document_processor.processor import DocumentProcessor
+from document_processor.batch import BatchAnalyzer
+from llm_services.rate_limiter import get_rate_limiter
+from config import BATCH_MAX_WORKERS, RESULT_CACHE_ENABLED
 
 
 logger = logging.getLogger(__name__)
 
 
-def main() -> None:
-    """Main application entry point."""
+def main(incremental: bool = False) -> None:
+    """
+    Main application entry point.
+    
+    Args:
+        incremental: Apply only Salesforce changes since the last sync instead of a full migration
+    """
     
     # Setup logging
     setup_logging(level="INFO")
@@ -55,9 +64,13 @@ def main() -> None:
             sys.exit(1)
         
         # Step 4: Run data migration
-        logger.info("Step 4: Running data migration...")
         migrator = DataMigrator(extractor)
-        migrator.run_full_migration()
+        if incremental:
+            logger.info("Step 4: Running incremental sync...")
+            migrator.run_incremental_sync()
+        else:
+            logger.info("Step 4: Running data migration...")
+            migrator.run_full_migration()
         
         # Step 5: Validate and report
         logger.info("Step 5: Validating data and generating report...")
@@ -85,21 +98,18 @@ def main() -> None:
 
 
 def reset_database() -> None:
-    """Reset the database by dropping all tables and recreating them."""
+    """Reset the database by swapping in a freshly created, empty one."""
     
     setup_logging(level="INFO")
     logger.info("Resetting database...")
     
     try:
-        from database.connection import get_db_connection
-        from database.schema import drop_all_tables, create_all_tables
+        from database.connection import create_shadow_database, swap_database
         
-        with get_db_connection() as conn:
-            # Drop all existing tables
-            drop_all_tables(conn)
-            
-            # Recreate all tables
-            create_all_tables(conn)
+        # Build the empty schema aside and rename it into place, so readers
+        # never see half-dropped tables
+        shadow_path = create_shadow_database()
+        swap_database(shadow_path)
         
         logger.info("Database reset completed successfully")
         
@@ -108,8 +118,31 @@ def reset_database() -> None:
         sys.exit(1)
 
 
-def show_stats() -> None:
-    """Display current database statistics."""
+def upgrade_database() -> None:
+    """Create missing tables and indexes and apply pending schema upgrades."""
+    
+    setup_logging(level="INFO")
+    
+    try:
+        if not check_database_exists():
+            print("Database does not exist. Run main migration first.")
+            return
+        
+        initialize_database()
+        logger.info("Database upgrade completed successfully")
+        
+    except Exception as e:
+        logger.error(f"Database upgrade failed: {e}", exc_info=True)
+        sys.exit(1)
+
+
+def show_stats(explain: bool = False) -> None:
+    """
+    Display current database statistics.
+    
+    Args:
+        explain: Also print the query plan for each hot lookup query
+    """
     
     setup_logging(level="WARNING")  # Minimal logging for stats display
     
@@ -128,12 +161,20 @@ def show_stats() -> None:
             for issue in integrity['issues']:
                 print(f"  - {issue}")
         
+        if explain:
+            print("\nQuery Plans:")
+            for name, steps in explain_hot_queries().items():
+                print(f"  {name}:")
+                for step in steps:
+                    print(f"    {step}")
+        
     except Exception as e:
         print(f"Error retrieving statistics: {e}")
         sys.exit(1)
 
 
-def analyze_folio(filename: str, document_type: str = "general", generate_pdf: bool = False) -> None:
+def analyze_folio(filename: str, document_type: str = "general", generate_pdf: bool = False,
+                  use_cache: bool = RESULT_CACHE_ENABLED, refresh_cache: bool = False) -> None:
     """Analyze a folio PDF document for credentials."""
     
     setup_logging(level="INFO")
@@ -172,7 +213,7 @@ def analyze_folio(filename: str, document_type: str = "general", generate_pdf: b
         
         # Initialize processor
         print("Initializing document processor...")
-        processor = DocumentProcessor()
+        processor = DocumentProcessor(use_cache=use_cache, refresh_cache=refresh_cache)
         
         # Get processor info
         info = processor.get_processor_info()
@@ -180,7 +221,12 @@ def analyze_folio(filename: str, document_type: str = "general", generate_pdf: b
         
         # Process the PDF
         print("Starting analysis (this may take a few minutes)...")
-        result = processor.process_pdf(str(folio_path), document_type=document_type)
+        
+        def report_credential(index, credential):
+            country = credential.country.validated_name or credential.country.extracted_name
+            print(f"  Credential {index + 1} ready: {credential.foreign_credential.get_display_type()} ({country})")
+        
+        result = processor.process_pdf(str(folio_path), document_type=document_type, on_credential=report_credential)
         
         # Generate PDF report if requested
         if generate_pdf:
@@ -205,6 +251,12 @@ def analyze_folio(filename: str, document_type: str = "general", generate_pdf: b
         print(f"{'='*70}")
         
         print(f"Success: {'Yes' if result.success else 'No'}")
+        if (result.conversation_metadata or {}).get("result_cache"):
+            print("Served from the result cache (use --refresh to re-analyze)")
+        preprocessing = (result.conversation_metadata or {}).get("preprocessing")
+        if preprocessing and preprocessing["pages_sent"] < preprocessing["page_count"]:
+            print(f"Sent {preprocessing['pages_sent']} of {preprocessing['page_count']} pages "
+                  f"(blank: {len(preprocessing['blank_pages'])}, duplicates: {len(preprocessing['duplicate_pages'])})")
         
         if result.errors:
             print(f"\nErrors:")
@@ -318,6 +370,100 @@ def analyze_folio(filename: str, document_type: str = "general", generate_pdf: b
         sys.exit(1)
 
 
+def analyze_batch(directory: str, workers: int = BATCH_MAX_WORKERS, document_type: str = "general",
+                  generate_pdf: bool = False, use_cache: bool = RESULT_CACHE_ENABLED,
+                  refresh_cache: bool = False) -> None:
+    """
+    Analyze every PDF in a directory concurrently.
+    
+    Args:
+        directory: Folder of PDFs (absolute, relative, or a folder under data/folios)
+        workers: Number of documents analyzed at once
+        document_type: Type of document analysis ("general" or "cbc")
+        generate_pdf: Generate a PDF evaluation report for each successful analysis
+        use_cache: Reuse and store LLM results in the result cache
+        refresh_cache: Ignore cached results but store the new ones
+    """
+    
+    setup_logging(level="INFO")
+    logger.info(f"Starting batch analysis for: {directory} (type: {document_type}, workers: {workers})")
+    
+    try:
+        # Check if database exists
+        if not check_database_exists():
+            print("ERROR: Database does not exist. Run 'python main.py migrate' first.")
+            sys.exit(1)
+        
+        folder = Path(directory)
+        if not folder.is_dir():
+            folder = Path(__file__).parent / "data" / "folios" / directory
+        if not folder.is_dir():
+            print(f"ERROR: Directory not found: {directory}")
+            sys.exit(1)
+        
+        pdf_files = sorted(folder.glob("*.pdf"))
+        if not pdf_files:
+            print(f"ERROR: No PDF files found in {folder}")
+            sys.exit(1)
+        
+        analyzer = BatchAnalyzer(max_workers=workers, use_cache=use_cache, refresh_cache=refresh_cache)
+        # The analyzer never starts more workers than there are files
+        workers_used = min(analyzer.max_workers, len(pdf_files))
+        print(f"Analyzing {len(pdf_files)} PDF files in {folder} with {workers_used} workers (Document Type: {document_type.upper()})")
+        
+        batch_start = time.perf_counter()
+        items = analyzer.analyze([str(pdf_file) for pdf_file in pdf_files], document_type=document_type)
+        elapsed_time = time.perf_counter() - batch_start
+        
+        # Generate PDF reports one after another once all analyses are in
+        if generate_pdf:
+            from document_processor.pdf_service import PDFService
+            pdf_service = PDFService()
+            for item in items:
+                if not item.result.success:
+                    continue
+                try:
+                    pdf_service.generate_evaluation_pdf(
+                        result=item.result,
+                        filename=Path(item.pdf_path).name,
+                        is_cbc=(document_type == "cbc")
+                    )
+                except Exception as e:
+                    logger.warning(f"PDF generation failed for {item.pdf_path}: {e}")
+        
+        # Display results in input order
+        print(f"\n{'='*70}")
+        print(f"BATCH RESULTS")
+        print(f"{'='*70}")
+        
+        for item in items:
+            status = "OK    " if item.result.success else "FAILED"
+            detail = f"{len(item.result.credentials)} credentials" if item.result.success else "; ".join(item.result.errors)
+            print(f"{status} {Path(item.pdf_path).name} ({item.duration_seconds:.1f}s) - {detail}")
+        
+        succeeded = sum(1 for item in items if item.result.success)
+        document_time = sum(item.duration_seconds for item in items)
+        print(f"\n{succeeded}/{len(items)} documents analyzed successfully")
+        print(f"Elapsed time: {elapsed_time:.1f}s with {workers_used} workers "
+              f"(total per-document time: {document_time:.1f}s)")
+        limiter_stats = get_rate_limiter(analyzer.llm_provider).stats()
+        print(f"Rate limiter: {limiter_stats['requests']} requests, {limiter_stats['retries']} retries "
+              f"({limiter_stats['rate_limited']} rate limited), {limiter_stats['wait_seconds']:.1f}s throttled, "
+              f"{limiter_stats['backoff_seconds']:.1f}s backing off")
+        print(f"JSON results automatically saved to the 'results' folder with timestamp.")
+        
+        logger.info("Batch analysis completed")
+        
+    except KeyboardInterrupt:
+        logger.info("Batch analysis interrupted by user")
+        sys.exit(0)
+        
+    except Exception as e:
+        logger.error(f"Batch analysis failed: {e}", exc_info=True)
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     import argparse
     
@@ -326,13 +472,13 @@ if __name__ == "__main__":
         "command", 
         nargs="?", 
         default="migrate",
-        choices=["migrate", "reset", "stats", "analyze"],
+        choices=["migrate", "reset", "upgrade", "stats", "analyze", "analyze-batch"],
         help="Command to run (default: migrate)"
     )
     parser.add_argument(
         "filename",
         nargs="?",
-        help="PDF filename to analyze (required for 'analyze' command)"
+        help="PDF filename to analyze (required for 'analyze'), or directory of PDFs (required for 'analyze-batch')"
     )
     parser.add_argument(
         "--type",
@@ -345,22 +491,58 @@ if __name__ == "__main__":
         action="store_true",
         help="Generate PDF evaluation report in addition to JSON results"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=BATCH_MAX_WORKERS,
+        help=f"With 'analyze-batch': number of documents analyzed concurrently (default: {BATCH_MAX_WORKERS})"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="With 'analyze'/'analyze-batch': always call the LLM and do not store results in the result cache"
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="With 'analyze'/'analyze-batch': ignore cached results, re-analyze and update the cache"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="With 'migrate': sync only records changed in Salesforce since the last run"
+    )
+    parser.add_argument(
+        "--explain",
+        action="store_true",
+        help="With 'stats': print the SQLite query plan for each hot lookup query"
+    )
     
     args = parser.parse_args()
     
     if args.command == "migrate":
-        main()
+        main(args.incremental)
     elif args.command == "reset":
         reset_database()
+    elif args.command == "upgrade":
+        upgrade_database()
     elif args.command == "stats":
-        show_stats()
+        show_stats(args.explain)
     elif args.command == "analyze":
         if not args.filename:
             print("ERROR: filename is required for analyze command")
-            print("Usage: python main.py analyze <filename.pdf> [--type general|cbc] [--pdf]")
+            print("Usage: python main.py analyze <filename.pdf> [--type general|cbc] [--pdf] [--no-cache|--refresh]")
             print("Example: python main.py analyze \"Folio 002293166.pdf\" --type general --pdf")
             sys.exit(1)
-        analyze_folio(args.filename, args.type, args.pdf)
+        analyze_folio(args.filename, args.type, args.pdf, RESULT_CACHE_ENABLED and not args.no_cache, args.refresh)
+    elif args.command == "analyze-batch":
+        if not args.filename:
+            print("ERROR: directory is required for analyze-batch command")
+            print("Usage: python main.py analyze-batch <directory> [--workers N] [--type general|cbc] [--pdf] [--no-cache|--refresh]")
+            print("Example: python main.py analyze-batch data/folios --workers 8")
+            sys.exit(1)
+        analyze_batch(args.filename, args.workers, args.type, args.pdf,
+                      RESULT_CACHE_ENABLED and not args.no_cache, args.refresh)
     else:
         parser.print_help()
         sys.exit(1)
\ No newline at end of file
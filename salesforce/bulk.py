@@ -0,0 +1,207 @@
+"""
+Salesforce Bulk API 2.0 query jobs.
+
+Large object types can be extracted as asynchronous query jobs instead of
+paging through REST query_more: the job is submitted, polled until
+Salesforce has prepared the results, and the CSV result sets are streamed
+record by record. Each result set holds up to SF_BULK_MAX_RECORDS records
+per API call, so big extractions are faster and use far fewer API calls.
+"""
+
+import codecs
+import csv
+import logging
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional
+from simple_salesforce import Salesforce
+from config import SF_BULK_POLL_INTERVAL, SF_BULK_TIMEOUT, SF_BULK_MAX_RECORDS
+
+
+logger = logging.getLogger(__name__)
+
+# Job states after which Salesforce will not produce results
+FAILED_JOB_STATES = {"Failed", "Aborted"}
+
+# Boolean fields that arrive as "true"/"false" text in CSV results
+BOOLEAN_FIELDS = {"IsDeleted"}
+
+# Bytes read from a result set response at a time
+RESULT_CHUNK_SIZE = 64 * 1024
+
+
+class BulkQueryClient:
+    """Runs SOQL queries as Bulk API 2.0 query jobs on an authenticated session."""
+    
+    def __init__(self, sf: Salesforce, poll_interval: float = SF_BULK_POLL_INTERVAL,
+                 timeout: float = SF_BULK_TIMEOUT, max_records: int = SF_BULK_MAX_RECORDS):
+        """
+        Initialize the client from an authenticated Salesforce connection.
+        
+        Args:
+            sf: Salesforce connection whose session, headers and API version are reused
+            poll_interval: Seconds between job status checks
+            timeout: Seconds to wait for a job to complete before aborting it
+            max_records: Records requested per result set
+        """
+        self.session = sf.session
+        self.headers = dict(sf.headers)
+        self.jobs_url = f"{sf.base_url}jobs/query"
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.max_records = max_records
+    
+    def query(self, soql: str, include_deleted: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Submit a query job, wait for it and stream its records.
+        
+        Args:
+            soql: SOQL query (aggregate queries are not supported by Bulk API 2.0)
+            include_deleted: Run as queryAll so deleted and archived records are included
+        
+        Yields:
+            Dict: Records keyed by field name, with empty values as None
+        """
+        job_id = self.submit(soql, include_deleted)
+        self.wait(job_id)
+        yield from self.iter_records(job_id)
+    
+    def submit(self, soql: str, include_deleted: bool = False) -> str:
+        """
+        Create a query job.
+        
+        Args:
+            soql: SOQL query
+            include_deleted: Run as queryAll instead of query
+        
+        Returns:
+            str: Job ID
+        """
+        response = self.session.post(
+            self.jobs_url,
+            headers=self.headers,
+            json={
+                "operation": "queryAll" if include_deleted else "query",
+                "query": " ".join(soql.split()),
+                "contentType": "CSV",
+                "columnDelimiter": "COMMA",
+                "lineEnding": "LF"
+            }
+        )
+        response.raise_for_status()
+        job_id = response.json()["id"]
+        logger.debug(f"Submitted Bulk API query job {job_id}")
+        return job_id
+    
+    def wait(self, job_id: str) -> Dict[str, Any]:
+        """
+        Poll a job until Salesforce has finished preparing its results.
+        
+        Args:
+            job_id: Job ID from submit()
+        
+        Returns:
+            Dict: Final job info (state, numberRecordsProcessed, ...)
+        
+        Raises:
+            RuntimeError: If the job fails, is aborted or does not complete in time
+        """
+        deadline = time.monotonic() + self.timeout
+        
+        while True:
+            response = self.session.get(f"{self.jobs_url}/{job_id}", headers=self.headers)
+            response.raise_for_status()
+            job = response.json()
+            state = job.get("state")
+            
+            if state == "JobComplete":
+                logger.debug(f"Bulk API query job {job_id} complete: {job.get('numberRecordsProcessed')} records")
+                return job
+            
+            if state in FAILED_JOB_STATES:
+                raise RuntimeError(f"Bulk API query job {job_id} {state.lower()}: {job.get('errorMessage')}")
+            
+            if time.monotonic() >= deadline:
+                self.abort(job_id)
+                raise RuntimeError(f"Bulk API query job {job_id} did not complete within {self.timeout:.0f}s")
+            
+            time.sleep(self.poll_interval)
+    
+    def iter_records(self, job_id: str) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the records of a completed job, one result set at a time.
+        
+        Each result set is parsed straight off the HTTP response, so only the
+        record being yielded is held in memory, not the whole set.
+        
+        Args:
+            job_id: ID of a job in the JobComplete state
+        
+        Yields:
+            Dict: Records keyed by field name, with empty values as None
+        """
+        locator: Optional[str] = None
+        
+        while True:
+            params = {"maxRecords": self.max_records}
+            if locator:
+                params["locator"] = locator
+            
+            response = self.session.get(
+                f"{self.jobs_url}/{job_id}/results",
+                headers={**self.headers, "Accept": "text/csv"},
+                params=params,
+                stream=True
+            )
+            try:
+                response.raise_for_status()
+                chunks = codecs.iterdecode(response.iter_content(RESULT_CHUNK_SIZE), "utf-8")
+                
+                for row in csv.DictReader(_iter_lines(chunks)):
+                    yield _parse_row(row)
+                
+                locator = response.headers.get("Sforce-Locator")
+            finally:
+                response.close()
+            
+            if not locator or locator == "null":
+                return
+    
+    def abort(self, job_id: str) -> None:
+        """
+        Abort a job that is still running.
+        
+        Args:
+            job_id: Job ID from submit()
+        """
+        try:
+            response = self.session.patch(
+                f"{self.jobs_url}/{job_id}", headers=self.headers, json={"state": "Aborted"}
+            )
+            response.raise_for_status()
+            logger.info(f"Aborted Bulk API query job {job_id}")
+        except Exception as e:
+            logger.warning(f"Failed to abort Bulk API query job {job_id}: {e}")
+
+
+def _iter_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Split streamed text into lines, keeping line endings so quoted multi-line values survive."""
+    pending = ""
+    for chunk in chunks:
+        lines = (pending + chunk).splitlines(keepends=True)
+        pending = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        yield from lines
+    if pending:
+        yield pending
+
+
+def _parse_row(row: Dict[str, str]) -> Dict[str, Any]:
+    """Convert a CSV row to the value types REST queries return."""
+    record: Dict[str, Any] = {}
+    for field, value in row.items():
+        if value == "":
+            record[field] = None
+        elif field in BOOLEAN_FIELDS:
+            record[field] = value.lower() == "true"
+        else:
+            record[field] = value
+    return record
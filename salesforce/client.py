@@ -63,6 +63,23 @@ class SalesforceClient:
             logger.error(f"Failed to connect to Salesforce: {e}")
             raise
     
+    def clone_connection(self) -> Salesforce:
+        """
+        Create another Salesforce client that reuses this client's session.
+        
+        The underlying requests session is not thread-safe, so each worker
+        thread gets its own client while sharing one login.
+        
+        Returns:
+            Salesforce: Client authenticated with the existing session
+        """
+        sf = self.connect()
+        return Salesforce(
+            session_id=sf.session_id,
+            instance=sf.sf_instance,
+            version=sf.sf_version
+        )
+    
     def disconnect(self) -> None:
         """Close the Salesforce connection."""
         if self.sf is not None:
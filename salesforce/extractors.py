@@ -5,13 +5,22 @@ Handles all data extraction from Salesforce Credentials_Form_Setup_Data__c objec
 """
 
 import logging
-from typing import List, Dict, Any, Optional
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable, Iterable, Iterator, Tuple
 from simple_salesforce import Salesforce
 from .client import SalesforceClient
+from .bulk import BulkQueryClient
+from config import SF_EXTRACT_WORKERS, SF_PAGE_SIZE, SF_STREAM_BUFFER_PAGES, SF_BULK_OBJECT_TYPES
 
 
 logger = logging.getLogger(__name__)
 
+# Marks the end of a job's page queue in extract_concurrently()
+_END_OF_PAGES = object()
+
 
 class SalesforceExtractor:
     """Extracts data from Salesforce using SOQL queries."""
@@ -25,6 +34,7 @@ class SalesforceExtractor:
         """
         self.sf_client = sf_client
         self.sf: Optional[Salesforce] = None
+        self._local = threading.local()
     
     def _get_connection(self) -> Salesforce:
         """Get Salesforce connection, establishing if needed."""
@@ -32,6 +42,186 @@ class SalesforceExtractor:
             self.sf = self.sf_client.connect()
         return self.sf
     
+    def extract_concurrently(self, jobs: Dict[str, Callable[["SalesforceExtractor"], Iterable[Dict[str, Any]]]],
+                             max_workers: int = SF_EXTRACT_WORKERS,
+                             priority: Optional[List[str]] = None) -> Iterator[Tuple[str, Iterator[Dict[str, Any]]]]:
+        """
+        Run several extraction queries in parallel and stream each one's records.
+        
+        Every worker thread uses its own extractor and Salesforce client
+        (sharing this extractor's session), so wall-clock time is roughly
+        that of the slowest query instead of the sum of all of them. Workers
+        hand records over in pages through a bounded queue, so at most
+        SF_STREAM_BUFFER_PAGES pages per job are held in memory while the
+        caller is busy with another job.
+        
+        Each yielded record iterator must be consumed before the next job is
+        requested, and can be consumed only once.
+        
+        Args:
+            jobs: Job name mapped to a function that runs the query on a worker extractor
+                  and returns its records as a list or iterator
+                  (e.g. {"institutions": lambda extractor: extractor.get_institutions(stream=True)})
+            max_workers: Maximum number of concurrent queries
+            priority: Job names to yield first, in this order (e.g. master data needed by other jobs)
+            
+        Yields:
+            Tuple[str, Iterator[Dict]]: Job name and an iterator over its records; jobs
+            not in priority are yielded in the order their first page arrives
+        """
+        # Log in once up front so workers only clone the session
+        self._get_connection()
+        
+        priority = [name for name in (priority or []) if name in jobs]
+        pages = {name: queue.Queue(maxsize=SF_STREAM_BUFFER_PAGES) for name in jobs}
+        ready = queue.Queue()
+        stopped = threading.Event()
+        timings = {}
+        start = time.perf_counter()
+        
+        def hand_over(name: str, item: Any) -> bool:
+            while not stopped.is_set():
+                try:
+                    pages[name].put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def run(name: str) -> None:
+            job_start = time.perf_counter()
+            announced = False
+            try:
+                page = []
+                for record in jobs[name](self._worker_extractor()):
+                    page.append(record)
+                    if len(page) >= SF_PAGE_SIZE:
+                        if not hand_over(name, page):
+                            return
+                        page = []
+                        if not announced:
+                            ready.put(name)
+                            announced = True
+                if page and not hand_over(name, page):
+                    return
+                timings[name] = time.perf_counter() - job_start
+                hand_over(name, _END_OF_PAGES)
+            except Exception as e:
+                hand_over(name, e)
+            finally:
+                if not announced:
+                    ready.put(name)
+        
+        def drain(name: str) -> Iterator[Dict[str, Any]]:
+            count = 0
+            while True:
+                page = pages[name].get()
+                if page is _END_OF_PAGES:
+                    break
+                if isinstance(page, Exception):
+                    raise page
+                count += len(page)
+                yield from page
+            logger.info(f"Extracted {name}: {count} records in {timings[name]:.2f}s")
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs))),
+                                thread_name_prefix="sf-extract") as executor:
+            futures = [executor.submit(run, name) for name in priority + [n for n in jobs if n not in priority]]
+            try:
+                for name in priority:
+                    yield name, drain(name)
+                
+                remaining = len(jobs) - len(priority)
+                while remaining:
+                    name = ready.get()
+                    if name in priority:
+                        continue
+                    remaining -= 1
+                    yield name, drain(name)
+            finally:
+                # Unblock workers still waiting to hand over pages nobody will read
+                stopped.set()
+                for future in futures:
+                    future.cancel()
+        
+        wall_clock = time.perf_counter() - start
+        logger.info(
+            f"Concurrent extraction finished in {wall_clock:.2f}s "
+            f"(sequential would be ~{sum(timings.values()):.2f}s)"
+        )
+    
+    def _worker_extractor(self) -> "SalesforceExtractor":
+        """Get this thread's extractor, with its own Salesforce client."""
+        worker = getattr(self._local, "extractor", None)
+        if worker is None:
+            worker = SalesforceExtractor(self.sf_client)
+            worker.sf = self.sf_client.clone_connection()
+            self._local.extractor = worker
+        return worker
+    
+    def _stream_records(self, sf: Salesforce, soql: str, label: str,
+                        object_type: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield query results one page at a time.
+        
+        Object types listed in SF_BULK_OBJECT_TYPES are extracted with a
+        Bulk API 2.0 query job, streaming its CSV result sets. Otherwise (or
+        if the job cannot be run) query_all_iter() is used, which fetches the
+        next REST page (query_more) only once the current one has been
+        consumed. Either way memory is bounded by one page rather than by the
+        size of the whole result set.
+        
+        Args:
+            sf: Salesforce connection to query with
+            soql: SOQL query
+            label: Record description for log messages
+            object_type: Extractor name checked against SF_BULK_OBJECT_TYPES (e.g. "institutions")
+            
+        Yields:
+            Dict: Salesforce records
+        """
+        records = None
+        if object_type in SF_BULK_OBJECT_TYPES:
+            records = self._run_bulk_query(sf, soql, label)
+        if records is None:
+            records = sf.query_all_iter(soql)
+        
+        count = 0
+        try:
+            for record in records:
+                count += 1
+                yield record
+                
+        except Exception as e:
+            logger.error(f"Failed to extract {label} records after {count} records: {e}")
+            raise
+        
+        logger.info(f"Extracted {count} {label} records")
+    
+    def _run_bulk_query(self, sf: Salesforce, soql: str, label: str) -> Optional[Iterator[Dict[str, Any]]]:
+        """
+        Run a query as a Bulk API 2.0 job and wait until its results are ready.
+        
+        Args:
+            sf: Salesforce connection whose session the job runs on
+            soql: SOQL query
+            label: Record description for log messages
+            
+        Returns:
+            Optional[Iterator[Dict]]: Record iterator, or None if the job could not be
+            run and the caller should fall back to REST
+        """
+        bulk = BulkQueryClient(sf)
+        try:
+            logger.info(f"Running Bulk API query job for {label} records...")
+            job_id = bulk.submit(soql)
+            bulk.wait(job_id)
+            return bulk.iter_records(job_id)
+            
+        except Exception as e:
+            logger.warning(f"Bulk API extraction of {label} records failed ({e}); falling back to REST")
+            return None
+    
     def get_countries(self) -> List[Dict[str, Any]]:
         """
         Extract unique countries from Foreign Credential records.
@@ -66,7 +256,7 @@ class SalesforceExtractor:
             logger.error(f"Failed to extract countries: {e}")
             raise
     
-    def get_foreign_credentials(self) -> List[Dict[str, Any]]:
+    def get_foreign_credentials(self, stream: bool = False) -> Iterable[Dict[str, Any]]:
         """
         Extract Foreign Credential records.
         
@@ -76,20 +266,26 @@ class SalesforceExtractor:
         Value_2__c = English Credential  
         Value_3__c = Foreign Credential Additional Information
         
+        Args:
+            stream: Yield records page by page instead of returning one list
+            
         Returns:
-            List[Dict]: List of foreign credential records
+            List[Dict]: List of foreign credential records (an iterator when streaming)
         """
         logger.info("Extracting foreign credentials from Salesforce...")
         
         sf = self._get_connection()
         
         soql = """
-        SELECT Key__c, Value_1__c, Value_2__c, Value_3__c
+        SELECT Id, SystemModstamp, Key__c, Value_1__c, Value_2__c, Value_3__c
         FROM Credentials_Form_Setup_Data__c
         WHERE Type__c = 'Country' AND Key__c != null
         ORDER BY Key__c ASC
         """
         
+        if stream:
+            return self._stream_records(sf, soql, "foreign credential", "foreign_credentials")
+        
         try:
             result = sf.query_all(soql)
             credentials = result['records']
@@ -101,7 +297,7 @@ class SalesforceExtractor:
             logger.error(f"Failed to extract foreign credentials: {e}")
             raise
     
-    def get_institutions(self) -> List[Dict[str, Any]]:
+    def get_institutions(self, stream: bool = False) -> Iterable[Dict[str, Any]]:
         """
         Extract Institution records.
         
@@ -112,20 +308,26 @@ class SalesforceExtractor:
         Value_3__c = Institution History
         Value_4__c = Accreditation Status and Color
         
+        Args:
+            stream: Yield records page by page instead of returning one list
+            
         Returns:
-            List[Dict]: List of institution records
+            List[Dict]: List of institution records (an iterator when streaming)
         """
         logger.info("Extracting institutions from Salesforce...")
         
         sf = self._get_connection()
         
         soql = """
-        SELECT Key__c, Value_1__c, Value_2__c, Value_3__c, Value_4__c
+        SELECT Id, SystemModstamp, Key__c, Value_1__c, Value_2__c, Value_3__c, Value_4__c
         FROM Credentials_Form_Setup_Data__c
         WHERE Type__c = 'Country Institute' AND Key__c != null
         ORDER BY Key__c ASC
         """
         
+        if stream:
+            return self._stream_records(sf, soql, "institution", "institutions")
+        
         try:
             result = sf.query_all(soql)
             institutions = result['records']
@@ -137,7 +339,7 @@ class SalesforceExtractor:
             logger.error(f"Failed to extract institutions: {e}")
             raise
     
-    def get_program_lengths(self) -> List[Dict[str, Any]]:
+    def get_program_lengths(self, stream: bool = False) -> Iterable[Dict[str, Any]]:
         """
         Extract Program Length records.
         
@@ -145,20 +347,26 @@ class SalesforceExtractor:
         Key__c = Country Name (FK reference)
         Value_1__c = Program Length
         
+        Args:
+            stream: Yield records page by page instead of returning one list
+            
         Returns:
-            List[Dict]: List of program length records
+            List[Dict]: List of program length records (an iterator when streaming)
         """
         logger.info("Extracting program lengths from Salesforce...")
         
         sf = self._get_connection()
         
         soql = """
-        SELECT Key__c, Value_1__c
+        SELECT Id, SystemModstamp, Key__c, Value_1__c
         FROM Credentials_Form_Setup_Data__c
         WHERE Type__c = 'Program Length' AND Key__c != null
         ORDER BY Key__c ASC
         """
         
+        if stream:
+            return self._stream_records(sf, soql, "program length", "program_lengths")
+        
         try:
             result = sf.query_all(soql)
             programs = result['records']
@@ -170,7 +378,7 @@ class SalesforceExtractor:
             logger.error(f"Failed to extract program lengths: {e}")
             raise
     
-    def get_grade_scales(self) -> List[Dict[str, Any]]:
+    def get_grade_scales(self, stream: bool = False) -> Iterable[Dict[str, Any]]:
         """
         Extract Grade Scale records.
         
@@ -181,20 +389,26 @@ class SalesforceExtractor:
         Value_3__c = Grade Scale Notes
         Value_5__c = Default Conversion Factor
         
+        Args:
+            stream: Yield records page by page instead of returning one list
+            
         Returns:
-            List[Dict]: List of grade scale records
+            List[Dict]: List of grade scale records (an iterator when streaming)
         """
         logger.info("Extracting grade scales from Salesforce...")
         
         sf = self._get_connection()
         
         soql = """
-        SELECT Key__c, Value_1__c, Value_2__c, Value_3__c, Value_5__c
+        SELECT Id, SystemModstamp, Key__c, Value_1__c, Value_2__c, Value_3__c, Value_5__c
         FROM Credentials_Form_Setup_Data__c
         WHERE Type__c = 'Country Grade' AND Key__c != null
         ORDER BY Key__c ASC
         """
         
+        if stream:
+            return self._stream_records(sf, soql, "grade scale", "grade_scales")
+        
         try:
             result = sf.query_all(soql)
             scales = result['records']
@@ -206,7 +420,7 @@ class SalesforceExtractor:
             logger.error(f"Failed to extract grade scales: {e}")
             raise
     
-    def get_us_equivalencies(self) -> List[Dict[str, Any]]:
+    def get_us_equivalencies(self, stream: bool = False) -> Iterable[Dict[str, Any]]:
         """
         Extract US Equivalency records (standalone).
         
@@ -214,20 +428,26 @@ class SalesforceExtractor:
         Key__c = Overall Equivalency
         Value_1__c = Overall Equivalency Description
         
+        Args:
+            stream: Yield records page by page instead of returning one list
+            
         Returns:
-            List[Dict]: List of US equivalency records
+            List[Dict]: List of US equivalency records (an iterator when streaming)
         """
         logger.info("Extracting US equivalencies from Salesforce...")
         
         sf = self._get_connection()
         
         soql = """
-        SELECT Key__c, Value_1__c
+        SELECT Id, SystemModstamp, Key__c, Value_1__c
         FROM Credentials_Form_Setup_Data__c
         WHERE Type__c = 'All Equivalncy' AND Key__c != null
         ORDER BY Key__c ASC
         """
         
+        if stream:
+            return self._stream_records(sf, soql, "US equivalency", "us_equivalencies")
+        
         try:
             result = sf.query_all(soql)
             equivalencies = result['records']
@@ -239,26 +459,32 @@ class SalesforceExtractor:
             logger.error(f"Failed to extract US equivalencies: {e}")
             raise
     
-    def get_notes(self) -> List[Dict[str, Any]]:
+    def get_notes(self, stream: bool = False) -> Iterable[Dict[str, Any]]:
         """
         Extract Notes records (standalone).
         
         Key__c = The actual notes content
         
+        Args:
+            stream: Yield records page by page instead of returning one list
+            
         Returns:
-            List[Dict]: List of notes records
+            List[Dict]: List of notes records (an iterator when streaming)
         """
         logger.info("Extracting notes from Salesforce...")
         
         sf = self._get_connection()
         
         soql = """
-        SELECT Key__c
+        SELECT Id, SystemModstamp, Key__c
         FROM Credentials_Form_Setup_Data__c
         WHERE Key__c != null AND Key__c LIKE '%note%'
         ORDER BY Key__c ASC
         """
         
+        if stream:
+            return self._stream_records(sf, soql, "notes", "notes")
+        
         try:
             result = sf.query_all(soql)
             notes = result['records']
@@ -270,6 +496,54 @@ class SalesforceExtractor:
             logger.error(f"Failed to extract notes: {e}")
             raise
     
+    def get_changed_records(self, fields: List[str], since: Optional[str] = None,
+                            record_type: Optional[str] = None,
+                            condition: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Extract records changed since a SystemModstamp high-water mark.
+        
+        Uses queryAll so that deleted records (IsDeleted = true) are returned
+        too, as long as they are still in the Salesforce recycle bin. Records
+        whose Key__c was cleared are returned as well so callers can drop them.
+        
+        Args:
+            fields: Value fields to select in addition to Id, IsDeleted, SystemModstamp and Key__c
+            since: SOQL datetime literal (e.g. 2024-01-31T08:00:00Z); None extracts everything
+            record_type: Type__c value to filter on
+            condition: Extra SOQL condition (e.g. "Key__c LIKE '%note%'")
+            
+        Returns:
+            List[Dict]: Changed records ordered by SystemModstamp
+        """
+        sf = self._get_connection()
+        
+        conditions = []
+        if record_type:
+            conditions.append(f"Type__c = '{record_type}'")
+        if condition:
+            conditions.append(condition)
+        if since:
+            # Inclusive so records sharing the mark's second are never missed; upserts are idempotent
+            conditions.append(f"SystemModstamp >= {since}")
+        
+        soql = f"""
+        SELECT Id, IsDeleted, SystemModstamp, Key__c{''.join(', ' + field for field in fields)}
+        FROM Credentials_Form_Setup_Data__c
+        {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+        ORDER BY SystemModstamp ASC
+        """
+        
+        try:
+            result = sf.query_all(soql, include_deleted=True)
+            records = result['records']
+            
+            logger.info(f"Extracted {len(records)} changed {record_type or condition or 'all'} records since {since or 'the beginning'}")
+            return records
+            
+        except Exception as e:
+            logger.error(f"Failed to extract changed records: {e}")
+            raise
+    
     def test_connection(self) -> bool:
         """
         Test the Salesforce connection and basic query capability.
@@ -5,8 +5,10 @@ Provides shared functionality for logging, data validation, and general utilitie
 """
 
 import logging
+import re
 import sys
-from typing import Any, Optional, Dict, List
+import unicodedata
+from typing import Any, Optional, Dict, List, Set
 from pathlib import Path
 
 
@@ -204,4 +206,97 @@ def validate_salesforce_record(record: Dict[str, Any], required_fields: List[str
         if field not in record or record[field] is None:
             return False
     
-    return True
\ No newline at end of file
+    return True
+
+
+# Letters that Unicode decomposition does not reduce to an ASCII base letter
+_FOLD_TRANSLATION = str.maketrans({
+    'ı': 'i', 'ø': 'o', 'ł': 'l', 'đ': 'd', 'ð': 'd', 'þ': 'th',
+    'ß': 'ss', 'æ': 'ae', 'œ': 'oe', 'ħ': 'h', 'ŀ': 'l'
+})
+
+
+def fold_text(value: Any) -> str:
+    """
+    Normalize text for matching: fold case, strip diacritics and punctuation.
+    
+    Example: "Türkiye" -> "turkiye", "Côte d'Ivoire" -> "cote d ivoire"
+    
+    Args:
+        value: Raw text (None is treated as empty)
+        
+    Returns:
+        str: Folded text with single spaces between words
+    """
+    if value is None:
+        return ""
+    
+    text = unicodedata.normalize("NFKD", str(value).casefold())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = text.translate(_FOLD_TRANSLATION)
+    text = re.sub(r"[\W_]+", " ", text, flags=re.UNICODE)
+    return text.strip()
+
+
+def text_trigrams(value: Any) -> Set[str]:
+    """
+    Get the set of word-padded character trigrams of folded text.
+    
+    Args:
+        value: Raw text
+        
+    Returns:
+        Set[str]: Trigrams (each word is padded with two leading and one trailing space)
+    """
+    trigrams = set()
+    for word in fold_text(value).split():
+        padded = f"  {word} "
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+def levenshtein_distance(a: str, b: str) -> int:
+    """
+    Compute the edit distance between two strings.
+    
+    Args:
+        a: First string
+        b: Second string
+        
+    Returns:
+        int: Minimum number of single-character insertions, deletions or substitutions
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if not b:
+        return len(a)
+    
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        previous = current
+    
+    return previous[-1]
+
+
+def text_similarity(a: str, b: str) -> float:
+    """
+    Normalized edit-distance similarity between two strings.
+    
+    Args:
+        a: First string
+        b: Second string
+        
+    Returns:
+        float: 1.0 for identical strings down to 0.0 for completely different ones
+    """
+    longest = max(len(a), len(b))
+    if longest == 0:
+        return 1.0
+    return 1.0 - levenshtein_distance(a, b) / longest